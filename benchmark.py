@@ -0,0 +1,379 @@
+import logging
+import os
+import time
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+
+from config import Config
+from core.factory import Plugin
+from core import augmentator
+from core.extensions.callbacks import Callback, CallbackList, TimeCallback
+from core.logger import info, ChronosLogger
+from ml.modules.activation_checkpoint import CHECKPOINT_FLAGS
+from train import CONFIG_RESTRICTION
+from utils.conv_bn_fusion import fuse_conv_bn
+from utils.function_util import is_overridden_func
+from utils.network_util import InferenceNetwork
+from utils.pt_tensor import make_cuda
+from utils.system_printer import SystemPrinter
+
+logger = ChronosLogger.get_logger()
+
+
+class StepCallback(Callback):
+    def __init__(self):
+        super().__init__()
+        self.steps = 0
+
+    def on_batch_end(self, batch, logs=None):
+        self.steps += 1
+
+
+def legacy_dispatch(callbacks, hook, batch, logs):
+    # CallbackList dispatch before the hook table, kept as the baseline of hooks
+    for callback in callbacks:
+        logger.debug("On {} {}".format(hook, callback.__class__.__name__))
+        if not is_overridden_func(getattr(callback, hook)):
+            logger.debug(
+                "Nothing Registered On {} {}".format(hook, callback.__class__.__name__)
+            )
+        getattr(callback, hook)(batch, logs)
+
+
+class Benchmark:
+    def __init__(self, plugin, config_path):
+        self.config_path = config_path
+        self._plugin_name = plugin
+
+    def load_config(self):
+        config = Config(self.config_path, CONFIG_RESTRICTION, self._plugin_name)
+        ChronosLogger().create_console_logger()
+        return config
+
+    @info
+    def loader(self, workers=(0, 2, 4, 8), batches=50, mode="train"):
+        """Report images/s of the DataLoader on DATASET.ROOT for every worker count
+
+        :param workers: worker counts to benchmark
+        :param batches: number of batches to time per worker count, after one warm up batch
+        :param mode: split to read from, one of train, val, test
+        :return:
+        """
+        config = self.load_config()
+        workers = [workers] if isinstance(workers, int) else list(workers)
+
+        data = Plugin(config).factory.create_data_set()
+        data_set = getattr(data, "{}_data".format(mode)).dataset
+
+        SystemPrinter.sys_print(
+            "Loader Benchmark on {} - {} samples".format(config.root, len(data_set))
+        )
+        throughput = dict()
+        for num_workers in workers:
+            data_loader = DataLoader(
+                dataset=data_set,
+                shuffle=True,
+                batch_size=config.batch_size,
+                **data_set.get_loader_param(config, num_workers)
+            )
+            throughput[num_workers] = self.time_loader(data_loader, batches)
+            SystemPrinter.sys_print(
+                "Workers: {}, Images/s: {:.2f}".format(
+                    num_workers, throughput[num_workers]
+                )
+            )
+            del data_loader
+        return throughput
+
+    @staticmethod
+    def time_loader(data_loader, batches):
+        loader_iterator = iter(data_loader)
+        # The first batch pays for worker start up, keep it out of the timing
+        next(loader_iterator)
+
+        images_count = 0
+        start = time.time()
+        for iteration, (images, _) in enumerate(loader_iterator):
+            if iteration == batches:
+                break
+            images_count += images["image"].shape[0]
+        elapsed = time.time() - start
+        return images_count / elapsed if elapsed > 0 else 0.0
+
+    @info
+    def memory(self, batch=None, image_dim=None):
+        """Report the peak memory of one training step with and without activation
+        checkpointing
+
+        Checkpointing is taken as configured in MODEL_PARAM, when nothing is enabled
+        there every checkpoint option of the network is switched on. On GPU the peak
+        allocation is reported, on CPU the size of the activations kept for backward
+
+        :param batch: batch size, defaults to TRAIN.BATCH
+        :param image_dim: [height, width], defaults to TRAIN.IMAGE_DIM
+        :return:
+        """
+        config = self.load_config()
+        batch = config.batch_size if batch is None else batch
+        image_dim = config.model_input_dimension if image_dim is None else image_dim
+
+        model = Plugin(config).factory.create_network(
+            config.model_name, config.model_param
+        )
+        model = make_cuda(model)
+        model.train()
+
+        flags = self.checkpoint_flags(model)
+        if len(flags) == 0:
+            SystemPrinter.sys_print(
+                "{} has no activation checkpointing option".format(
+                    config.model_name
+                )
+            )
+        configured = {key: value for key, value in flags.items() if value}
+        if len(configured) == 0:
+            configured = {key: True for key in flags.keys()}
+
+        images = make_cuda(torch.randn(batch, 3, image_dim[0], image_dim[1]))
+        SystemPrinter.sys_print(
+            "Memory Benchmark - {}, input {}".format(
+                config.model_name, list(images.shape)
+            )
+        )
+        report = dict()
+        for name, enabled in (("without", {}), ("with", configured)):
+            for module, flag in flags.keys():
+                setattr(module, flag, (module, flag) in enabled)
+            report[name] = self.peak_memory(model, images)
+            SystemPrinter.sys_print(
+                "Checkpointing {}: {} modules, Peak: {:.2f} MB".format(
+                    name, len(enabled), report[name] / 2 ** 20
+                )
+            )
+        if report["without"] > 0:
+            SystemPrinter.sys_print(
+                "Saved: {:.2f}%".format(
+                    100 * (1 - report["with"] / report["without"])
+                )
+            )
+        return report
+
+    @staticmethod
+    def checkpoint_flags(model):
+        return {
+            (module, flag): getattr(module, flag)
+            for module in model.modules()
+            for flag in CHECKPOINT_FLAGS
+            if isinstance(getattr(module, flag, None), bool)
+        }
+
+    @staticmethod
+    def peak_memory(model, images):
+        model.zero_grad(set_to_none=True)
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+            baseline = torch.cuda.memory_allocated()
+            torch.cuda.reset_peak_memory_stats()
+            outputs = model({"image": images})
+            sum(output.float().mean() for output in outputs.values()).backward()
+            torch.cuda.synchronize()
+            peak = torch.cuda.max_memory_allocated() - baseline
+        else:
+            # the CPU allocator keeps no statistics, count what autograd holds on to
+            # for backward, that is the part checkpointing trades for recompute
+            saved = dict()
+
+            def pack(tensor):
+                storage = tensor.storage()
+                saved[storage.data_ptr()] = storage.size() * storage.element_size()
+                return tensor
+
+            with torch.autograd.graph.saved_tensors_hooks(pack, lambda x: x):
+                outputs = model({"image": images})
+            peak = sum(saved.values())
+            sum(output.float().mean() for output in outputs.values()).backward()
+        model.zero_grad(set_to_none=True)
+        return peak
+
+    @info
+    def fusion(self, networks=None, batch=1, image_dim=None, runs=10):
+        """Report CPU latency and memory of inference with and without Conv-BN folding
+
+        :param networks: ml.network architectures to compare, defaults to the configured
+            model. network_param of MODEL_PARAM is used for the configured architecture,
+            the others are built with their defaults
+        :param batch: batch size
+        :param image_dim: [height, width], defaults to TRAIN.IMAGE_DIM
+        :param runs: timed forward passes, after one warm up pass
+        :return:
+        """
+        config = self.load_config()
+        image_dim = config.model_input_dimension if image_dim is None else image_dim
+        model_param = dict(config.model_param)
+        configured = (
+            model_param["network"] if "network" in model_param.keys() else "MapNet"
+        )
+        networks = [configured] if networks is None else networks
+        networks = [networks] if isinstance(networks, str) else list(networks)
+
+        images = torch.randn(batch, 3, image_dim[0], image_dim[1])
+        report = dict()
+        for network in networks:
+            network_param = dict(model_param)
+            if network != configured:
+                network_param.update({"network": network, "network_param": {}})
+            model = Plugin(config).factory.create_network(
+                config.model_name, network_param
+            )
+            model.eval()
+
+            eager = self.inference_cost(model, images, runs)
+            with torch.no_grad():
+                expected = model({"image": images})["output"]
+            folded = fuse_conv_bn(InferenceNetwork(model), images)
+            fused = self.inference_cost(model, images, runs)
+            with torch.no_grad():
+                difference = (model({"image": images})["output"] - expected).abs().max()
+
+            report[network] = {"eager": eager, "fused": fused, "folded": folded}
+            SystemPrinter.sys_print(
+                "{} - {} BN folded, Max Abs Difference: {:.2e}".format(
+                    network, folded, difference
+                )
+            )
+            for name, cost in (("Eager", eager), ("Fused", fused)):
+                SystemPrinter.sys_print(
+                    "{}: {:.2f} ms, Parameters: {:.2f} MB, Activations: {:.2f} MB".format(
+                        name,
+                        cost["latency"] * 1e3,
+                        cost["parameters"] / 2 ** 20,
+                        cost["activations"] / 2 ** 20,
+                    )
+                )
+            SystemPrinter.sys_print(
+                "Saved: Latency {:.2f}%, Activations {:.2f}%".format(
+                    100 * (1 - fused["latency"] / eager["latency"]),
+                    100 * (1 - fused["activations"] / eager["activations"]),
+                )
+            )
+        return report
+
+    @staticmethod
+    @torch.no_grad()
+    def inference_cost(model, images, runs):
+        # the CPU allocator keeps no statistics, add up the outputs every leaf module
+        # allocates in one pass instead
+        activations = list()
+
+        def count(module, module_input, output):
+            if not isinstance(output, torch.Tensor):
+                return
+            # in place and identity modules hand their input back, nothing is allocated
+            if any(
+                isinstance(tensor, torch.Tensor)
+                and tensor.data_ptr() == output.data_ptr()
+                for tensor in module_input
+            ):
+                return
+            activations.append(output.numel() * output.element_size())
+
+        handles = [
+            module.register_forward_hook(count)
+            for module in model.modules()
+            if len(list(module.children())) == 0
+        ]
+        model({"image": images})
+        for handle in handles:
+            handle.remove()
+
+        start = time.time()
+        for _ in range(runs):
+            model({"image": images})
+        return {
+            "latency": (time.time() - start) / runs,
+            "parameters": sum(
+                tensor.numel() * tensor.element_size()
+                for tensor in list(model.parameters()) + list(model.buffers())
+            ),
+            "activations": sum(activations),
+        }
+
+    @info
+    def hooks(self, steps=1000, callbacks=8, levels=("DEBUG", "INFO")):
+        """Report the per step overhead of callback dispatch and of the CPU augmentation
+        pipeline at every logging level
+
+        Debug records are written to os.devnull, as they are to the time rotated log of
+        a training run. Dispatch through the hook table of CallbackList is compared to
+        the previous dispatch, which logged and looked up every callback on every hook
+
+        :param steps: timed steps
+        :param callbacks: registered callbacks, every second one overrides on_batch_end
+        :param levels: logging levels to time
+        :return:
+        """
+        config = self.load_config()
+        levels = [levels] if isinstance(levels, str) else list(levels)
+        registered = [
+            StepCallback() if index % 2 else Callback() for index in range(callbacks - 1)
+        ] + [TimeCallback()]
+        callback_list = CallbackList(registered)
+        logs = {"model": torch.nn.Conv2d(3, 3, 3), "plt_lr": {"data": 0.0}}
+
+        data_set = Plugin(config).factory.create_data_set().train_data.dataset
+        transform = data_set.load_transformation(config.transformation, augmentator)
+        height, width = config.model_input_dimension
+        image = np.random.randint(0, 256, (height, width, 3), np.uint8)
+        mask = np.random.randint(0, 2, (height, width, 3), np.uint8) * 255
+
+        stream = open(os.devnull, "w")
+        handler = logging.StreamHandler(stream)
+        handler.setLevel(logging.DEBUG)
+        previous_level = logger.level
+        logger.addHandler(handler)
+        report = dict()
+        try:
+            for level in levels:
+                logger.setLevel(level)
+                report[level] = {
+                    "legacy_dispatch": self.time_steps(
+                        lambda step: [
+                            legacy_dispatch(registered, hook, step, logs)
+                            for hook in ("on_batch_begin", "on_batch_end")
+                        ],
+                        steps,
+                    ),
+                    "dispatch": self.time_steps(
+                        lambda step: [
+                            callback_list.on_batch_begin(step, logs),
+                            callback_list.on_batch_end(step, logs),
+                        ],
+                        steps,
+                    ),
+                    "augmentation": self.time_steps(
+                        lambda step: transform(image.copy(), mask.copy()), steps
+                    ),
+                }
+                SystemPrinter.sys_print(
+                    "{} - Legacy Dispatch: {:.2f} us, Dispatch: {:.2f} us, "
+                    "Augmentation: {:.2f} us per step".format(
+                        level,
+                        report[level]["legacy_dispatch"] * 1e6,
+                        report[level]["dispatch"] * 1e6,
+                        report[level]["augmentation"] * 1e6,
+                    )
+                )
+        finally:
+            logger.removeHandler(handler)
+            logger.setLevel(previous_level)
+            stream.close()
+        return report
+
+    @staticmethod
+    def time_steps(step_fn, steps):
+        start = time.perf_counter()
+        for step in range(steps):
+            step_fn(step)
+        return (time.perf_counter() - start) / steps
@@ -1,5 +1,6 @@
 import os
 
+import torch
 import yaml
 
 from pyjavaproperties import Properties
@@ -33,6 +34,48 @@ class Config(object):
     def root(self):
         return self.get_property("ROOT")
 
+    @property
+    def device_normalization(self):
+        return self.get_property_or_default("DEVICE_NORMALIZATION", False)
+
+    @property
+    def device_transformation(self):
+        return self.get_property_or_default("DEVICE_TRANSFORMATION", False)
+
+    @property
+    def cache(self):
+        return self.get_property_or_default("CACHE")
+
+    @property
+    def raster_window(self):
+        return self.get_property_or_default("RASTER_WINDOW", False)
+
+    @property
+    def crops_per_image(self):
+        return self.get_property_or_default("CROPS_PER_IMAGE", 1)
+
+    @property
+    def foreground_ratio(self):
+        return self.get_sub_property_or_default("FOREGROUND", "RATIO")
+
+    @property
+    def foreground_cell(self):
+        return self.get_sub_property_or_default("FOREGROUND", "CELL", 32)
+
+    @property
+    def decoded_cache_bytes(self):
+        return self.get_property_or_default("DECODED_CACHE_BYTES")
+
+    @property
+    def validation_cache(self):
+        return self.get_sub_property_or_default("VALIDATION_CACHE", "ENABLED", False)
+
+    @property
+    def validation_cache_device_bytes(self):
+        return self.get_sub_property_or_default(
+            "VALIDATION_CACHE", "DEVICE_BYTES", 2 ** 31
+        )
+
     @property
     def experiment_name(self):
         return self.get_property("EXP_NAME")
@@ -49,6 +92,18 @@ class Config(object):
     def n_epochs(self):
         return self.get_property("EPOCH")
 
+    @property
+    def loader_workers(self):
+        return self.get_sub_property_or_default("LOADER", "WORKERS", 0)
+
+    @property
+    def loader_prefetch_factor(self):
+        return self.get_sub_property_or_default("LOADER", "PREFETCH_FACTOR", 2)
+
+    @property
+    def loader_persistent_workers(self):
+        return self.get_sub_property_or_default("LOADER", "PERSISTENT_WORKERS", False)
+
     @property
     def model_input_dimension(self):
         return self.get_property("IMAGE_DIM")
@@ -62,6 +117,80 @@ class Config(object):
         param = self.get_property("MODEL_PARAM")
         return param if param is not None else {"NA": "NA"}
 
+    @property
+    def mixed_precision(self):
+        return self.get_property_or_default("AMP", False)
+
+    @property
+    def accumulation_steps(self):
+        return self.get_property_or_default("ACCUMULATION_STEPS", 1)
+
+    @property
+    def async_checkpoint(self):
+        return self.get_property_or_default("ASYNC_CHECKPOINT", False)
+
+    @property
+    def preview_interval(self):
+        return self.get_property_or_default("PREVIEW_INTERVAL", 500)
+
+    @property
+    def step_timing(self):
+        return self.get_property_or_default("STEP_TIMING", False)
+
+    @property
+    def profile(self):
+        return self.get_sub_property_or_default("PROFILE", "ENABLED", False)
+
+    @property
+    def profile_trace(self):
+        return self.get_sub_property_or_default("PROFILE", "TRACE", False)
+
+    @property
+    def profile_trace_steps(self):
+        return self.get_sub_property_or_default("PROFILE", "TRACE_STEPS", 10)
+
+    @property
+    def tensorboard_flush_steps(self):
+        return self.get_sub_property_or_default("TENSORBOARD", "FLUSH_STEPS")
+
+    @property
+    def tensorboard_flush_secs(self):
+        return self.get_sub_property_or_default("TENSORBOARD", "FLUSH_SECS")
+
+    @property
+    def distributed(self):
+        return self.get_sub_property_or_default("DISTRIBUTED", "ENABLED", False)
+
+    @property
+    def distributed_backend(self):
+        return self.get_sub_property_or_default(
+            "DISTRIBUTED", "BACKEND", "nccl" if torch.cuda.is_available() else "gloo"
+        )
+
+    @property
+    def world_size(self):
+        return self.get_sub_property_or_default(
+            "DISTRIBUTED", "WORLD_SIZE", max(torch.cuda.device_count(), 1)
+        )
+
+    @property
+    def master_addr(self):
+        return self.get_sub_property_or_default(
+            "DISTRIBUTED", "MASTER_ADDR", "localhost"
+        )
+
+    @property
+    def master_port(self):
+        return self.get_sub_property_or_default("DISTRIBUTED", "MASTER_PORT", 29500)
+
+    @property
+    def log_level(self):
+        return self.get_property_or_default("LOG_LEVEL", "DEBUG")
+
+    @property
+    def streaming_metric(self):
+        return self.get_property_or_default("STREAMING_METRIC", False)
+
     @property
     def loss_name(self):
         return self.get_sub_property("LOSS", "NAME")
@@ -174,6 +303,19 @@ class Config(object):
             raise KeyError
         return self.recursive_dict_fn(self._run_config[head_property], property_name)
 
+    def get_property_or_default(self, property_name, default=None):
+        if property_name not in self._run_config.keys():
+            return default
+        value = self._run_config[property_name]
+        return value if value is not None else default
+
+    def get_sub_property_or_default(self, head_property, property_name, default=None):
+        head = self.get_property_or_default(head_property)
+        if not isinstance(head, dict):
+            return default
+        value = self.recursive_dict_fn(head, property_name)
+        return value if value is not None else default
+
     def recursive_dict_fn(self, recursive_dict, property_name, dict_value=None):
 
         for key, value in recursive_dict.items():
@@ -12,7 +12,7 @@ class DualCompose:
     def __call__(self, x, mask=None):
         for t in self.transforms:
             x, mask = t(x, mask)
-            logger.debug("Dual Compose For {}".format(t.__class__.__name__))
+            logger.debug("Dual Compose For %s", t.__class__.__name__)
         return x, mask
 
 
@@ -26,7 +26,7 @@ class OneOf:
             t = random.choice(self.transforms)
             t.prob = 1.0
             x, mask = t(x, mask)
-            logger.debug("One Of For {}".format(t.__class__.__name__))
+            logger.debug("One Of For %s", t.__class__.__name__)
 
         return x, mask
 
@@ -42,8 +42,8 @@ class OneOrOther:
     def __call__(self, x, mask=None):
         if random.random() < self.prob:
             x, mask = self.first(x, mask)
-            logger.debug("OneOrOther For {}".format(self.first.__class__.__name__))
+            logger.debug("OneOrOther For %s", self.first.__class__.__name__)
         else:
             x, mask = self.second(x, mask)
-            logger.debug("OneOrOther For {}".format(self.second.__class__.__name__))
+            logger.debug("OneOrOther For %s", self.second.__class__.__name__)
         return x, mask
@@ -0,0 +1,3 @@
+from .augment_type import DualCompose, OneOf, OneOrOther
+from .geometric_transformation import *
+from .color_transformation import *
@@ -0,0 +1,87 @@
+import torch
+
+
+def blend(selected, transformed, original):
+    """
+    Per sample choice between the transformed and the original batch
+
+    :param selected: bool tensor of shape [N]
+    :param transformed: tensor of shape [N, ...]
+    :param original: tensor of shape [N, ...]
+    :return:
+    """
+    selected = selected.view(-1, *([1] * (original.dim() - 1)))
+    return torch.where(selected, transformed.to(original.dtype), original)
+
+
+class BatchTransform:
+    """
+    Transform of a batch of NCHW image and mask tensors on their device. Every sample
+    draws its own prob and random parameters, apply only changes the selected samples
+    """
+
+    def __init__(self, prob=0.5):
+        self.prob = prob
+
+    def __call__(self, x, mask=None, selected=None):
+        chosen = self.draw(x)
+        if selected is not None:
+            chosen = chosen & selected
+        return self.apply(x, mask, chosen)
+
+    def draw(self, x):
+        return torch.rand(x.shape[0], device=x.device) < self.prob
+
+    def apply(self, x, mask, selected):
+        raise NotImplementedError
+
+    @staticmethod
+    def uniform(x, low, high):
+        return torch.empty(x.shape[0], device=x.device).uniform_(low, high)
+
+
+class DualCompose(BatchTransform):
+    def __init__(self, transforms, prob=None):
+        super().__init__(prob)
+        self.transforms = transforms
+
+    def draw(self, x):
+        return torch.ones(x.shape[0], dtype=torch.bool, device=x.device)
+
+    def apply(self, x, mask, selected):
+        for t in self.transforms:
+            x, mask = t(x, mask, selected)
+        return x, mask
+
+
+class OneOf(BatchTransform):
+    def __init__(self, transforms, prob=0.5):
+        super().__init__(prob)
+        self.transforms = transforms
+
+    def apply(self, x, mask, selected):
+        # The chosen transform runs with prob 1.0 on the samples that picked it
+        choice = torch.randint(
+            len(self.transforms), (x.shape[0],), device=x.device
+        )
+        for index, t in enumerate(self.transforms):
+            x, mask = t.apply(x, mask, selected & (choice == index))
+        return x, mask
+
+
+class OneOrOther(BatchTransform):
+    def __init__(self, first, second, prob=0.5):
+        super().__init__(prob)
+        self.first = first
+        self.second = second
+
+    def __call__(self, x, mask=None, selected=None):
+        if selected is None:
+            selected = torch.ones(x.shape[0], dtype=torch.bool, device=x.device)
+        return self.apply(x, mask, selected)
+
+    def apply(self, x, mask, selected):
+        first = self.draw(x)
+        x, mask = self.first.apply(x, mask, selected & first)
+        x, mask = self.second.apply(x, mask, selected & ~first)
+        return x, mask
@@ -0,0 +1,152 @@
+import torch
+from torch.nn import functional as F
+
+from .augment_type import BatchTransform, blend
+
+__all__ = [
+    "RandomHueSaturationValue",
+    "RandomContrast",
+    "RandomBrightness",
+    "RandomFilter",
+]
+
+# ITU-R 601 weights of cv2.COLOR_RGB2GRAY
+GRAY_WEIGHT = (0.299, 0.587, 0.114)
+
+
+def clip(img, maxval):
+    # clip and astype of the uint8 version, maxval is per sample
+    return torch.min(img.clamp(min=0), maxval).floor_()
+
+
+def sample_max(img):
+    return img[:, :3].amax(dim=(1, 2, 3), keepdim=True)
+
+
+def per_sample(value):
+    return value.view(-1, 1, 1, 1)
+
+
+def rgb_to_hsv(img):
+    r, g, b = img.unbind(1)
+    maxc, _ = img.max(1)
+    minc, _ = img.min(1)
+    delta = maxc - minc
+    safe_delta = torch.where(delta > 0, delta, torch.ones_like(delta))
+
+    hue = torch.where(
+        maxc == r,
+        ((g - b) / safe_delta) % 6,
+        torch.where(maxc == g, (b - r) / safe_delta + 2, (r - g) / safe_delta + 4),
+    )
+    hue = torch.where(delta > 0, hue * 60, torch.zeros_like(hue))
+    saturation = torch.where(maxc > 0, delta / maxc, torch.zeros_like(maxc))
+    return torch.stack([hue, saturation, maxc], 1)
+
+
+def hsv_to_rgb(img):
+    hue, saturation, value = img.unbind(1)
+    chroma = value * saturation
+    sector = hue / 60
+    x = chroma * (1 - ((sector % 2) - 1).abs())
+    zeros = torch.zeros_like(hue)
+    sector = sector.floor().long() % 6
+
+    candidates = [
+        (chroma, x, zeros),
+        (x, chroma, zeros),
+        (zeros, chroma, x),
+        (zeros, x, chroma),
+        (x, zeros, chroma),
+        (chroma, zeros, x),
+    ]
+    rgb = torch.zeros_like(img)
+    for index, candidate in enumerate(candidates):
+        rgb = torch.where((sector == index).unsqueeze(1), torch.stack(candidate, 1), rgb)
+    return rgb + (value - chroma).unsqueeze(1)
+
+
+class RandomHueSaturationValue(BatchTransform):
+    """
+    Shifts are in the uint8 HSV units of OpenCV, hue in half degrees, saturation and
+    value out of 255
+    """
+
+    def __init__(
+        self,
+        hue_shift_limit=(-10, 10),
+        sat_shift_limit=(-25, 25),
+        val_shift_limit=(-25, 25),
+        prob=0.5,
+    ):
+        super().__init__(prob)
+        self.hue_shift_limit = hue_shift_limit
+        self.sat_shift_limit = sat_shift_limit
+        self.val_shift_limit = val_shift_limit
+
+    def apply(self, x, mask, selected):
+        hsv = rgb_to_hsv(x[:, :3].float() / 255)
+        hue_shift = self.uniform(x, *self.hue_shift_limit) * 2
+        sat_shift = self.uniform(x, *self.sat_shift_limit) / 255
+        val_shift = self.uniform(x, *self.val_shift_limit) / 255
+        shift = torch.stack([hue_shift, sat_shift, val_shift], 1).view(-1, 3, 1, 1)
+
+        hsv = hsv + shift
+        hsv = torch.stack(
+            [hsv[:, 0] % 360, hsv[:, 1].clamp(0, 1), hsv[:, 2].clamp(0, 1)], 1
+        )
+        transformed = x.clone()
+        transformed[:, :3] = (hsv_to_rgb(hsv) * 255).round_()
+        return blend(selected, transformed, x), mask
+
+
+class RandomContrast(BatchTransform):
+    def __init__(self, limit=0.1, prob=0.5):
+        super().__init__(prob)
+        self.limit = limit
+
+    def apply(self, x, mask, selected):
+        alpha = per_sample(1.0 + self.limit * self.uniform(x, -1, 1))
+        colored = x[:, :3].float()
+        weight = colored.new_tensor(GRAY_WEIGHT).view(1, 3, 1, 1)
+        gray = (colored * weight).sum(1, keepdim=True).mean(dim=(2, 3), keepdim=True)
+        gray = 3.0 * (1.0 - alpha) * gray
+
+        transformed = x.clone()
+        transformed[:, :3] = clip(alpha * colored + gray, sample_max(x))
+        return blend(selected, transformed, x), mask
+
+
+class RandomBrightness(BatchTransform):
+    def __init__(self, limit=0.1, prob=0.5):
+        super().__init__(prob)
+        self.limit = limit
+
+    def apply(self, x, mask, selected):
+        alpha = per_sample(1.0 + self.limit * self.uniform(x, -1, 1))
+        transformed = x.clone()
+        transformed[:, :3] = clip(alpha * x[:, :3].float(), sample_max(x))
+        return blend(selected, transformed, x), mask
+
+
+class RandomFilter(BatchTransform):
+    """
+    blur sharpen, etc
+    """
+
+    def __init__(self, limit=0.5, prob=0.5):
+        super().__init__(prob)
+        self.limit = limit
+
+    def apply(self, x, mask, selected):
+        alpha = per_sample(self.limit * self.uniform(x, 0, 1))
+        colored = x[:, :3].float()
+        # cv2.filter2D with BORDER_REFLECT_101, the same kernel on every channel
+        kernel = colored.new_full((3, 1, 3, 3), 0.2 / 9)
+        filtered = F.conv2d(F.pad(colored, [1, 1, 1, 1], mode="reflect"), kernel, groups=3)
+
+        transformed = x.clone()
+        transformed[:, :3] = clip(
+            alpha * filtered + (1 - alpha) * colored, sample_max(x)
+        )
+        return blend(selected, transformed, x), mask
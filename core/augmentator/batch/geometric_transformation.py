@@ -0,0 +1,147 @@
+import math
+import random
+
+import torch
+from torch.nn import functional as F
+
+from .augment_type import BatchTransform, blend
+
+__all__ = [
+    "MirrorCrop",
+    "RescaleCrop",
+    "VerticalFlip",
+    "HorizontalFlip",
+    "RandomFlip",
+    "RandomRotate90",
+    "Rotate",
+]
+
+
+def apply_geometric(fn, x, mask, selected):
+    x = blend(selected, fn(x), x)
+    if mask is not None:
+        mask = blend(selected, fn(mask), mask)
+    return x, mask
+
+
+class PerSampleCrop(BatchTransform):
+    """
+    Random crop dimensions differ per sample, the selected samples are transformed one
+    by one on the device
+    """
+
+    dimensions = ()
+
+    def apply(self, x, mask, selected):
+        height, width = x.shape[-2:]
+        dimensions = [dim for dim in self.dimensions if dim < min(height, width)]
+        if len(dimensions) == 0:
+            return x, mask
+        x = x.clone()
+        mask = mask.clone() if mask is not None else None
+        for index in torch.nonzero(selected).flatten().tolist():
+            dim = random.choice(dimensions)
+            row = random.randint(0, height - dim - 1)
+            col = random.randint(0, width - dim - 1)
+            x[index] = self.restore(x[index, :, row : row + dim, col : col + dim], x)
+            if mask is not None:
+                mask[index] = self.restore(
+                    mask[index, :, row : row + dim, col : col + dim], mask
+                )
+        return x, mask
+
+    def restore(self, crop, batch):
+        raise NotImplementedError
+
+
+class MirrorCrop(PerSampleCrop):
+    dimensions = (384, 352, 416)
+
+    def restore(self, crop, batch):
+        height, width = batch.shape[-2:]
+        dim = crop.shape[-1]
+        top, left = (height - dim) // 2, (width - dim) // 2
+        crop = F.pad(
+            crop[None].float(),
+            [left, width - dim - left, top, height - dim - top],
+            mode="reflect",
+        )
+        return crop[0].to(batch.dtype)
+
+
+class RescaleCrop(PerSampleCrop):
+    dimensions = tuple(range(384, 417))
+
+    def restore(self, crop, batch):
+        crop = F.interpolate(crop[None].float(), size=batch.shape[-2:], mode="nearest")
+        return crop[0].to(batch.dtype)
+
+
+class VerticalFlip(BatchTransform):
+    def apply(self, x, mask, selected):
+        return apply_geometric(lambda tensor: tensor.flip(-2), x, mask, selected)
+
+
+class HorizontalFlip(BatchTransform):
+    def apply(self, x, mask, selected):
+        return apply_geometric(lambda tensor: tensor.flip(-1), x, mask, selected)
+
+
+class RandomFlip(BatchTransform):
+    # cv2.flip codes, 0 vertical, 1 horizontal, -1 both
+    flips = ((-2,), (-1,), (-2, -1))
+
+    def apply(self, x, mask, selected):
+        code = torch.randint(len(self.flips), (x.shape[0],), device=x.device)
+        for index, dims in enumerate(self.flips):
+            x, mask = apply_geometric(
+                lambda tensor: tensor.flip(dims), x, mask, selected & (code == index)
+            )
+        return x, mask
+
+
+class RandomRotate90(BatchTransform):
+    def apply(self, x, mask, selected):
+        assert x.shape[-2] == x.shape[-1], "RandomRotate90 needs square images"
+        # random.randint(0, 4) of the sample wise version, 0 and 4 leave the image as is
+        factor = torch.randint(5, (x.shape[0],), device=x.device) % 4
+        for k in range(1, 4):
+            x, mask = apply_geometric(
+                lambda tensor: tensor.rot90(k, (-2, -1)),
+                x,
+                mask,
+                selected & (factor == k),
+            )
+        return x, mask
+
+
+class Rotate(BatchTransform):
+    def __init__(self, limit=90, prob=0.5):
+        super().__init__(prob)
+        self.limit = limit
+
+    def apply(self, x, mask, selected):
+        height, width = x.shape[-2:]
+        angle = self.uniform(x, -self.limit, self.limit) * math.pi / 180
+        angle = torch.where(selected, angle, torch.zeros_like(angle))
+        cos, sin = torch.cos(angle), torch.sin(angle)
+        zeros = torch.zeros_like(angle)
+        theta = torch.stack(
+            [
+                torch.stack([cos, -sin * height / width, zeros], -1),
+                torch.stack([sin * width / height, cos, zeros], -1),
+            ],
+            1,
+        )
+        grid = F.affine_grid(theta, list(x.shape), align_corners=False)
+
+        def rotate(tensor):
+            return F.grid_sample(
+                tensor.float(),
+                grid,
+                mode="bilinear",
+                padding_mode="reflection",
+                align_corners=False,
+            )
+
+        return apply_geometric(rotate, x, mask, selected)
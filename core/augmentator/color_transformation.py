@@ -20,7 +20,7 @@ class CLAHE:
 
     def __call__(self, im, mask):
         if random.random() < self.prob:
-            logger.debug("Running {}".format(self.__class__.__name__))
+            logger.debug("Running %s", self.__class__.__name__)
             img_bgr = cv2.cvtColor(im, cv2.COLOR_RGB2BGR)
             img_yuv = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2YUV)
             clahe_method = cv2.createCLAHE(
@@ -48,7 +48,7 @@ class RandomHueSaturationValue:
 
     def __call__(self, image, mask):
         if random.random() < self.prob:
-            logger.debug("Running {}".format(self.__class__.__name__))
+            logger.debug("Running %s", self.__class__.__name__)
             image = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
             h, s, v = cv2.split(image)
             hue_shift = np.random.uniform(
@@ -76,7 +76,7 @@ class RandomContrast:
 
     def __call__(self, img, mask):
         if random.random() < self.prob:
-            logger.debug("Running {}".format(self.__class__.__name__))
+            logger.debug("Running %s", self.__class__.__name__)
             alpha = 1.0 + self.limit * random.uniform(-1, 1)
             img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
 
@@ -98,7 +98,7 @@ class RandomBrightness:
 
     def __call__(self, img, mask):
         if random.random() < self.prob:
-            logger.debug("Running {}".format(self.__class__.__name__))
+            logger.debug("Running %s", self.__class__.__name__)
             alpha = 1.0 + self.limit * random.uniform(-1, 1)
 
             maxval = np.max(img[..., :3])
@@ -119,7 +119,7 @@ class RandomFilter:
 
     def __call__(self, img, mask):
         if random.random() < self.prob:
-            logger.debug("Running {}".format(self.__class__.__name__))
+            logger.debug("Running %s", self.__class__.__name__)
             alpha = self.limit * random.uniform(0, 1)
             kernel = np.ones((3, 3), np.float32) / 9 * 0.2
 
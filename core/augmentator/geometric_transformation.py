@@ -15,7 +15,7 @@ class MirrorCrop:
 
     def __call__(self, img, mask):
         if random.random() < self.prob:
-            logger.debug("Running {}".format(self.__class__.__name__))
+            logger.debug("Running %s", self.__class__.__name__)
             image_dim = img.shape
             dim = random.choice([384, 352, 416])
             height, width = get_random_crop_x_and_y((dim, dim), img.shape)
@@ -41,7 +41,7 @@ class RescaleCrop:
         if random.random() < self.prob:
             # dim = random.choice([256, 300])
             dim = random.randint(384, 416)
-            logger.debug("Running {} with dim {}".format(self.__class__.__name__, dim))
+            logger.debug("Running %s with dim %s", self.__class__.__name__, dim)
             height, width = get_random_crop_x_and_y((dim, dim), img.shape)
             img = crop_image(img, (dim, dim), (height, width))
             mask = crop_image(mask, (dim, dim), (height, width))
@@ -57,7 +57,7 @@ class VerticalFlip:
 
     def __call__(self, img, mask=None):
         if random.random() < self.prob:
-            logger.debug("Running {}".format(self.__class__.__name__))
+            logger.debug("Running %s", self.__class__.__name__)
             img = cv2.flip(img, 0)
             if mask is not None:
                 mask = cv2.flip(mask, 0)
@@ -71,7 +71,7 @@ class HorizontalFlip:
 
     def __call__(self, img, mask=None):
         if random.random() < self.prob:
-            logger.debug("Running {}".format(self.__class__.__name__))
+            logger.debug("Running %s", self.__class__.__name__)
             img = cv2.flip(img, 1)
             if mask is not None:
                 mask = cv2.flip(mask, 1)
@@ -86,7 +86,7 @@ class RandomFlip:
     def __call__(self, img, mask=None):
         if random.random() < self.prob:
             d = random.randint(-1, 1)
-            logger.debug("Running {} with flip {}".format(self.__class__.__name__, d))
+            logger.debug("Running %s with flip %s", self.__class__.__name__, d)
             img = cv2.flip(img, d)
             if mask is not None:
                 mask = cv2.flip(mask, d)
@@ -101,9 +101,7 @@ class RandomRotate90:
     def __call__(self, img, mask=None):
         if random.random() < self.prob:
             factor = random.randint(0, 4)
-            logger.debug(
-                "Running {} with factor {}".format(self.__class__.__name__, factor)
-            )
+            logger.debug("Running %s with factor %s", self.__class__.__name__, factor)
             img = np.rot90(img, factor)
             if mask is not None:
                 mask = np.rot90(mask, factor)
@@ -118,7 +116,7 @@ class Rotate:
 
     def __call__(self, img, mask=None):
         if random.random() < self.prob:
-            logger.debug("Running {}".format(self.__class__.__name__))
+            logger.debug("Running %s", self.__class__.__name__)
             angle = random.uniform(-self.limit, self.limit)
 
             height, width = img.shape[0:2]
@@ -0,0 +1,100 @@
+import io
+import os
+import queue
+import threading
+
+import torch
+
+from core.logger import ChronosLogger
+
+logger = ChronosLogger.get_logger()
+
+
+def snapshot_state(state):
+    # A single CPU copy of every tensor, the training loop is free to keep updating
+    # the originals while the copy is serialized
+    if isinstance(state, torch.Tensor):
+        return state.detach().to("cpu", copy=True)
+    if isinstance(state, dict):
+        return type(state)((key, snapshot_state(value)) for key, value in state.items())
+    if isinstance(state, (list, tuple)):
+        return type(state)(snapshot_state(value) for value in state)
+    return state
+
+
+def save_state(state, paths):
+    """
+    Serialize state once and write the same bytes to every path, through a temporary
+    file and an atomic rename
+
+    :param state:
+    :param paths:
+    :return:
+    """
+    buffer = io.BytesIO()
+    torch.save(state, buffer)
+    for path in paths:
+        CheckpointWriter.write(buffer.getbuffer(), str(path))
+
+
+class CheckpointWriter:
+    """
+    Serializes states on a background thread, every state is serialized once and the
+    bytes are written to all of its paths through a temporary file and an atomic rename
+    """
+
+    def __init__(self, max_queue=2):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.exception = None
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def save(self, state, paths):
+        assert not self.closed, "CheckpointWriter is closed"
+        self.raise_exception()
+        # Blocks the caller once max_queue states are waiting to be written
+        self.queue.put((state, [str(path) for path in paths]))
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                break
+            state, paths = item
+            try:
+                save_state(state, paths)
+                logger.debug("Checkpoint Written {}".format(paths))
+            except Exception as ex:
+                logger.exception("Checkpoint Write Failed {}".format(paths))
+                self.exception = ex
+            finally:
+                self.queue.task_done()
+
+    @staticmethod
+    def write(data, path):
+        temp_path = "{}.tmp".format(path)
+        with open(temp_path, "wb") as writer:
+            writer.write(data)
+            writer.flush()
+            os.fsync(writer.fileno())
+        os.replace(temp_path, path)
+
+    def flush(self):
+        self.queue.join()
+        self.raise_exception()
+
+    def close(self):
+        # Idempotent, waits for every queued state, later calls only re raise a failed
+        # write that was not raised yet
+        if not self.closed:
+            self.closed = True
+            self.queue.put(None)
+            self.thread.join()
+        self.raise_exception()
+
+    def raise_exception(self):
+        if self.exception is not None:
+            exception, self.exception = self.exception, None
+            raise exception
@@ -2,15 +2,14 @@ import os
 import random
 import shutil
 
-import torch
 import warnings
 import time
 
+from core.checkpoint import save_state
 from utils.network_util import adjust_model
 from core.logger import debug, ChronosLogger
 from utils import date_time
 from utils.directory_ops import make_directory
-from utils.function_util import is_overridden_func
 from utils.system_printer import SystemPrinter
 
 with warnings.catch_warnings():
@@ -20,107 +19,93 @@ with warnings.catch_warnings():
 logger = ChronosLogger.get_logger()
 
 
+HOOKS = (
+    "on_epoch_begin",
+    "on_epoch_end",
+    "on_batch_begin",
+    "on_batch_end",
+    "on_begin",
+    "on_end",
+    "interruption",
+    "update_params",
+)
+
+
+def is_overridden_hook(callback, hook):
+    return getattr(type(callback), hook) is not getattr(Callback, hook)
+
+
 class CallbackList(object):
     def __init__(self, callbacks=None):
         callbacks = callbacks or []
-        self.callbacks = [c for c in callbacks]
-        if len(callbacks) != 0:
-            [
-                logger.debug("Registered {}".format(c.__class__.__name__))
-                for c in callbacks
-            ]
+        self.callbacks = list()
+        # Callbacks overriding each hook, resolved once on registration so a step only
+        # calls the hooks that do something
+        self.hooks = {hook: list() for hook in HOOKS}
+        self.timer = None
+        for callback in callbacks:
+            self.append(callback)
 
     def append(self, callback):
-        logger.debug("Registered {}".format(callback.__class__.__name__))
+        logger.debug("Registered %s", callback.__class__.__name__)
         self.callbacks.append(callback)
+        for hook in HOOKS:
+            if is_overridden_hook(callback, hook):
+                self.hooks[hook].append(callback)
+            else:
+                logger.debug(
+                    "Nothing Registered On %s %s", hook, callback.__class__.__name__
+                )
 
     def on_epoch_begin(self, epoch, logs=None):
         logs = logs or {}
-        for callback in self.callbacks:
-            logger.debug("On Epoch Begin {}".format(callback.__class__.__name__))
-            if not is_overridden_func(callback.on_epoch_begin):
-                logger.debug(
-                    "Nothing Registered On Epoch Begin {}".format(
-                        callback.__class__.__name__
-                    )
-                )
-            callback.on_epoch_begin(epoch, logs)
+        for callback in self.hooks["on_epoch_begin"]:
+            logger.debug("On Epoch Begin %s", callback.__class__.__name__)
+            self.dispatch(callback, "on_epoch_begin", epoch, logs)
 
     def on_epoch_end(self, epoch, logs=None):
         logs = logs or {}
-        for callback in self.callbacks:
-            logger.debug("On Epoch End {}".format(callback.__class__.__name__))
-            if not is_overridden_func(callback.on_epoch_end):
-                logger.debug(
-                    "Nothing Registered On Epoch End {}".format(
-                        callback.__class__.__name__
-                    )
-                )
-            callback.on_epoch_end(epoch, logs)
+        for callback in self.hooks["on_epoch_end"]:
+            logger.debug("On Epoch End %s", callback.__class__.__name__)
+            self.dispatch(callback, "on_epoch_end", epoch, logs)
 
     def on_batch_begin(self, batch, logs=None):
-        for callback in self.callbacks:
-            logger.debug("On Batch Begin {}".format(callback.__class__.__name__))
-            if not is_overridden_func(callback.on_batch_begin):
-                logger.debug(
-                    "Nothing Registered On Batch Begin {}".format(
-                        callback.__class__.__name__
-                    )
-                )
-            callback.on_batch_begin(batch, logs)
+        for callback in self.hooks["on_batch_begin"]:
+            self.dispatch(callback, "on_batch_begin", batch, logs)
 
     def on_batch_end(self, batch, logs=None):
-
-        for callback in self.callbacks:
-            logger.debug("On Batch End {}".format(callback.__class__.__name__))
-            if not is_overridden_func(callback.on_batch_end):
-                logger.debug(
-                    "Nothing Registered On Batch End {}".format(
-                        callback.__class__.__name__
-                    )
-                )
-            callback.on_batch_end(batch, logs)
+        for callback in self.hooks["on_batch_end"]:
+            self.dispatch(callback, "on_batch_end", batch, logs)
 
     def on_begin(self, logs=None):
         logs = logs or {}
-        for callback in self.callbacks:
-            logger.debug("On Begin {}".format(callback.__class__.__name__))
-            if not is_overridden_func(callback.on_begin):
-                logger.debug(
-                    "Nothing Registered On Begin {}".format(callback.__class__.__name__)
-                )
+        for callback in self.hooks["on_begin"]:
+            logger.debug("On Begin %s", callback.__class__.__name__)
             callback.on_begin(logs)
 
     def on_end(self, logs=None):
         logs = logs or {}
-        for callback in self.callbacks:
-            logger.debug("On End {}".format(callback.__class__.__name__))
-            if not is_overridden_func(callback.on_end):
-                logger.debug(
-                    "Nothing Registered On End {}".format(callback.__class__.__name__)
-                )
+        for callback in self.hooks["on_end"]:
+            logger.debug("On End %s", callback.__class__.__name__)
             callback.on_end(logs)
 
     def interruption(self, logs=None):
         logs = logs or {}
-        for callback in self.callbacks:
-            logger.debug("Interruption {}".format(callback.__class__.__name__))
-            if not is_overridden_func(callback.interruption):
-                logger.debug(
-                    "Nothing Registered On Interruption {}".format(
-                        callback.__class__.__name__
-                    )
-                )
+        for callback in self.hooks["interruption"]:
+            logger.debug("Interruption %s", callback.__class__.__name__)
             callback.interruption(logs)
 
+    def dispatch(self, callback, hook, *args):
+        if self.timer is None or not self.timer.enabled:
+            return getattr(callback, hook)(*args)
+        return self.timer.call(
+            "{}.{}".format(callback.__class__.__name__, hook),
+            getattr(callback, hook),
+            *args
+        )
+
     def update_params(self, params):
-        for callback in self.callbacks:
-            if not is_overridden_func(callback.update_params):
-                logger.debug(
-                    "Nothing Registered On Update param {}".format(
-                        callback.__class__.__name__
-                    )
-                )
+        for callback in self.hooks["update_params"]:
             callback.update_params(params)
 
     def __iter__(self):
@@ -158,44 +143,97 @@ class Callback(object):
 
 class TrainStateCallback(Callback):
     @debug
-    def __init__(self, save_path, best_save_path):
+    def __init__(self, save_path, best_save_path, writer=None):
         super().__init__()
         self.chk = save_path
         self.best = best_save_path
         self.previous_best = None
+        self.writer = writer
 
     def on_epoch_end(self, epoch, logs=None):
         valid_loss = logs["valid_loss"]
         my_state = logs["my_state"]
+        save_path = [self.chk]
         if self.previous_best is None or valid_loss < self.previous_best:
             self.previous_best = valid_loss
-            torch.save(my_state, str(self.best))
-        torch.save(my_state, str(self.chk))
+            save_path.insert(0, self.best)
+        self.save(my_state, save_path)
         logger.debug(
-            "Successful on Epoch End {}, Saved State".format(self.__class__.__name__)
+            "Successful on Epoch End %s, Saved State", self.__class__.__name__
         )
 
     def interruption(self, logs=None):
         my_state = logs["my_state"]
 
-        torch.save(my_state, str(self.chk))
+        self.save(my_state, [self.chk])
+        if self.writer is not None:
+            self.writer.flush()
         logger.debug(
-            "Successful on Interruption {}, Saved State".format(self.__class__.__name__)
+            "Successful on Interruption %s, Saved State", self.__class__.__name__
+        )
+
+    def on_end(self, logs=None):
+        # The callback owning the shared writer, TrainChkCallback only flushes it
+        if self.writer is not None:
+            self.writer.close()
+
+    def save(self, state, save_path):
+        if self.writer is not None:
+            self.writer.save(state, save_path)
+        else:
+            save_state(state, save_path)
+
+
+class ScalarWriter:
+    """
+    Scalars written to a SummaryWriter in one place, held in memory until
+    flush_steps of them are buffered or flush_secs have passed, without either
+    every scalar is written and flushed right away. Values are read as float only
+    when written, so lazily timed spans resolve at flush
+    """
+
+    def __init__(self, writer, flush_steps=None, flush_secs=None):
+        self.writer = writer
+        self.flush_steps = flush_steps
+        self.flush_secs = flush_secs
+        self.buffered = flush_steps is not None or flush_secs is not None
+        self.pending = list()
+        self.last_flush = time.time()
+
+    def add(self, tag, y, x):
+        self.pending.append((tag, y, x))
+        if not self.buffered or self.due():
+            self.flush()
+
+    def due(self):
+        return (
+            self.flush_steps is not None and len(self.pending) >= self.flush_steps
+        ) or (
+            self.flush_secs is not None
+            and time.time() - self.last_flush >= self.flush_secs
         )
 
+    def flush(self):
+        for tag, y, x in self.pending:
+            if type(y) is dict:
+                self.writer.add_scalars(
+                    tag, {key: float(value) for key, value in y.items()}, global_step=x
+                )
+            else:
+                self.writer.add_scalar(tag, float(y), global_step=x)
+        self.pending = list()
+        self.last_flush = time.time()
+        self.writer.flush()
+
 
 class TensorBoardCallback(Callback):
-    def __init__(self, log_dir):
+    def __init__(self, log_dir, flush_steps=None, flush_secs=None):
         super().__init__()
         self.writer = SummaryWriter(make_directory(log_dir, "events"))
+        self.scalars = ScalarWriter(self.writer, flush_steps, flush_secs)
 
     def plt_scalar(self, y, x, tag):
-        if type(y) is dict:
-            self.writer.add_scalars(tag, y, global_step=x)
-            self.writer.flush()
-        else:
-            self.writer.add_scalar(tag, y, global_step=x)
-            self.writer.flush()
+        self.scalars.add(tag, y, x)
 
     def plt_images(self, img, global_step, tag):
         self.writer.add_image(tag, img, global_step)
@@ -211,7 +249,9 @@ class TensorBoardCallback(Callback):
 
         self.plt_scalar(lr, epoch, "LR/Epoch")
         self.plt_scalar(
-            {"train_loss": train_loss, "valid_loss": valid_loss}, epoch, "Loss/Epoch"
+            {"train_loss": train_loss, "valid_loss": valid_loss},
+            epoch,
+            "Loss/Epoch",
         )
 
         metric_keys = list(train_metric.keys())
@@ -224,9 +264,11 @@ class TensorBoardCallback(Callback):
                 epoch,
                 "{}/Epoch".format(key),
             )
+        # Buffered step scalars and the epoch go out with a single flush
+        self.scalars.flush()
 
         logger.debug(
-            "Successful on Epoch End {}, Data Plot".format(self.__class__.__name__)
+            "Successful on Epoch End %s, Data Plot", self.__class__.__name__
         )
 
     def on_batch_end(self, batch, logs=None):
@@ -238,10 +280,20 @@ class TensorBoardCallback(Callback):
             pass
 
         self.plt_scalar(data["data"], batch, data["tag"])
+        if "plt_time" in logs:
+            time_data = logs["plt_time"]
+            for phase, value in time_data["data"].items():
+                self.plt_scalar(value, batch, "{}/{}".format(time_data["tag"], phase))
         logger.debug(
-            "Successful on Batch End {}, Data Plot".format(self.__class__.__name__)
+            "Successful on Batch End %s, Data Plot", self.__class__.__name__
         )
 
+    def interruption(self, logs=None):
+        self.scalars.flush()
+
+    def on_end(self, logs=None):
+        self.scalars.flush()
+
 
 class SchedulerCallback(Callback):
     def __init__(self, scheduler):
@@ -251,7 +303,7 @@ class SchedulerCallback(Callback):
     def on_epoch_end(self, epoch, logs=None):
         self.scheduler.step(epoch)
         logger.debug(
-            "Successful on Epoch End {}, Lr Scheduled".format(self.__class__.__name__)
+            "Successful on Epoch End %s, Lr Scheduled", self.__class__.__name__
         )
 
 
@@ -276,20 +328,34 @@ class TimeCallback(Callback):
 
 class TrainChkCallback(Callback):
     @debug
-    def __init__(self, save_path):
+    def __init__(self, save_path, writer=None):
         super().__init__()
         self.chk = save_path
+        self.writer = writer
 
     def on_epoch_end(self, epoch, logs=None):
         my_state = logs["my_state"]
-        torch.save(adjust_model(my_state["model"]), str(self.chk))
+        self.save(adjust_model(my_state["model"]))
         logger.debug(
-            "Successful on Epoch End {}, Chk Saved".format(self.__class__.__name__)
+            "Successful on Epoch End %s, Chk Saved", self.__class__.__name__
         )
 
     def interruption(self, logs=None):
         my_state = logs["my_state"]
-        torch.save(adjust_model(my_state["model"]), str(self.chk))
+        self.save(adjust_model(my_state["model"]))
+        if self.writer is not None:
+            self.writer.flush()
         logger.debug(
-            "Successful on interruption {}, Chk Saved".format(self.__class__.__name__)
+            "Successful on interruption %s, Chk Saved", self.__class__.__name__
         )
+
+    def on_end(self, logs=None):
+        # Closed by TrainStateCallback which shares the writer
+        if self.writer is not None:
+            self.writer.flush()
+
+    def save(self, model_state):
+        if self.writer is not None:
+            self.writer.save(model_state, [self.chk])
+        else:
+            save_state(model_state, [self.chk])
@@ -3,13 +3,14 @@ from torch import Tensor
 
 from core.logger import ChronosLogger
 from utils.dict_ops import handle_dictionary
+from utils.distributed import all_reduce_mean, all_reduce_sum
 from utils.pt_tensor import convert_tensor_to_numpy
 
 logger = ChronosLogger.get_logger()
 
 
 class MetricList:
-    def __init__(self, metrics):
+    def __init__(self, metrics, streaming=False):
         metrics = metrics or []
         self.metrics = [c for c in metrics]
         if len(metrics) != 0:
@@ -19,6 +20,12 @@ class MetricList:
             ]
         self.metric_value = dict()
 
+        # In streaming mode the confusion counts of every batch are summed on device
+        # and the metrics are derived once from the epoch totals in compute_mean
+        self.streaming = streaming
+        self.confusion = dict()
+        self.timer = None
+
     def append(self, callback):
         logger.debug("Registered {}".format(callback.__class__.__name__))
         self.metrics.append(callback)
@@ -30,20 +37,78 @@ class MetricList:
 
     def compute_metric(self, ground_truth: dict, prediction: dict):
         computed_metric = dict()
+        batch_confusion = dict()
         for metric in self.metrics:
-            value = metric.compute_metric(ground_truth, prediction)
-            computed_metric[metric.__class__.__name__] = value
+            if self.timer is not None and self.timer.enabled:
+                value = self.timer.call(
+                    "{}.compute_metric".format(metric.__class__.__name__),
+                    self.compute_single_metric,
+                    metric,
+                    ground_truth,
+                    prediction,
+                    batch_confusion,
+                )
+            else:
+                value = self.compute_single_metric(
+                    metric, ground_truth, prediction, batch_confusion
+                )
+            if value is not None:
+                computed_metric[metric.__class__.__name__] = value
+
+        if self.streaming:
+            for confusion_fn, confusion in batch_confusion.items():
+                if confusion_fn in self.confusion:
+                    self.confusion[confusion_fn] += confusion
+                else:
+                    self.confusion[confusion_fn] = confusion
         return computed_metric
 
+    def compute_single_metric(self, metric, ground_truth, prediction, batch_confusion):
+        if not isinstance(metric, ConfusionMetric):
+            return metric.compute_metric(ground_truth, prediction)
+
+        # Metrics sharing a compute_confusion share a single pass over the batch
+        confusion_fn = metric.compute_confusion
+        if confusion_fn not in batch_confusion:
+            batch_confusion[confusion_fn] = confusion_fn(ground_truth, prediction)
+        if self.streaming:
+            return None
+        return metric.compute_from_confusion(*batch_confusion[confusion_fn].tolist())
+
     def compute_mean(self):
         mean_metric = dict()
         for key, value in self.metric_value.items():
             assert type(value) is list
-            mean_value = np.mean(value)
+            mean_value = all_reduce_mean(np.mean(value))
             mean_metric = handle_dictionary(mean_metric, key, mean_value)
+
+        if self.streaming:
+            mean_metric = {**mean_metric, **self.compute_streaming()}
+            mean_metric = {
+                metric.__class__.__name__: mean_metric[metric.__class__.__name__]
+                for metric in self.metrics
+                if metric.__class__.__name__ in mean_metric
+            }
         self.metric_value = dict()
+        self.confusion = dict()
         return mean_metric
 
+    def compute_streaming(self):
+        streaming_metric = dict()
+        # Counts of every process are summed before the metrics are derived
+        confusion = {
+            confusion_fn: all_reduce_sum(counts).tolist()
+            for confusion_fn, counts in self.confusion.items()
+        }
+        for metric in self.metrics:
+            if isinstance(metric, ConfusionMetric):
+                if metric.compute_confusion not in confusion:
+                    continue
+                streaming_metric[
+                    metric.__class__.__name__
+                ] = metric.compute_from_confusion(*confusion[metric.compute_confusion])
+        return streaming_metric
+
 
 class Metric:
     def compute_metric(self, ground_truth: dict, prediction: dict):
@@ -55,3 +120,27 @@ class Metric:
             return convert_tensor_to_numpy(ip)
         elif type(ip) == np.ndarray:
             return ip
+
+
+class ConfusionMetric(Metric):
+    """
+    Metric derived from the tp, fp, fn, tn counts, which can be those of a single
+    batch or, in streaming mode, of the whole epoch
+    """
+
+    @staticmethod
+    def compute_confusion(ground_truth: dict, prediction: dict) -> Tensor:
+        """
+
+        :param ground_truth:
+        :param prediction:
+        :return: integer tensor holding [tp, fp, fn, tn], left on the prediction device
+        """
+        raise NotImplementedError
+
+    def compute_from_confusion(self, tp, fp, fn, tn):
+        raise NotImplementedError
+
+    def compute_metric(self, ground_truth: dict, prediction: dict):
+        confusion = self.compute_confusion(ground_truth, prediction)
+        return self.compute_from_confusion(*confusion.tolist())
@@ -1,15 +1,30 @@
+import os
 import random
+from contextlib import nullcontext
 
 import numpy as np
 import torch
 
 import tqdm
+from torch.cuda.amp import GradScaler, autocast
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data.distributed import DistributedSampler
 
+from core.checkpoint import snapshot_state
 from core.extensions.callbacks import CallbackList, SchedulerCallback
 from core.extensions.metric import MetricList
+from core.profiler import PhaseTimer, create_trace, epoch_table
 from utils import pt_tensor
 from core.state import LearnerState
 from utils.dict_ops import dict_to_string, handle_dictionary
+from utils.directory_ops import make_directory
+from utils.multi_crop import MultiCropBatchSampler
+from utils.distributed import (
+    is_distributed,
+    is_main_process,
+    all_reduce_mean,
+    unwrap_model,
+)
 from core.logger import info, ChronosLogger
 from ml.scheduler import get_scheduler
 from utils.system_printer import SystemPrinter
@@ -29,9 +44,12 @@ class Learner(LearnerState):
 
         batch_size = self.config.batch_size
         epochs = self.config.n_epochs
+        scaler = GradScaler(
+            enabled=self.config.mixed_precision and torch.cuda.is_available()
+        )
         self.restart(
-            plugin.model, optimizer, self.config.default_state
-        ) if self.config.resume else self.new(plugin.model, optimizer)
+            plugin.model, optimizer, scaler, self.config.default_state
+        ) if self.config.resume else self.new(plugin.model, optimizer, scaler)
 
         if self.config.scheduler_name is not None:
             scheduler = get_scheduler(
@@ -45,6 +63,9 @@ class Learner(LearnerState):
             training_callbacks.append(SchedulerCallback(scheduler))
         training_callbacks.on_begin()
 
+        timer = PhaseTimer(self.config.step_timing or self.config.profile)
+        training_callbacks.timer = timer
+
         begin_epoch = self.starting_epoch
         for ongoing_epoch in range(begin_epoch, epochs + 1):
             epoch_logs = dict()
@@ -54,7 +75,14 @@ class Learner(LearnerState):
             self.model.train()
             lr = self.optimizer.param_groups[0]["lr"]
 
-            progress_bar = tqdm.tqdm(total=(len(plugin.loader.train_data) * batch_size))
+            self.set_sampler_epoch(plugin, ongoing_epoch)
+            # Epoch hooks are timed per callback like the step hooks, so the epoch
+            # profile accounts for them
+            training_callbacks.on_epoch_begin(self.starting_epoch)
+            progress_bar = tqdm.tqdm(
+                total=(len(plugin.loader.train_data) * batch_size),
+                disable=not is_main_process(),
+            )
             progress_bar.set_description(
                 "Epoch {}, lr {}".format(self.starting_epoch, lr)
             )
@@ -64,11 +92,13 @@ class Learner(LearnerState):
                 epoch_logs = handle_dictionary(epoch_logs, "lr", lr)
 
                 train_loss, train_metric, progress_bar = self.state_train(
-                    plugin, training_callbacks, batch_size, metrics, progress_bar
+                    plugin, training_callbacks, batch_size, metrics, progress_bar, timer
                 )
                 progress_bar.close()
 
-                valid_loss, valid_metric = self.state_validate(plugin, metrics)
+                valid_loss, valid_metric = timer.call(
+                    "validation", self.state_validate, plugin, metrics
+                )
 
                 epoch_logs = handle_dictionary(epoch_logs, "train_loss", train_loss)
                 epoch_logs = handle_dictionary(epoch_logs, "valid_loss", valid_loss)
@@ -79,15 +109,26 @@ class Learner(LearnerState):
                 if (self.bst_vld_loss is None) or (valid_loss < self.bst_vld_loss):
                     self.bst_vld_loss = valid_loss
 
-                epoch_logs = handle_dictionary(epoch_logs, "model", self.model)
+                epoch_logs = handle_dictionary(epoch_logs, "model", self.callback_model)
                 epoch_logs = handle_dictionary(
                     epoch_logs, "test_loader", plugin.loader.test_data
                 )
 
+                # Only rank 0 registers the callbacks that save the state
                 training_callbacks.on_epoch_end(
-                    self.starting_epoch, logs={**epoch_logs, **self.epoch_state}
+                    self.starting_epoch,
+                    logs={
+                        **epoch_logs,
+                        **(self.get_epoch_state() if is_main_process() else {}),
+                    },
                 )
 
+                epoch_time, epoch_count = timer.collect_epoch()
+                if self.config.profile:
+                    table = epoch_table(epoch_time, epoch_count)
+                    logger.debug("Epoch {} Profile\n{}".format(ongoing_epoch, table))
+                    SystemPrinter.sys_print("Epoch Profile\n{}".format(table))
+
                 logger.debug(
                     "Train Loss {}, Valid Loss {}".format(train_loss, valid_loss)
                 )
@@ -105,11 +146,12 @@ class Learner(LearnerState):
                 SystemPrinter.sys_print(
                     "Valid Metric: {}".format(dict_to_string(valid_metric))
                 )
+                self.log_image_cache(plugin)
 
             except KeyboardInterrupt:
                 progress_bar.close()
                 training_callbacks.interruption(
-                    logs={**epoch_logs, **self.interruption_state}
+                    logs={**epoch_logs, **self.get_interruption_state()}
                 )
                 SystemPrinter.sys_print(
                     "KEYBOARD EXCEPTION CHECKPOINT SAVED : {}".format(ongoing_epoch)
@@ -123,12 +165,77 @@ class Learner(LearnerState):
         SystemPrinter.sys_print("Training Complete")
         training_callbacks.on_end()
 
-    def state_train(self, plugin, callbacks, batch_size, metrics, progress_bar):
+    @property
+    def callback_model(self):
+        # A DistributedDataParallel forward on rank 0 alone would wait on the buffer
+        # broadcast of the other ranks, callbacks get the unwrapped module
+        return unwrap_model(self.model) if is_distributed() else self.model
+
+    @staticmethod
+    def log_image_cache(plugin):
+        for mode, loader in (
+            ("Train", plugin.loader.train_data),
+            ("Valid", plugin.loader.val_data),
+        ):
+            image_cache = getattr(loader.dataset, "image_cache", None)
+            if image_cache is None:
+                continue
+            # Counters are shared by every worker and reset for the next epoch
+            statistics = image_cache.statistics()
+            logger.debug("%s Image Cache %s", mode, statistics)
+            SystemPrinter.sys_print(
+                "{} Image Cache: hit rate {:.3f}, {} cached, {} MB".format(
+                    mode,
+                    statistics["hit_rate"],
+                    statistics["cached"],
+                    statistics["cached_bytes"] // 2 ** 20,
+                )
+            )
+
+    @staticmethod
+    def set_sampler_epoch(plugin, epoch):
+        for loader in (plugin.loader.train_data, plugin.loader.val_data):
+            # The validation cache replays fixed batches and has no sampler
+            sampler = getattr(loader, "sampler", None)
+            batch_sampler = getattr(loader, "batch_sampler", None)
+            if isinstance(sampler, DistributedSampler):
+                sampler.set_epoch(epoch)
+            if isinstance(batch_sampler, MultiCropBatchSampler):
+                batch_sampler.set_epoch(epoch)
+
+    def get_epoch_state(self):
+        # One CPU snapshot per epoch, the state, best state and chk writes all
+        # serialize the same tensors
+        return snapshot_state(self.epoch_state)
+
+    def get_interruption_state(self):
+        return snapshot_state(self.interruption_state)
+
+    def state_train(self, plugin, callbacks, batch_size, metrics, progress_bar, timer):
 
         report_each = 100
+        accumulation_steps = self.config.accumulation_steps
+        trace = (
+            create_trace(
+                make_directory(
+                    os.path.join(self.config.training_path, self.config.version),
+                    "profile",
+                ),
+                self.starting_epoch,
+                self.config.profile_trace_steps,
+            )
+            if self.config.profile and self.config.profile_trace
+            else None
+        )
+        if trace is not None:
+            trace.start()
+        # Metrics are timed per metric in training, validation is timed as a whole
+        metrics.timer = timer
         batch_loss = []
         mean_loss = 0
+        timer.start()
         for images, ground_truth in plugin.loader.train_data:
+            timer.lap("data")
             batch_logs = dict()
             callbacks.on_batch_begin(self.step, logs=batch_logs)
             if not self.model.training:
@@ -136,20 +243,46 @@ class Learner(LearnerState):
 
             images = pt_tensor.make_cuda(images)
             ground_truth = pt_tensor.make_cuda(ground_truth)
-
-            prediction = self.model(images)
-            assert type(prediction) == dict, "Model Must Return A Dict"
-            calculated_loss = plugin.criterion(ground_truth, prediction)
-            self.optimizer.zero_grad()
-            calculated_loss.backward()
-            self.optimizer.step()
+            images, ground_truth = plugin.loader.train_data.dataset.transform_batch(
+                images, ground_truth
+            )
+            images = plugin.loader.train_data.dataset.normalize_batch(images)
+            timer.lap("transfer")
+
+            # Gradients of accumulation_steps batches are summed before one step, under
+            # DistributedDataParallel they are only all reduced on the last of them
+            sync = (
+                not isinstance(self.model, DistributedDataParallel)
+                or self.accumulation_step + 1 == accumulation_steps
+            )
+            with nullcontext() if sync else self.model.no_sync():
+                with autocast(enabled=self.scaler.is_enabled()):
+                    prediction = self.model(images)
+                    assert type(prediction) == dict, "Model Must Return A Dict"
+                    calculated_loss = plugin.criterion(ground_truth, prediction)
+                timer.lap("forward")
+
+                if self.accumulation_step == 0:
+                    self.optimizer.zero_grad()
+                self.scaler.scale(calculated_loss / accumulation_steps).backward()
+            timer.lap("backward")
+            self.accumulation_step += 1
+            if self.accumulation_step == accumulation_steps:
+                self.scaler.step(self.optimizer)
+                self.scaler.update()
+                self.accumulation_step = 0
+            timer.lap("optimizer")
 
             batch_loss.append(calculated_loss.item())
             mean_loss = np.mean(batch_loss[-report_each:])
             batch_logs = handle_dictionary(
                 batch_logs, "plt_lr", {"data": mean_loss, "tag": "Loss/Step"}
             )
-            batch_logs = handle_dictionary(batch_logs, "model", self.model)
+            if timer.enabled:
+                batch_logs = handle_dictionary(
+                    batch_logs, "plt_time", {"data": timer.collect(), "tag": "Time"}
+                )
+            batch_logs = handle_dictionary(batch_logs, "model", self.callback_model)
             batch_logs = handle_dictionary(
                 batch_logs, "test_loader", plugin.loader.test_data
             )
@@ -158,7 +291,13 @@ class Learner(LearnerState):
             progress_bar.set_postfix(loss="{:.5f}".format(mean_loss))
             self.step += 1
             metrics.get_metrics(ground_truth=ground_truth, prediction=prediction)
-        return mean_loss.item(), metrics.compute_mean(), progress_bar
+            if trace is not None:
+                trace.step()
+            timer.start()
+        if trace is not None:
+            trace.stop()
+        metrics.timer = None
+        return all_reduce_mean(mean_loss.item()), metrics.compute_mean(), progress_bar
 
     @torch.no_grad()
     def state_validate(self, plugin, metrics):
@@ -180,6 +319,7 @@ class Learner(LearnerState):
 
             ongoing_count += 1
             images = pt_tensor.make_cuda(images)
+            images = plugin.loader.val_data.dataset.normalize_batch(images)
             ground_truth = pt_tensor.make_cuda(ground_truth)
 
             prediction = self.model(images)
@@ -188,5 +328,5 @@ class Learner(LearnerState):
             losses.append(loss.item())
             metrics.get_metrics(ground_truth=ground_truth, prediction=prediction)
 
-        valid_loss = np.mean(losses)
+        valid_loss = all_reduce_mean(np.mean(losses))
         return valid_loss, metrics.compute_mean()
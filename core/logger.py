@@ -30,10 +30,12 @@ class ChronosLogger:
         logger.addHandler(ch)
 
     @staticmethod
-    def create_time_rotated_log(log_path, plugin, exp_name, model, version, logger):
+    def create_time_rotated_log(
+        log_path, plugin, exp_name, model, version, logger, level=logging.DEBUG
+    ):
         extensive_log_file = os.path.join(log_path, exp_name + ".log")
         tfl = TimedRotatingFileHandler(extensive_log_file, when="D")
-        tfl.setLevel(logging.DEBUG)
+        tfl.setLevel(level)
         rfl_format = logging.Formatter(
             "%(asctime)s %(name)s : %(levelname)-5s : Plugin: {:5} : ExpName: {:5} : Model: {:5} : Version: {:5} "
             ": %(message)s".format(plugin, exp_name, model, version)
@@ -53,17 +55,30 @@ class ChronosLogger:
         fl.setFormatter(fl_format)
         logger.addHandler(fl)
 
-    def create_logger(self, folder_path, plugin, exp_name, model, version):
+    def create_logger(
+        self, folder_path, plugin, exp_name, model, version, level=logging.DEBUG
+    ):
+        # level below INFO only reaches the time rotated log, at INFO and above debug
+        # records are dropped on the level check before any formatting
         logger = self.get_logger()
-        logger.setLevel(logging.DEBUG)
+        logger.setLevel(level)
         log_path = make_directory(folder_path, "logs")
         self.create_channel_log(logger)
         self.create_file_log(log_path, plugin, exp_name, model, version, logger)
-        self.create_time_rotated_log(log_path, plugin, exp_name, model, version, logger)
+        self.create_time_rotated_log(
+            log_path, plugin, exp_name, model, version, logger, level
+        )
         logger.info("Experiment {} conducted on : {}".format(exp_name, get_date()))
 
         sys.stdout.writelines = logger.info
 
+    def create_console_logger(self, level=logging.DEBUG):
+        logger = self.get_logger()
+        logger.setLevel(level)
+        self.create_channel_log(logger)
+
+        sys.stdout.writelines = logger.info
+
 
 def exception(func):
     @functools.wraps(func)
@@ -112,24 +127,27 @@ def debug(func):
     def wrapper(*args, **kwargs):
 
         logger = ChronosLogger.get_logger()
-        class_name, func_name = get_details(func)
-        func_args = args
-        func_kwargs = kwargs
-
-        if class_name is not None:
-            msg_str = "Class - {:2} : Function - {:3} : args - {:3} : kwargs - {}".format(
-                class_name, str(func_name), str(func_args), str(func_kwargs)
-            )
-        else:
-            msg_str = "Function - {:3} : args - {:3} : kwargs - {}".format(
-                func_name, str(func_args), str(func_kwargs)
-            )
+        # arguments can be tensors and models, only stringify them when the record
+        # is going to be emitted
+        enabled = logger.isEnabledFor(logging.DEBUG)
+        if enabled:
+            class_name, func_name = get_details(func)
+            if class_name is not None:
+                logger.debug(
+                    "Class - %s : Function - %s : args - %s : kwargs - %s",
+                    class_name,
+                    func_name,
+                    args,
+                    kwargs,
+                )
+            else:
+                logger.debug(
+                    "Function - %s : args - %s : kwargs - %s", func_name, args, kwargs
+                )
 
-        logger.debug(msg_str)
         result = func(*args, **kwargs)
-        if result is not None:
-            msg_str = "Function - {:3} : Result - {}".format(func_name, result)
-            logger.debug(msg_str)
+        if enabled and result is not None:
+            logger.debug("Function - %s : Result - %s", func_name, result)
 
         return result
 
@@ -0,0 +1,118 @@
+import os
+import time
+from collections import OrderedDict
+
+import torch
+
+
+class Span:
+    """
+    Time between two marks, CUDA event pairs are only resolved when the value is
+    read, which waits for the end event alone instead of the whole device
+    """
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
+    def __float__(self):
+        if isinstance(self.start, float):
+            return self.end - self.start
+        self.end.synchronize()
+        return self.start.elapsed_time(self.end) / 1000
+
+
+class PhaseTimer:
+    """
+    Time of the phases of a training step, every lap closes the phase that started
+    at the previous lap. On CUDA a lap records an event on the stream, so
+    asynchronous kernels are charged to the phase that launched them without
+    synchronizing the device, spans are resolved when they are read, at the
+    TensorBoard flush and at the end of the epoch.
+
+    Laps and calls are also summed per epoch, to report where the epoch went
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.events = enabled and torch.cuda.is_available()
+        self.mark = None
+        self.step_time = dict()
+        self.epoch_span = OrderedDict()
+
+    def start(self):
+        if self.enabled:
+            self.mark = self.now()
+
+    def lap(self, phase):
+        if not self.enabled:
+            return
+        now = self.now()
+        self.step_time[phase] = Span(self.mark, now)
+        self.record(phase, self.step_time[phase])
+        self.mark = now
+
+    def call(self, phase, fn, *args):
+        if not self.enabled:
+            return fn(*args)
+        start = self.now()
+        result = fn(*args)
+        self.record(phase, Span(start, self.now()))
+        return result
+
+    def record(self, phase, span):
+        self.epoch_span.setdefault(phase, list()).append(span)
+
+    def collect(self):
+        # Spans of the last step, read as float when they are written out
+        step_time, self.step_time = self.step_time, dict()
+        return step_time
+
+    def collect_epoch(self):
+        epoch_span, self.epoch_span = self.epoch_span, OrderedDict()
+        epoch_time = OrderedDict(
+            (phase, sum(float(span) for span in spans))
+            for phase, spans in epoch_span.items()
+        )
+        epoch_count = {phase: len(spans) for phase, spans in epoch_span.items()}
+        return epoch_time, epoch_count
+
+    def now(self):
+        if self.events:
+            event = torch.cuda.Event(enable_timing=True)
+            event.record()
+            return event
+        return time.perf_counter()
+
+
+def epoch_table(epoch_time, epoch_count):
+    total = sum(epoch_time.values())
+    width = max([len(phase) for phase in epoch_time] + [len("Phase")])
+    row = "{:<" + str(width) + "} {:>10} {:>10} {:>8} {:>7}"
+    lines = [row.format("Phase", "Total(s)", "Mean(ms)", "Calls", "Share")]
+    for phase, elapsed in epoch_time.items():
+        lines.append(
+            row.format(
+                phase,
+                "{:.3f}".format(elapsed),
+                "{:.3f}".format(1000 * elapsed / epoch_count[phase]),
+                epoch_count[phase],
+                "{:.1f}%".format(100 * elapsed / total if total > 0 else 0),
+            )
+        )
+    return "\n".join(lines)
+
+
+def create_trace(trace_dir, epoch, trace_steps):
+    """Chrome trace of trace_steps training steps, after one skipped and one warm up step"""
+    activities = [torch.profiler.ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(torch.profiler.ProfilerActivity.CUDA)
+    trace_path = os.path.join(trace_dir, "trace_epoch_{}.json".format(epoch))
+    return torch.profiler.profile(
+        activities=activities,
+        schedule=torch.profiler.schedule(
+            wait=1, warmup=1, active=trace_steps, repeat=1
+        ),
+        on_trace_ready=lambda profiler: profiler.export_chrome_trace(trace_path),
+    )
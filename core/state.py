@@ -14,6 +14,8 @@ class LearnerState:
         self._starting_epoch = None
         self._step = None
         self._bst_vld_loss = None
+        self._scaler = None
+        self._accumulation_step = None
 
     @property
     def model(self):
@@ -55,6 +57,22 @@ class LearnerState:
     def bst_vld_loss(self, value):
         self._bst_vld_loss = value
 
+    @property
+    def scaler(self):
+        return self._scaler
+
+    @scaler.setter
+    def scaler(self, value):
+        self._scaler = value
+
+    @property
+    def accumulation_step(self):
+        return self._accumulation_step
+
+    @accumulation_step.setter
+    def accumulation_step(self, value):
+        self._accumulation_step = value
+
     @property
     def epoch_state(self):
         return {"my_state": self.collect_state("complete")}
@@ -76,10 +94,23 @@ class LearnerState:
             "bst_vld_loss": self.bst_vld_loss
             if self.bst_vld_loss is not None
             else "NA",
+            "scaler": self.scaler.state_dict() if self.scaler is not None else "NA",
+            "accumulation_step": self.accumulation_step,
+            "gradient": self.collect_gradient(),
         }
 
+    def collect_gradient(self):
+        # Gradients are only worth keeping when the state is taken in the middle of an
+        # accumulation cycle, otherwise they are zeroed before the next backward
+        if not self.accumulation_step:
+            return "NA"
+        return [
+            parameter.grad.detach().cpu() if parameter.grad is not None else None
+            for parameter in self.model.parameters()
+        ]
+
     @info
-    def restart(self, model, optimizer, state_pth):
+    def restart(self, model, optimizer, scaler, state_pth):
         SystemPrinter.sys_print("Loading Existing State {}".format(state_pth))
         ongoing_state = self.extract_state(state_pth)
         if self.check_key_and_none(ongoing_state, "model"):
@@ -110,8 +141,24 @@ class LearnerState:
             self.bst_vld_loss = ongoing_state["bst_vld_loss"]
             logger.debug("Existing Best Valid Loss {}".format(self.bst_vld_loss))
 
+        self.scaler = scaler
+        if self.check_key_and_none(ongoing_state, "scaler"):
+            self.scaler = self.set_scaler_state(scaler, ongoing_state["scaler"])
+            logger.debug("Existing Scaler Loaded")
+
+        self.accumulation_step = 0
+        if self.check_key_and_none(ongoing_state, "accumulation_step"):
+            self.accumulation_step = ongoing_state["accumulation_step"]
+            logger.debug("Existing Accumulation Step {}".format(self.accumulation_step))
+
+        if self.accumulation_step and self.check_key_and_none(
+            ongoing_state, "gradient"
+        ):
+            self.model = self.set_gradient_state(self.model, ongoing_state["gradient"])
+            logger.debug("Existing Accumulated Gradient Loaded")
+
     @info
-    def new(self, model, optimizer):
+    def new(self, model, optimizer, scaler):
         SystemPrinter.sys_print("Loading New State")
         self.model = model
         self.optimizer = optimizer
@@ -119,6 +166,8 @@ class LearnerState:
         self.starting_epoch = 1
         self.step = 1
         self.bst_vld_loss = None
+        self.scaler = scaler
+        self.accumulation_step = 0
 
     @staticmethod
     def check_key_and_none(state, key):
@@ -148,3 +197,17 @@ class LearnerState:
     def set_optimizer_state(optimizer, optimizer_state):
         optimizer.load_state_dict(optimizer_state)
         return optimizer
+
+    @staticmethod
+    def set_scaler_state(scaler, scaler_state):
+        # A disabled scaler saves an empty state, which an enabled one refuses to load
+        if scaler.is_enabled() and len(scaler_state) != 0:
+            scaler.load_state_dict(scaler_state)
+        return scaler
+
+    @staticmethod
+    def set_gradient_state(model, gradient_state):
+        for parameter, gradient in zip(model.parameters(), gradient_state):
+            if gradient is not None:
+                parameter.grad = gradient.to(parameter.device)
+        return model
@@ -0,0 +1,107 @@
+import os
+from pathlib import Path
+
+from config import Config
+from core.logger import info, ChronosLogger
+from train import CONFIG_RESTRICTION
+from utils.image_ops import load_image
+from utils.memmap_store import MemMapStore
+from utils.system_printer import SystemPrinter
+
+
+class DataSet:
+    def __init__(self, plugin, config_path):
+        self.config_path = config_path
+        self._plugin_name = plugin
+
+    def load_config(self):
+        config = Config(self.config_path, CONFIG_RESTRICTION, self._plugin_name)
+        ChronosLogger().create_console_logger()
+        return config
+
+    @info
+    def pack(self, modes=("train", "val"), cache=None):
+        """Decode every image and label of the splits once into uint8 memory mapped stores
+
+        :param modes: splits to pack
+        :param cache: directory of the stores, defaults to DATASET.CACHE
+        :return:
+        """
+        config = self.load_config()
+        cache = config.cache if cache is None else cache
+        assert cache is not None, "Set DATASET.CACHE or pass cache"
+        modes = [modes] if isinstance(modes, str) else list(modes)
+
+        root = Path(config.root)
+        for mode in modes:
+            for folder in ["images", "labels"]:
+                files = sorted(list((root / mode / folder).glob("*")))
+                MemMapStore.write(
+                    os.path.join(cache, mode),
+                    folder,
+                    self.decode(files, "{} {}".format(mode, folder)),
+                    files,
+                )
+                SystemPrinter.sys_print(
+                    "Packed {} {} {} to {}".format(
+                        len(files), mode, folder, os.path.join(cache, mode)
+                    )
+                )
+
+    @info
+    def tile(
+        self,
+        image_dir,
+        label_dir=None,
+        save_dir=None,
+        crop_size=512,
+        val=0.1,
+        test=0.1,
+        workers=None,
+        skip_empty=True,
+        seed=0,
+    ):
+        """Tile GeoTIFF scenes into the train/val/test layout of DATASET.ROOT
+
+        :param image_dir: directory of the scenes
+        :param label_dir: directory of the labels, same file names as the scenes
+        :param save_dir: defaults to DATASET.ROOT
+        :param crop_size: tile size
+        :param val: fraction of scenes in val
+        :param test: fraction of scenes in test
+        :param workers: processes tiling scenes, defaults to the cpu count
+        :param skip_empty: drop train and val tiles without foreground
+        :param seed: seed of the scene split
+        :return:
+        """
+        # rasterio is only needed for tiling
+        from utils.data_split import tile_dataset
+
+        config = self.load_config()
+        save_dir = config.root if save_dir is None else save_dir
+        report, tiles_per_second = tile_dataset(
+            image_dir,
+            save_dir,
+            label_dir=label_dir,
+            crop_size=crop_size,
+            val_fraction=val,
+            test_fraction=test,
+            workers=workers,
+            skip_empty=skip_empty,
+            seed=seed,
+        )
+        for mode, (written, skipped) in report.items():
+            SystemPrinter.sys_print(
+                "{}: {} tiles written, {} empty tiles skipped".format(
+                    mode, written, skipped
+                )
+            )
+        SystemPrinter.sys_print(
+            "Tiled to {} at {:.1f} tiles/s".format(save_dir, tiles_per_second)
+        )
+
+    @staticmethod
+    def decode(files, tag):
+        for iterator, file_name in enumerate(files):
+            SystemPrinter.dynamic_print(tag, "{}/{}".format(iterator + 1, len(files)))
+            yield load_image(str(file_name))
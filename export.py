@@ -0,0 +1,144 @@
+import os
+
+import numpy as np
+import torch
+
+from config import Config
+from core.factory import Plugin
+from core.logger import info, ChronosLogger
+from train import CONFIG_RESTRICTION
+from utils.conv_bn_fusion import fuse_conv_bn
+from utils.network_util import adjust_model, InferenceNetwork
+from utils.system_printer import SystemPrinter
+
+logger = ChronosLogger.get_logger()
+
+FORMATS = ("torchscript", "onnx")
+
+
+class Export:
+    def __init__(self, plugin, config_path):
+        self.config_path = config_path
+        self._plugin_name = plugin
+
+    def load_config(self):
+        config = Config(self.config_path, CONFIG_RESTRICTION, self._plugin_name)
+        ChronosLogger().create_console_logger()
+        return config
+
+    @staticmethod
+    @info
+    def load_model(factory, config, weight_path=None):
+        weight_path = config.chk_pth if weight_path is None else weight_path
+        model = factory.create_network(config.model_name, config.model_param)
+        model.load_state_dict(
+            adjust_model(torch.load(str(weight_path), map_location="cpu"))
+        )
+        SystemPrinter.sys_print("Loaded Weights {}".format(weight_path))
+        model = InferenceNetwork(model)
+        model.eval()
+        return model
+
+    @info
+    def run(
+        self,
+        weight_path=None,
+        save_dir=None,
+        formats=FORMATS,
+        batch=1,
+        opset=11,
+        tolerance=1e-4,
+        fuse=True,
+    ):
+        """Export a chk_pt to dict free TorchScript and ONNX artifacts and check them
+        against eager mode
+
+        :param weight_path: state dict to export, defaults to the chk_pth of the experiment
+        :param save_dir: directory of the artifacts, defaults to the directory of weight_path
+        :param formats: artifacts to write, any of torchscript, onnx
+        :param batch: batch size of the example input
+        :param opset: ONNX opset version
+        :param tolerance: largest absolute difference to eager mode that passes the check
+        :param fuse: fold BatchNorm into the preceding convolutions before exporting
+        :return: path of every artifact written
+        """
+        config = self.load_config()
+        weight_path = config.chk_pth if weight_path is None else weight_path
+        save_dir = os.path.dirname(str(weight_path)) if save_dir is None else save_dir
+        formats = [formats] if isinstance(formats, str) else list(formats)
+        for export_format in formats:
+            assert export_format in FORMATS, "Expected format out of {}, got {}".format(
+                FORMATS, export_format
+            )
+        os.makedirs(save_dir, exist_ok=True)
+
+        factory = Plugin(config).factory
+        model = self.load_model(factory, config, weight_path)
+
+        image_dim = config.model_input_dimension
+        images = torch.randn(batch, 3, image_dim[0], image_dim[1])
+        with torch.no_grad():
+            expected = model(images).numpy()
+        if fuse:
+            SystemPrinter.sys_print(
+                "Folded {} BatchNorm layers".format(fuse_conv_bn(model, images))
+            )
+
+        stem = os.path.splitext(os.path.basename(str(weight_path)))[0]
+        artifacts = dict()
+        for export_format in formats:
+            path = getattr(self, export_format)(model, images, save_dir, stem, opset)
+            difference = np.abs(
+                getattr(self, "run_{}".format(export_format))(path, images) - expected
+            ).max()
+            SystemPrinter.sys_print(
+                "{} - {} - Max Abs Difference: {:.2e}".format(
+                    export_format, path, difference
+                )
+            )
+            assert difference <= tolerance, (
+                "{} output differs from eager mode by {:.2e}, "
+                "tolerance {:.2e}".format(export_format, difference, tolerance)
+            )
+            artifacts[export_format] = path
+        return artifacts
+
+    @staticmethod
+    def torchscript(model, images, save_dir, stem, opset=None):
+        path = os.path.join(save_dir, "{}.ts".format(stem))
+        with torch.no_grad():
+            traced = torch.jit.trace(model, images)
+        traced = torch.jit.freeze(traced)
+        traced.save(path)
+        return path
+
+    @staticmethod
+    def onnx(model, images, save_dir, stem, opset=11):
+        path = os.path.join(save_dir, "{}.onnx".format(stem))
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                images,
+                path,
+                opset_version=opset,
+                input_names=["image"],
+                output_names=["output"],
+                dynamic_axes={"image": {0: "batch"}, "output": {0: "batch"}},
+                do_constant_folding=True,
+            )
+        return path
+
+    @staticmethod
+    def run_torchscript(path, images):
+        with torch.no_grad():
+            return torch.jit.load(path, map_location="cpu")(images).numpy()
+
+    @staticmethod
+    def run_onnx(path, images):
+        # onnxruntime is only needed to verify the ONNX artifact, not to write it
+        import onnxruntime
+
+        session = onnxruntime.InferenceSession(
+            path, providers=["CPUExecutionProvider"]
+        )
+        return session.run(["output"], {"image": images.numpy()})[0]
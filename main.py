@@ -1,11 +1,21 @@
 import fire
 
+from benchmark import Benchmark
+from dataset import DataSet
+from export import Export
+from predict import Predict
+from quantize import Quantize
 from train import Train
 
 
 class Init(object):
     def __init__(self, plugin, config_path):
         self.train = Train(plugin, config_path)
+        self.benchmark = Benchmark(plugin, config_path)
+        self.predict = Predict(plugin, config_path)
+        self.dataset = DataSet(plugin, config_path)
+        self.export = Export(plugin, config_path)
+        self.quantize = Quantize(plugin, config_path)
 
 
 if __name__ == "__main__":
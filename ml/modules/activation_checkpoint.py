@@ -0,0 +1,30 @@
+import torch
+from torch.utils.checkpoint import checkpoint
+
+# module attributes that switch activation checkpointing on in ml.network and ml.modules
+CHECKPOINT_FLAGS = ("checkpoint", "memory_efficient")
+
+
+def checkpoint_features(function, features, enabled=False):
+    """
+    Run a multi resolution stage on a list of features, optionally under activation
+    checkpointing.
+
+    When enabled only the stage inputs are kept for backward, everything the branches
+    and fuse layers produce is recomputed. BatchNorm running statistics are updated a
+    second time during the recompute
+
+    :param function: callable taking and returning a list of tensors
+    :param features: list of tensors
+    :param enabled:
+    :return: list of tensors
+    """
+    if (
+        enabled
+        and torch.is_grad_enabled()
+        and any(feature.requires_grad for feature in features)
+    ):
+        return list(
+            checkpoint(lambda *inputs: tuple(function(list(inputs))), *features)
+        )
+    return function(features)
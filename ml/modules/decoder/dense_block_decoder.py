@@ -2,6 +2,8 @@ import torch
 from torch import nn
 import torch.nn.functional as F
 
+from ml.modules.efficient_dense import dense_layer_forward
+
 
 class _DenseLayer(nn.Sequential):
     """
@@ -46,6 +48,7 @@ class _DenseBlock(nn.Module):
         growth_rate,
         drop_rate,
         batch_momentum=0.01,
+        memory_efficient=False,
     ):
         super(_DenseBlock, self).__init__()
         self.dense_module = nn.ModuleList(
@@ -59,14 +62,15 @@ class _DenseBlock(nn.Module):
                 for i in range(num_layers)
             ]
         )
+        self.memory_efficient = memory_efficient
 
     def forward(self, x):
-        new_feat = list()
+        features = [x]
         for layer in self.dense_module:
-            dense_layer_output = layer(x)
-            new_feat.append(dense_layer_output)
-            x = torch.cat([x, dense_layer_output], 1)
-        return x
+            features.append(
+                dense_layer_forward(layer, features, self.memory_efficient)
+            )
+        return torch.cat(features, 1)
 
 
 class _TransitionUp(nn.Module):
@@ -89,13 +93,14 @@ class _TransitionUp(nn.Module):
 
 
 class DenseNetBottleNeck(nn.Module):
-    def __init__(self, in_channels, growth_rate, num_layers):
+    def __init__(self, in_channels, growth_rate, num_layers, memory_efficient=False):
         super().__init__()
         self.bottle_neck = _DenseBlock(
             growth_rate=growth_rate,
             num_layers=num_layers,
             drop_rate=0.2,
             num_input_features=in_channels,
+            memory_efficient=memory_efficient,
         )
 
     def forward(self, x):
@@ -112,6 +117,7 @@ class DenseNet(nn.Module):
         drop_rate,
         compression_ratio,
         skip_connection_channel_counts,
+        memory_efficient=False,
     ):
         super(DenseNet, self).__init__()
         self.decoder = nn.ModuleList()
@@ -121,7 +127,7 @@ class DenseNet(nn.Module):
             num_input_features=num_init_features, num_output_features=num_init_features
         )
         self.bottle_neck = DenseNetBottleNeck(
-            num_init_features, growth_rate, bottleneck_layers
+            num_init_features, growth_rate, bottleneck_layers, memory_efficient
         )
 
         num_features = num_init_features + growth_rate * bottleneck_layers
@@ -141,6 +147,7 @@ class DenseNet(nn.Module):
                 num_input_features=cur_channels_count,
                 growth_rate=growth_rate,
                 drop_rate=drop_rate,
+                memory_efficient=memory_efficient,
             )
             self.decoder.add_module("decoderdenseblock%d" % (j + 1), block)
             num_features = cur_channels_count + growth_rate * decoder_block_config[j]
@@ -175,6 +182,7 @@ class DecoderDenseNet(nn.Module):
         encoder_layers_features,
         drop_rate=0.0,
         compression_ratio=1,
+        memory_efficient=False,
     ):
         super(DecoderDenseNet, self).__init__()
         num_init_features = encoder_layers_features[-1]
@@ -192,6 +200,7 @@ class DecoderDenseNet(nn.Module):
             drop_rate,
             compression_ratio,
             skip_connection_channel_counts,
+            memory_efficient,
         )
         self.last_layer_feature = self.dense_decoder.final_layer_feature
 
@@ -0,0 +1,32 @@
+import torch
+from torch.utils.checkpoint import checkpoint
+
+
+def concatenated_forward(layer):
+    def forward(*features):
+        return layer(torch.cat(features, 1))
+
+    return forward
+
+
+def dense_layer_forward(layer, features, memory_efficient=False):
+    """
+    Output of a dense layer on the concatenation of all previous features.
+
+    In the memory efficient mode the concatenation and the layer run under activation
+    checkpointing, so neither the concatenated input nor the BN-ReLU-Conv intermediates
+    are kept for backward, only the growth_rate channels every layer adds. They are
+    recomputed from the stored features during backward instead
+
+    :param layer: dense layer
+    :param features: list of the block input and the output of every previous layer
+    :param memory_efficient:
+    :return:
+    """
+    if (
+        memory_efficient
+        and torch.is_grad_enabled()
+        and any(feature.requires_grad for feature in features)
+    ):
+        return checkpoint(concatenated_forward(layer), *features)
+    return layer(torch.cat(features, 1))
@@ -14,6 +14,8 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
+from ml.modules.activation_checkpoint import checkpoint_features
+
 
 BatchNorm2d = nn.BatchNorm2d
 BN_MOMENTUM = 0.01
@@ -110,6 +112,7 @@ class HighResolutionModule(nn.Module):
         num_channels,
         fuse_method,
         multi_scale_output=True,
+        checkpoint=False,
     ):
         super(HighResolutionModule, self).__init__()
         self._check_branches(
@@ -121,6 +124,7 @@ class HighResolutionModule(nn.Module):
         self.num_branches = num_branches
 
         self.multi_scale_output = multi_scale_output
+        self.checkpoint = checkpoint
 
         self.branches = self._make_branches(
             num_branches, blocks, num_blocks, num_channels
@@ -265,6 +269,9 @@ class HighResolutionModule(nn.Module):
         return self.num_inchannels
 
     def forward(self, x):
+        return checkpoint_features(self.forward_module, x, self.checkpoint)
+
+    def forward_module(self, x):
         if self.num_branches == 1:
             return [self.branches[0](x[0])]
 
@@ -428,6 +435,9 @@ class HighResolution(nn.Module):
         num_channels = layer_config["NUM_CHANNELS"]
         block = blocks_dict[layer_config["BLOCK"]]
         fuse_method = layer_config["FUSE_METHOD"]
+        checkpoint = (
+            layer_config["CHECKPOINT"] if "CHECKPOINT" in layer_config.keys() else False
+        )
 
         modules = []
         for i in range(num_modules):
@@ -445,6 +455,7 @@ class HighResolution(nn.Module):
                     num_channels,
                     fuse_method,
                     reset_multi_scale_output,
+                    checkpoint,
                 )
             )
             num_inchannels = modules[-1].get_num_inchannels()
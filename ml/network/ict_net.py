@@ -3,6 +3,8 @@ import torch.nn as nn
 import torch.nn.functional as F
 from collections import OrderedDict
 
+from ml.modules.efficient_dense import dense_layer_forward
+
 __reference__ = [
     "https://github.com/bfortuner/pytorch_tiramisu/blob/master/models/",
     "https://gitlab.com/theICTlab/UrbanReconstruction/ictnet/blob/master/code/",
@@ -104,6 +106,7 @@ class _DenseBlock(nn.Module):
         out_filter=None,
         down_sample=True,
         batch_momentum=0.1,
+        memory_efficient=False,
     ):
         super(_DenseBlock, self).__init__()
         self.dense_module = nn.ModuleList(
@@ -119,20 +122,22 @@ class _DenseBlock(nn.Module):
         )
         self.out_filter = out_filter
         self.down_sample = down_sample
+        self.memory_efficient = memory_efficient
 
     def forward(self, x):
-        new_feat = list()
+        features = [x]
         for layer in self.dense_module:
-            dense_layer_output = layer(x)
-            new_feat.append(dense_layer_output)
-            x = torch.cat([x, dense_layer_output], 1)
+            features.append(
+                dense_layer_forward(layer, features, self.memory_efficient)
+            )
 
         if self.down_sample:
+            x = torch.cat(features, 1)
             return SqueezeExcitation().forward(
                 x, x.shape, 1, out_filter=self.out_filter
             )
         else:
-            x = torch.cat(new_feat, 1)
+            x = torch.cat(features[1:], 1)
             return SqueezeExcitation().forward(
                 x, x.shape, 1, out_filter=self.out_filter
             )
@@ -202,6 +207,7 @@ class DenseNet(nn.Module):
         num_init_features=48,
         drop_rate=0.0,
         batch_momentum=0.01,
+        memory_efficient=False,
     ):
 
         super(DenseNet, self).__init__()
@@ -236,6 +242,7 @@ class DenseNet(nn.Module):
                 growth_rate=growth_rate,
                 drop_rate=drop_rate,
                 batch_momentum=batch_momentum,
+                memory_efficient=memory_efficient,
             )
             self.encoder.add_module("denseblock%d" % (i + 1), block)
             num_features = num_features + num_layers * growth_rate
@@ -250,7 +257,7 @@ class DenseNet(nn.Module):
             self.encoder.add_module("transition%d" % (i + 1), trans)
             skip_connection_channel_counts.insert(0, num_features)
         self.bottle_neck = DenseNetBottleNeck(
-            num_features, growth_rate, bottleneck_layers
+            num_features, growth_rate, bottleneck_layers, memory_efficient
         )
 
         num_features = growth_rate * bottleneck_layers
@@ -265,6 +272,7 @@ class DenseNet(nn.Module):
                 growth_rate=growth_rate,
                 drop_rate=drop_rate,
                 down_sample=False,
+                memory_efficient=memory_efficient,
             )
             self.decoder.add_module("decoderdenseblock%d" % (j + 1), block)
             num_features = growth_rate * decoder_block_config[j]
@@ -277,7 +285,7 @@ class DenseNet(nn.Module):
 
 
 class DenseNetBottleNeck(nn.Module):
-    def __init__(self, in_channels, growth_rate, num_layers):
+    def __init__(self, in_channels, growth_rate, num_layers, memory_efficient=False):
         super().__init__()
         self.bottle_neck = _DenseBlock(
             growth_rate=growth_rate,
@@ -286,6 +294,7 @@ class DenseNetBottleNeck(nn.Module):
             num_input_features=in_channels,
             out_filter=growth_rate * num_layers,
             down_sample=False,
+            memory_efficient=memory_efficient,
         )
 
     def forward(self, x):
@@ -300,6 +309,7 @@ class ICTNet(nn.Module):
         batch_momentum=0.1,
         growth_rate=12,
         layers_per_block=4,
+        memory_efficient=False,
     ):
         super().__init__()
         if isinstance(layers_per_block, int):
@@ -324,6 +334,7 @@ class ICTNet(nn.Module):
             encoder_block_config=per_block[0:5],
             decoder_block_config=per_block[6:11],
             bottleneck_layers=per_block[5:6][0],
+            memory_efficient=memory_efficient,
         )
         self.final_layer = nn.Conv2d(
             final_layer_features, classes, kernel_size=1, stride=1, padding=0, bias=True
@@ -5,6 +5,7 @@ from torch import nn
 from torch.nn import functional as F
 
 from ml.modules import SpatialPooling, ChannelSELayer
+from ml.modules.activation_checkpoint import checkpoint_features
 from plugins.base.network.base_network import BaseNetwork
 
 BatchNorm2d = nn.BatchNorm2d
@@ -184,8 +185,10 @@ class Stage(nn.Module):
         num_modules=2,
         block_num=4,
         multi_scale_output=True,
+        checkpoint=False,
     ):
         super().__init__()
+        self.checkpoint = checkpoint
         self.stage_res = list()
         self.fuse_res = OrderedDict()
         fuse_index = 0
@@ -245,6 +248,9 @@ class Stage(nn.Module):
         self.fuse_res = nn.Sequential(self.fuse_res)
 
     def forward(self, x):
+        return checkpoint_features(self.forward_stage, x, self.checkpoint)
+
+    def forward_stage(self, x):
         stage_res = list()
         counter = 0
 
@@ -336,8 +342,22 @@ class TransitionLayer(nn.Module):
 
 
 class MapNet(nn.Module):
+    STAGES = ("stage_1", "stage_2", "stage_3")
+
     def __init__(self, **kwargs):
         super().__init__()
+        # checkpoint: True for every stage or a list of stage names out of STAGES
+        checkpoint = kwargs["checkpoint"] if "checkpoint" in kwargs.keys() else False
+        if isinstance(checkpoint, bool):
+            checkpoint = self.STAGES if checkpoint else []
+        for stage in checkpoint:
+            if stage not in self.STAGES:
+                raise ValueError(
+                    "Unknown stage {} for checkpoint, expected one of {}".format(
+                        stage, self.STAGES
+                    )
+                )
+        self.checkpoint = "stage_1" in checkpoint
 
         self.channels_s2 = [64, 128]
         self.channels_s3 = [64, 128, 256]
@@ -358,16 +378,27 @@ class MapNet(nn.Module):
         self.stage_1 = Step0()
 
         self.transition_layer_1 = TransitionLayer([256], self.channels_s2)
-        self.stage_2 = Stage(self.channels_s2, self.channels_s2, self.num_modules_s2)
+        self.stage_2 = Stage(
+            self.channels_s2,
+            self.channels_s2,
+            self.num_modules_s2,
+            checkpoint="stage_2" in checkpoint,
+        )
 
         self.transition_layer_2 = TransitionLayer([64, 128], self.channels_s3)
 
-        self.stage_3 = Stage(self.channels_s3, self.channels_s3, self.num_modules_s3)
+        self.stage_3 = Stage(
+            self.channels_s3,
+            self.channels_s3,
+            self.num_modules_s3,
+            checkpoint="stage_3" in checkpoint,
+        )
         self.stage_3_multi = Stage(
             self.channels_s3,
             self.channels_s3,
             self.num_modules_s3,
             multi_scale_output=False,
+            checkpoint="stage_3" in checkpoint,
         )
 
         self.channel_squeeze = ChannelSELayer(448)
@@ -391,7 +422,9 @@ class MapNet(nn.Module):
         x_3 = self.activation(x_3)
 
         pool_1 = self.pool_1(x_3)
-        stage_1 = self.stage_1(pool_1)
+        stage_1 = checkpoint_features(
+            lambda features: [self.stage_1(features[0])], [pool_1], self.checkpoint
+        )[0]
 
         trans_1 = self.transition_layer_1([stage_1])
         s2 = trans_1
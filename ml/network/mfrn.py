@@ -3,6 +3,8 @@ import torch.nn as nn
 import torch.nn.functional as F
 from collections import OrderedDict
 
+from ml.modules.efficient_dense import dense_layer_forward
+
 __reference__ = ["https://github.com/bfortuner/pytorch_tiramisu/blob/master/models/"]
 __all__ = ["DenseNet"]
 __paper__ = (
@@ -45,7 +47,13 @@ class _DenseLayer(nn.Sequential):
 
 class _DenseBlock(nn.Module):
     def __init__(
-        self, num_layers, num_input_features, growth_rate, drop_rate, batch_momentum=0.1
+        self,
+        num_layers,
+        num_input_features,
+        growth_rate,
+        drop_rate,
+        batch_momentum=0.1,
+        memory_efficient=False,
     ):
         super(_DenseBlock, self).__init__()
         self.dense_module = nn.ModuleList(
@@ -59,14 +67,15 @@ class _DenseBlock(nn.Module):
                 for i in range(num_layers)
             ]
         )
+        self.memory_efficient = memory_efficient
 
     def forward(self, x):
-        new_feat = list()
+        features = [x]
         for layer in self.dense_module:
-            dense_layer_output = layer(x)
-            new_feat.append(dense_layer_output)
-            x = torch.cat([x, dense_layer_output], 1)
-        return x
+            features.append(
+                dense_layer_forward(layer, features, self.memory_efficient)
+            )
+        return torch.cat(features, 1)
 
 
 class _TransitionDown(nn.Sequential):
@@ -127,6 +136,7 @@ class DenseNet(nn.Module):
         drop_rate=0.0,
         batch_momentum=0.01,
         compression_ratio=0.5,
+        memory_efficient=False,
     ):
 
         super(DenseNet, self).__init__()
@@ -161,6 +171,7 @@ class DenseNet(nn.Module):
                 growth_rate=growth_rate,
                 drop_rate=drop_rate,
                 batch_momentum=batch_momentum,
+                memory_efficient=memory_efficient,
             )
             self.encoder.add_module("denseblock%d" % (i + 1), block)
             num_features = num_features + num_layers * growth_rate
@@ -179,7 +190,7 @@ class DenseNet(nn.Module):
             )
 
         self.bottle_neck = DenseNetBottleNeck(
-            num_features, growth_rate, bottleneck_layers
+            num_features, growth_rate, bottleneck_layers, memory_efficient
         )
 
         num_features = num_features + growth_rate * bottleneck_layers
@@ -194,6 +205,7 @@ class DenseNet(nn.Module):
                 num_input_features=cur_channels_count,
                 growth_rate=growth_rate,
                 drop_rate=drop_rate,
+                memory_efficient=memory_efficient,
             )
             self.decoder.add_module("decoderdenseblock%d" % (j + 1), block)
             num_features = cur_channels_count + growth_rate * decoder_block_config[j]
@@ -206,13 +218,14 @@ class DenseNet(nn.Module):
 
 
 class DenseNetBottleNeck(nn.Module):
-    def __init__(self, in_channels, growth_rate, num_layers):
+    def __init__(self, in_channels, growth_rate, num_layers, memory_efficient=False):
         super().__init__()
         self.bottle_neck = _DenseBlock(
             growth_rate=growth_rate,
             num_layers=num_layers,
             drop_rate=0.2,
             num_input_features=in_channels,
+            memory_efficient=memory_efficient,
         )
 
     def forward(self, x):
@@ -227,6 +240,7 @@ class MFRN(nn.Module):
         batch_momentum=0.1,
         growth_rate=12,
         layers_per_block=4,
+        memory_efficient=False,
     ):
         super().__init__()
         if isinstance(layers_per_block, int):
@@ -251,6 +265,7 @@ class MFRN(nn.Module):
             encoder_block_config=per_block[0:5],
             decoder_block_config=per_block[6:11],
             bottleneck_layers=per_block[5:6][0],
+            memory_efficient=memory_efficient,
         )
         self.final_layer = nn.Conv2d(
             final_layer_features, classes, kernel_size=1, stride=1, padding=0, bias=True
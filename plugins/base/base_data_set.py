@@ -1,4 +1,5 @@
 import os
+import random
 
 from typing import Any
 
@@ -8,14 +9,48 @@ from pathlib import Path
 import torch
 from dataclasses import dataclass
 from torch.utils.data import Dataset, DataLoader
+from torch.utils.data.distributed import DistributedSampler
 
 from core import augmentator
+from core.augmentator import batch as batch_augmentator
 from abc import ABCMeta, abstractmethod
 
-from core.logger import info
+from core.logger import info, ChronosLogger
 from utils.dict_ops import handle_dictionary
-from utils.image_ops import handle_image_size, load_image
-from utils.pt_tensor import to_input_image_tensor
+from utils.distributed import (
+    all_reduce_max,
+    all_reduce_sum,
+    barrier,
+    get_local_world_size,
+    get_rank,
+    get_world_size,
+    is_distributed,
+    is_main_process,
+)
+from utils.foreground_index import ForegroundIndex
+from utils.image_ops import (
+    crop_image,
+    get_random_crop_x_and_y,
+    handle_image_size,
+    load_image,
+)
+from utils.memmap_store import MemMapStore
+from utils.multi_crop import MultiCropBatchSampler, POOL_BATCHES
+from utils.pt_tensor import to_input_image_tensor, to_input_image_byte_tensor
+from utils.shared_image_cache import SharedImageCache
+from utils.sliding_window import get_sliding_windows
+from utils.system_printer import SystemPrinter
+from utils.validation_cache import ValidationCache
+
+logger = ChronosLogger.get_logger()
+
+
+def seed_worker(worker_id):
+    # Every worker starts with a copy of the parent's random/np.random state,
+    # derive a distinct seed from the per worker torch seed instead
+    worker_seed = torch.initial_seed() % 2 ** 32
+    np.random.seed(worker_seed)
+    random.seed(worker_seed)
 
 
 @dataclass
@@ -32,8 +67,19 @@ class BaseDataSetPt(Dataset, metaclass=ABCMeta):
         model_input_dim = self.config.model_input_dimension
         transform = self.config.transformation
 
+        self.device_normalization = self.config.device_normalization
+        self.device_transformation = self.config.device_transformation
+        if self.device_transformation:
+            # batch transforms work on the 0-255 range, before normalize_batch
+            assert (
+                self.device_normalization
+            ), "DEVICE_TRANSFORMATION needs DEVICE_NORMALIZATION"
+
         if mode == "train":
-            self.transform = self.load_transformation(transform)
+            self.transform = self.load_transformation(
+                transform,
+                batch_augmentator if self.device_transformation else augmentator,
+            )
         else:
             self.transform = None
 
@@ -45,32 +91,111 @@ class BaseDataSetPt(Dataset, metaclass=ABCMeta):
         self.images = sorted(list((self.root / self.mode / "images").glob("*")))
         self.labels = sorted(list((self.root / self.mode / "labels").glob("*")))
 
+        self.image_store, self.label_store = self.load_store(self.config.cache, mode)
+        if self.image_store is not None:
+            self.images = [Path(file_name) for file_name in self.image_store.file_name]
+            self.labels = [Path(file_name) for file_name in self.label_store.file_name]
+
+        self.raster_reader = self.load_raster_reader(self.config.raster_window, mode)
+
+        # Decoded pairs shared by the crops of an image, the batch sampler serves
+        # every crop of a worker's pool before the next pool, so a pool is all a
+        # worker holds
+        self.crops_per_image = self.config.crops_per_image if mode == "train" else 1
+        self.decoded = dict()
+        self.decoded_limit = POOL_BATCHES * self.config.batch_size
+
+        self.image_cache = self.load_image_cache(self.config.decoded_cache_bytes)
+
+        self.foreground_ratio = self.config.foreground_ratio
+        self.foreground_index = self.load_foreground_index()
+
     @classmethod
     def get_data_loader(cls, config):
-        train_data = DataLoader(
-            dataset=cls(config, "train"),
-            shuffle=True,
-            num_workers=0,
-            batch_size=config.batch_size,
-            pin_memory=torch.cuda.is_available(),
-        )
-        val_data = DataLoader(
-            dataset=cls(config, "val"),
-            shuffle=True,
-            num_workers=0,
-            batch_size=config.batch_size,
-            pin_memory=torch.cuda.is_available(),
-        )
+        loader_param = cls.get_loader_param(config)
+        train_data = cls.get_split_loader(config, "train", loader_param)
+        if config.validation_cache:
+            val_data = cls.get_validation_cache(config)
+        else:
+            val_data = cls.get_split_loader(config, "val", loader_param)
 
+        # The test split is read once, by the preview callback or by predict, workers
+        # kept alive for the rest of the run would only hold their memory
         test_data = DataLoader(
             dataset=cls(config, "test"),
             shuffle=True,
-            num_workers=0,
             batch_size=config.batch_size,
-            pin_memory=torch.cuda.is_available(),
+            **cls.get_loader_param(config, persistent_workers=False)
         )
         return Data(train_data, val_data, test_data)
 
+    @classmethod
+    def get_split_loader(cls, config, mode, loader_param):
+        data_set = cls(config, mode)
+        if data_set.crops_per_image > 1:
+            # Shuffles and shards itself, a decode is reused for every crop
+            return DataLoader(
+                dataset=data_set,
+                batch_sampler=MultiCropBatchSampler(
+                    len(data_set),
+                    config.batch_size,
+                    data_set.crops_per_image,
+                    num_workers=loader_param["num_workers"],
+                ),
+                **loader_param
+            )
+        if not is_distributed():
+            return DataLoader(
+                dataset=data_set,
+                shuffle=True,
+                batch_size=config.batch_size,
+                **loader_param
+            )
+        # Every process reads its own shard, the learner sets the epoch of the sampler
+        return DataLoader(
+            dataset=data_set,
+            sampler=DistributedSampler(data_set, shuffle=True),
+            batch_size=config.batch_size,
+            **loader_param
+        )
+
+    @classmethod
+    def get_validation_cache(cls, config):
+        # Cached images stay uint8 and are normalized after transfer
+        assert (
+            config.device_normalization
+        ), "VALIDATION_CACHE needs DEVICE_NORMALIZATION"
+        data_set = cls(config, "val")
+        cache = ValidationCache(
+            data_set,
+            data_set.deterministic_samples(),
+            config.batch_size,
+            device_bytes=config.validation_cache_device_bytes,
+        )
+        # Images can be cut in different numbers of tiles, every process runs as
+        # many validation forwards or the DistributedDataParallel ones fall out of step
+        cache.pad(all_reduce_max(len(cache)))
+        return cache
+
+    @staticmethod
+    def get_loader_param(config, num_workers=None, persistent_workers=None):
+        num_workers = config.loader_workers if num_workers is None else num_workers
+        persistent_workers = (
+            config.loader_persistent_workers
+            if persistent_workers is None
+            else persistent_workers
+        )
+        loader_param = {
+            "num_workers": num_workers,
+            "pin_memory": torch.cuda.is_available(),
+        }
+        if num_workers > 0:
+            # prefetch_factor and persistent_workers are only accepted with workers
+            loader_param["prefetch_factor"] = config.loader_prefetch_factor
+            loader_param["persistent_workers"] = persistent_workers
+            loader_param["worker_init_fn"] = seed_worker
+        return loader_param
+
     def __len__(self):
         if len(self.images) != 0:
             return len(self.images)
@@ -80,8 +205,14 @@ class BaseDataSetPt(Dataset, metaclass=ABCMeta):
     def __getitem__(self, idx):
 
         if self.mode in ["train", "val"]:
-            img, _ = self.read_data(idx, self.images)
-            mask, _ = self.read_data(idx, self.labels)
+            if self.image_store is not None:
+                img, mask = self.read_store_data(idx)
+            elif self.raster_reader is not None:
+                img, mask = self.read_raster_data(idx)
+            elif self.crops_per_image > 1:
+                img, mask = self.crop_pair(idx, *self.read_decoded_data(idx))
+            else:
+                img, mask = self.crop_pair(idx, *self.read_pair(idx))
 
             images, ground_truth = self.learner_data(img=img, mask=mask)
             assert isinstance(images, dict), "Return type should be dict"
@@ -97,7 +228,7 @@ class BaseDataSetPt(Dataset, metaclass=ABCMeta):
             raise NotImplementedError
 
     @info
-    def load_transformation(self, transformation_param):
+    def load_transformation(self, transformation_param, module=augmentator):
         transform_type = list(transformation_param.keys())[0]
         transformation_to_perform = list(transformation_param.values())[0]
         number_of_transformation = len(list(transformation_param.values())[0])
@@ -105,32 +236,39 @@ class BaseDataSetPt(Dataset, metaclass=ABCMeta):
         transformation_to_applied = list()
         for _, transform_param in transformation_to_perform.items():
             transformation_to_applied.append(
-                self._get_train_transformation(**transform_param)
+                self._get_train_transformation(module, **transform_param)
             )
         if number_of_transformation == 1:
             transformation = transformation_to_applied[0]
         else:
-            transformation = getattr(augmentator, transform_type)(
+            transformation = getattr(module, transform_type)(
                 transformation_to_applied, prob=0.5
             )
         return transformation
 
     @staticmethod
-    def _get_train_transformation(to_perform, transform_type, augment_prob):
+    def _get_train_transformation(module, to_perform, transform_type, augment_prob):
         transformation = []
-        transforms_type = getattr(augmentator, transform_type)
+        transforms_type = getattr(module, transform_type)
 
         for trans in to_perform:
-            transformation.append(getattr(augmentator, trans)(prob=augment_prob))
+            transformation.append(getattr(module, trans)(prob=augment_prob))
 
         train_transformation = transforms_type(transformation)
         return train_transformation
 
     def transform_image(self, img, mask):
-        if self.mode == "train":
+        if self.mode == "train" and not self.device_transformation:
             img, mask = self.transform(img, mask)
         return img, mask
 
+    def transform_batch(self, images: dict, ground_truth: dict):
+        if self.mode != "train" or not self.device_transformation:
+            return images, ground_truth
+        # Augmented on the device after transfer, with per sample random parameters
+        img, mask = self.transform(images["image"].float(), ground_truth["label"])
+        return {**images, "image": img}, {**ground_truth, "label": mask}
+
     @staticmethod
     def read_data(idx, data_list):
         if len(data_list) != 0:
@@ -140,6 +278,187 @@ class BaseDataSetPt(Dataset, metaclass=ABCMeta):
         else:
             return None, None
 
+    @staticmethod
+    def load_store(cache, mode):
+        if cache is None or mode not in ["train", "val"]:
+            return None, None
+        store_dir = os.path.join(cache, mode)
+        if not (
+            MemMapStore.exists(store_dir, "images")
+            and MemMapStore.exists(store_dir, "labels")
+        ):
+            return None, None
+        return MemMapStore(store_dir, "images"), MemMapStore(store_dir, "labels")
+
+    def read_store_data(self, idx):
+        # Crop on the memory mapped views so only the crop is read and copied
+        img, mask = self.crop_pair(idx, self.image_store[idx], self.label_store[idx])
+        img, mask = handle_image_size(img, mask, self.model_input_dimension)
+        return np.array(img), np.array(mask)
+
+    @staticmethod
+    def load_raster_reader(raster_window, mode):
+        if not raster_window or mode not in ["train", "val"]:
+            return None
+        # rasterio is only needed when training straight on GeoTIFF scenes
+        from utils.raster_window import RasterReader
+
+        return RasterReader()
+
+    def read_raster_data(self, idx):
+        # Pick the crop on the header, then decode only that window of both rasters
+        image_file, label_file = self.images[idx], self.labels[idx]
+        height, width = self.raster_reader.shape(image_file)
+        if self.model_input_dimension < (height, width):
+            origin = self.crop_origin(idx, height, width)
+            return (
+                self.raster_reader.read(image_file, origin, self.model_input_dimension),
+                self.raster_reader.read(label_file, origin, self.model_input_dimension),
+            )
+        # Scenes not larger than the input are read whole and padded as before
+        return self.raster_reader.read(image_file), self.raster_reader.read(label_file)
+
+    def load_foreground_index(self):
+        if self.foreground_ratio is None or self.mode != "train":
+            return None
+        index_dir = str(self.root / self.mode)
+        cell = self.config.foreground_cell
+        index = ForegroundIndex.load(index_dir)
+        missing = index is None or not index.matches(self.labels, cell)
+        # Every process agrees on the rebuild, only the main process builds and
+        # writes, the others load the index it published
+        if not all_reduce_sum(torch.tensor(int(missing))).item():
+            return index
+        if is_main_process():
+            logger.info("Building foreground index of %s", index_dir)
+            index = ForegroundIndex.build(
+                (self.read_label(idx) for idx in range(len(self.labels))),
+                self.labels,
+                cell,
+            )
+            index.save(index_dir)
+        barrier()
+        return index if is_main_process() else ForegroundIndex.load(index_dir)
+
+    def read_label(self, idx):
+        if self.label_store is not None:
+            return self.label_store[idx]
+        if self.raster_reader is not None:
+            return self.raster_reader.read(self.labels[idx])
+        mask, _ = self.read_data(idx, self.labels)
+        return mask
+
+    def crop_origin(self, idx, height, width):
+        if self.foreground_index is None:
+            return get_random_crop_x_and_y(
+                self.model_input_dimension, (height, width, None)
+            )
+        # A foreground_ratio share of the crops is placed over foreground cells
+        return self.foreground_index.sample_origin(
+            idx, self.model_input_dimension, self.foreground_ratio
+        )
+
+    def crop_pair(self, idx, img, mask):
+        # Without an index the random crop stays with adjust_learner_data
+        height, width = img.shape[0], img.shape[1]
+        if self.foreground_index is None or not self.model_input_dimension < (
+            height,
+            width,
+        ):
+            return img, mask
+        origin = self.crop_origin(idx, height, width)
+        return (
+            crop_image(img, self.model_input_dimension, origin),
+            crop_image(mask, self.model_input_dimension, origin),
+        )
+
+    def load_image_cache(self, budget):
+        # Only the full decode path benefits, the store and raster paths read the crop
+        if (
+            budget is None
+            or self.mode not in ["train", "val"]
+            or self.image_store is not None
+            or self.raster_reader is not None
+        ):
+            return None
+        # DECODED_CACHE_BYTES covers train and val together, each split gets a share
+        # by image count, val is read once when the validation cache holds it
+        modes = ["train"] if self.config.validation_cache else ["train", "val"]
+        if self.mode not in modes:
+            return None
+        images = sum(
+            len(list((self.root / mode / "images").glob("*"))) for mode in modes
+        )
+        # The budget is for the host, every process on it allocates its own arenas
+        budget = budget // get_local_world_size()
+        return SharedImageCache(
+            len(self.images), budget * len(self.images) // max(images, 1)
+        )
+
+    def read_pair(self, idx):
+        if self.image_cache is not None:
+            cached = self.image_cache.get(idx)
+            if cached is not None:
+                return cached
+        img, _ = self.read_data(idx, self.images)
+        mask, _ = self.read_data(idx, self.labels)
+        if self.image_cache is not None:
+            self.image_cache.put(idx, img, mask)
+        return img, mask
+
+    def read_decoded_data(self, idx):
+        # Every crop is taken later by adjust_learner_data, so the decoded pair is
+        # returned as is and dropped once all its crops were served
+        if idx not in self.decoded:
+            if len(self.decoded) >= 2 * self.decoded_limit:
+                # Only reached when batches fall out of step with the workers, the
+                # pair closest to done is the cheapest to decode again
+                self.decoded.pop(
+                    min(self.decoded, key=lambda key: self.decoded[key][2])
+                )
+            img, mask = self.read_pair(idx)
+            self.decoded[idx] = [img, mask, self.crops_per_image]
+        entry = self.decoded[idx]
+        entry[2] -= 1
+        if entry[2] == 0:
+            self.decoded.pop(idx)
+        return entry[0], entry[1]
+
+    def read_full_pair(self, idx):
+        if self.image_store is not None:
+            return self.image_store[idx], self.label_store[idx]
+        if self.raster_reader is not None:
+            return (
+                self.raster_reader.read(self.images[idx]),
+                self.raster_reader.read(self.labels[idx]),
+            )
+        return self.read_pair(idx)
+
+    def deterministic_samples(self):
+        """
+        Every image cut in non overlapping tiles of the model input, the last tile
+        pulled back to the border, each process takes its own share of the images.
+        The images are padded by wrapping around, as DistributedSampler does, so
+        every process gets as many of them
+
+        :return: generator of (images, ground_truth) of single tiles
+        """
+        world_size = get_world_size()
+        total = int(np.ceil(len(self) / world_size)) * world_size
+        indices = np.resize(np.arange(len(self)), total)[get_rank() :: world_size]
+        for iterator, idx in enumerate(indices):
+            SystemPrinter.dynamic_print(
+                "Validation Cache", "{}/{}".format(iterator + 1, len(indices))
+            )
+            img, mask = self.read_full_pair(idx)
+            for origin in get_sliding_windows(
+                img.shape[:2], self.model_input_dimension, overlap=0
+            ):
+                yield self.learner_data(
+                    crop_image(img, self.model_input_dimension, origin),
+                    crop_image(mask, self.model_input_dimension, origin),
+                )
+
     def learner_data(self, img, mask):
         ground_truth = dict()
         images = dict()
@@ -153,14 +472,13 @@ class BaseDataSetPt(Dataset, metaclass=ABCMeta):
             ), "Image and mask should have same Tensor dimension"
 
             img, mask = self.transform_image(img, mask)
-            img = self.normalize_image(img)
             mask = self.normalize_label(mask=mask)
 
             assert len(mask.shape) == len(
                 img.shape
             ), "Image and mask should have same Tensor dimension"
 
-            images = handle_dictionary(images, keys[0], to_input_image_tensor(img))
+            images = handle_dictionary(images, keys[0], self.to_image_tensor(img))
             ground_truth = handle_dictionary(
                 ground_truth, keys[1], to_input_image_tensor(mask)
             )
@@ -172,10 +490,20 @@ class BaseDataSetPt(Dataset, metaclass=ABCMeta):
         for individual_data in data:
             keys = list(individual_data.keys())
             img = individual_data[keys[0]]
-            img = self.normalize_image(img)
-            images = handle_dictionary(images, keys[0], to_input_image_tensor(img))
+            images = handle_dictionary(images, keys[0], self.to_image_tensor(img))
         return images
 
+    def to_image_tensor(self, img):
+        if self.device_normalization:
+            # Normalized after transfer by normalize_batch, ship the uint8 image as is
+            return to_input_image_byte_tensor(img)
+        return to_input_image_tensor(self.normalize_image(img))
+
+    def normalize_batch(self, images: dict) -> dict:
+        if not self.device_normalization:
+            return images
+        return {key: self.normalize_image_tensor(value) for key, value in images.items()}
+
     @staticmethod
     def adjust_learner_data(img, mask, dimension) -> [dict]:
         img, mask = handle_image_size(img, mask, dimension)
@@ -192,3 +520,6 @@ class BaseDataSetPt(Dataset, metaclass=ABCMeta):
 
     def normalize_image(self, img) -> np.ndarray:
         raise NotImplementedError
+
+    def normalize_image_tensor(self, img: torch.Tensor) -> torch.Tensor:
+        raise NotImplementedError
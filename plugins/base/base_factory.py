@@ -5,6 +5,9 @@ class Factory:
     def create_data_set(self):
         raise NotImplementedError
 
+    def create_test_data_set(self):
+        raise NotImplementedError
+
     def create_network(self, model_name, model_param):
         raise NotImplementedError
 
@@ -1,9 +1,13 @@
 import cv2
 import numpy as np
+import torch
 
 from utils.image_ops import handle_image_size
 from ..base.base_data_set import BaseDataSetPt
 
+INRIA_MEAN = (0.42068335885143315, 0.43821200008781647, 0.4023395608370018)
+INRIA_STD = (0.03871459540580076, 0.039615887087616986, 0.04203108867447648)
+
 
 class BinaryDataSet(BaseDataSetPt):
     def __init__(self, config, mode):
@@ -31,18 +35,24 @@ class BinaryDataSet(BaseDataSetPt):
     @staticmethod
     def inria_data(img: np.ndarray) -> np.ndarray:
         img = img.astype(np.float32) / 255
-        img -= np.ones(img.shape) * (
-            0.42068335885143315,
-            0.43821200008781647,
-            0.4023395608370018,
-        )
-        img /= np.ones(img.shape) * (
-            0.03871459540580076,
-            0.039615887087616986,
-            0.04203108867447648,
-        )
+        img -= np.array(INRIA_MEAN, dtype=np.float32)
+        img /= np.array(INRIA_STD, dtype=np.float32)
         return img
 
     @staticmethod
     def divide_by_255(img: np.ndarray) -> np.ndarray:
         return img / 255
+
+    def normalize_image_tensor(self, img: torch.Tensor) -> torch.Tensor:
+        return getattr(self, "{}_tensor".format(self.config.normalization))(img)
+
+    @staticmethod
+    def inria_data_tensor(img: torch.Tensor) -> torch.Tensor:
+        # (img / 255 - mean) / std folded into a single scale and shift over the batch
+        std = img.new_tensor(INRIA_STD, dtype=torch.float32).view(1, -1, 1, 1) * 255
+        mean = img.new_tensor(INRIA_MEAN, dtype=torch.float32).view(1, -1, 1, 1) * 255
+        return torch.addcmul(-mean / std, img.float(), 1 / std)
+
+    @staticmethod
+    def divide_by_255_tensor(img: torch.Tensor) -> torch.Tensor:
+        return img.float() / 255
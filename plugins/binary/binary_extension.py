@@ -1,20 +1,20 @@
 import os
-import random
-import shutil
 import cv2
 
 import numpy as np
-from sklearn.metrics import confusion_matrix
+import torch
+from concurrent.futures import ThreadPoolExecutor
 from torchvision.utils import make_grid
 
 from core.extensions.callbacks import Callback
-from core.extensions.metric import Metric
+from core.extensions.metric import ConfusionMetric
 from core.logger import ChronosLogger
 from plugins.base.base_extension import BaseExtension
 from utils.directory_ops import make_directory
 from utils.pt_tensor import make_cuda
 
 EPSILON = 1e-11
+CUTOFF = 0.40
 
 logger = ChronosLogger.get_logger()
 
@@ -24,78 +24,51 @@ class BinaryExtension(BaseExtension):
         super().__init__(config)
 
     def callbacks(self) -> list:
-        return [TestCallback(self.pth)]
+        return [TestCallback(self.pth, self.config.preview_interval)]
 
     def metrics(self) -> list:
         return [Accuracy(), Precision(), Recall(), F1(), IOU()]
 
 
-class Accuracy(Metric):
-    def compute_metric(self, ground_truth: dict, prediction: dict):
-        prediction = prediction["output"]
-        ground_truth = ground_truth["label"]
-        prediction = self.get_numpy(prediction).flatten()
-        ground_truth = self.get_numpy(ground_truth).flatten()
-        prediction = to_binary(prediction)
-        tn, fp, fn, tp = confusion_matrix(
-            ground_truth, prediction, labels=[0, 1]
-        ).ravel()
+class BinaryConfusionMetric(ConfusionMetric):
+    @staticmethod
+    def compute_confusion(ground_truth: dict, prediction: dict):
+        prediction = prediction["output"].detach() >= CUTOFF
+        ground_truth = ground_truth["label"].detach() == 1
+
+        tp = (prediction & ground_truth).sum()
+        fp = prediction.sum() - tp
+        fn = ground_truth.sum() - tp
+        tn = prediction.numel() - tp - fp - fn
+        return torch.stack([tp, fp, fn, tn])
+
+
+class Accuracy(BinaryConfusionMetric):
+    def compute_from_confusion(self, tp, fp, fn, tn):
         num = tp + tn
         den = tp + tn + fp + fn
         return num / (den + EPSILON)
 
 
-class F1(Metric):
-    def compute_metric(self, ground_truth: dict, prediction: dict):
-        prediction = prediction["output"]
-        ground_truth = ground_truth["label"]
-        prediction = self.get_numpy(prediction).flatten()
-        ground_truth = self.get_numpy(ground_truth).flatten()
-        prediction = to_binary(prediction)
-        tn, fp, fn, tp = confusion_matrix(
-            ground_truth, prediction, labels=[0, 1]
-        ).ravel()
+class F1(BinaryConfusionMetric):
+    def compute_from_confusion(self, tp, fp, fn, tn):
         num = 2 * tp
         den = (2 * tp) + fp + fn
         return num / (den + EPSILON)
 
 
-class Recall(Metric):
-    def compute_metric(self, ground_truth: dict, prediction: dict):
-        prediction = prediction["output"]
-        ground_truth = ground_truth["label"]
-        prediction = self.get_numpy(prediction).flatten()
-        ground_truth = self.get_numpy(ground_truth).flatten()
-        prediction = to_binary(prediction)
-        tn, fp, fn, tp = confusion_matrix(
-            ground_truth, prediction, labels=[0, 1]
-        ).ravel()
+class Recall(BinaryConfusionMetric):
+    def compute_from_confusion(self, tp, fp, fn, tn):
         return tp / (tp + fn + EPSILON)
 
 
-class Precision(Metric):
-    def compute_metric(self, ground_truth: dict, prediction: dict):
-        prediction = prediction["output"]
-        ground_truth = ground_truth["label"]
-        prediction = self.get_numpy(prediction).flatten()
-        ground_truth = self.get_numpy(ground_truth).flatten()
-        prediction = to_binary(prediction)
-        tn, fp, fn, tp = confusion_matrix(
-            ground_truth, prediction, labels=[0, 1]
-        ).ravel()
+class Precision(BinaryConfusionMetric):
+    def compute_from_confusion(self, tp, fp, fn, tn):
         return tp / (tp + fp + EPSILON)
 
 
-class IOU(Metric):
-    def compute_metric(self, ground_truth: dict, prediction: dict):
-        prediction = prediction["output"]
-        ground_truth = ground_truth["label"]
-        prediction = self.get_numpy(prediction).flatten()
-        ground_truth = self.get_numpy(ground_truth).flatten()
-        prediction = to_binary(prediction)
-        tn, fp, fn, tp = confusion_matrix(
-            ground_truth, prediction, labels=[0, 1]
-        ).ravel()
+class IOU(BinaryConfusionMetric):
+    def compute_from_confusion(self, tp, fp, fn, tn):
         denominator = tp + fp + fn
         if denominator == 0:
             value = 0
@@ -105,43 +78,75 @@ class IOU(Metric):
 
 
 class TestCallback(Callback):
-    def __init__(self, pth):
+    def __init__(self, pth, interval=500):
         super().__init__()
         self.pth = pth
+        self.interval = interval
+        self.inputs = None
+        self.display_image = None
+        self.previous_save = None
+        self.pending = None
+        self.executor = ThreadPoolExecutor(max_workers=1)
 
     def on_batch_end(self, batch, logs=None):
+        if batch % self.interval != 0:
+            return
+        if self.pending is not None and not self.pending.done():
+            logger.debug("Previous Preview Pending, Skipped %s", batch)
+            return
         model = logs["model"]
         test_loader = logs["test_loader"]
+        try:
+            if self.inputs is None:
+                self.load_inputs(test_loader)
+            prediction = self.predict(model)
+            self.pending = self.executor.submit(
+                self.save_preview, self.display_image, prediction, batch
+            )
+        except Exception as ex:
+            logger.exception("Skipped Exception in {}".format(self.__class__.__name__))
+            logger.exception("Exception {}".format(ex))
+
+    def load_inputs(self, test_loader):
+        # A single test batch is moved to the device once and reused for every preview
+        inputs, _ = next(iter(test_loader))
+        self.display_image = inputs["image"].clone()
+        inputs = make_cuda(inputs)
+        self.inputs = test_loader.dataset.normalize_batch(inputs)
+
+    @torch.no_grad()
+    def predict(self, model):
+        training = model.training
         model.eval()
-        if random.random() < 0.10:
-            try:
-                for i, (inputs, file_path) in enumerate(test_loader):
-
-                    image = make_cuda(inputs)
-                    prediction = model(image)
-                    prediction = prediction["output"]
-                    prediction = prediction.sigmoid()
-                    prediction = to_binary(prediction)
-                    stacked_image = create_prediction_grid(inputs["image"], prediction)
-                    save_path = make_directory(self.pth, "test_prediction")
-
-                    shutil.rmtree(save_path)
-                    os.makedirs(save_path)
-
-                    save_image_path = os.path.join(save_path, "{}.png".format(batch))
-                    cv2.imwrite(
-                        save_image_path, cv2.cvtColor(stacked_image, cv2.COLOR_RGB2BGR)
-                    )
-                    break
-            except Exception as ex:
-                logger.exception(
-                    "Skipped Exception in {}".format(self.__class__.__name__)
-                )
-                logger.exception("Exception {}".format(ex))
-                pass
-
-
-def to_binary(prediction, cutoff=0.40):
+        try:
+            prediction = model(self.inputs)["output"]
+        finally:
+            model.train(training)
+        prediction = prediction.sigmoid()
+        return to_binary(prediction).cpu()
+
+    def save_preview(self, image, prediction, batch):
+        try:
+            stacked_image = create_prediction_grid(image, prediction)
+            save_path = make_directory(self.pth, "test_prediction")
+            save_image_path = os.path.join(save_path, "{}.png".format(batch))
+            cv2.imwrite(save_image_path, cv2.cvtColor(stacked_image, cv2.COLOR_RGB2BGR))
+
+            if self.previous_save is not None and os.path.exists(self.previous_save):
+                os.remove(self.previous_save)
+            self.previous_save = save_image_path
+        except Exception as ex:
+            logger.exception("Skipped Exception in {}".format(self.__class__.__name__))
+            logger.exception("Exception {}".format(ex))
+
+    def on_end(self, logs=None):
+        self.executor.shutdown(wait=True)
+
+    def interruption(self, logs=None):
+        self.executor.shutdown(wait=True)
+
+
+def to_binary(prediction, cutoff=CUTOFF):
     prediction[prediction >= cutoff] = 1
     prediction[prediction < cutoff] = 0
     return prediction
@@ -149,7 +154,7 @@ def to_binary(prediction, cutoff=0.40):
 
 def create_prediction_grid(image, prediction):
     display_image = make_cuda(image)
-    display_image = display_image.cpu()
+    display_image = display_image.cpu().float()
     grid = make_grid(prediction, nrow=2, normalize=True)
     nda = grid.mul(255).clamp(0, 255).byte().permute(1, 2, 0).cpu().numpy()
     grid_sat = make_grid(display_image, nrow=2, normalize=True)
@@ -12,6 +12,11 @@ class BinaryFactory(Factory):
     def create_data_set(self):
         return BinaryDataSet.get_data_loader(self.config)
 
+    def create_test_data_set(self):
+        # Inference only needs the test files and the normalization, the train and
+        # val splits with their caches and indices are never built
+        return BinaryDataSet(self.config, "test")
+
     def create_criterion(self, criterion_name, criterion_param):
         criterion_fn = getattr(criterion, criterion_name)(**criterion_param)
         return criterion_fn
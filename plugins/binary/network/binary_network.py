@@ -1,4 +1,4 @@
-from ml.network import MapNet
+import ml.network
 from plugins.base.network.base_network import BaseNetwork
 
 
@@ -10,7 +10,15 @@ class BinaryNetwork(BaseNetwork):
             self.weight_path = kwargs["weight_path"]
         else:
             self.transfer = False
-        self.map_net = MapNet()
+        # network and network_param in MODEL_PARAM select the ml.network architecture,
+        # e.g. network: MFRN, network_param: {memory_efficient: True}
+        network = kwargs["network"] if "network" in kwargs.keys() else "MapNet"
+        network_param = (
+            kwargs["network_param"]
+            if "network_param" in kwargs.keys() and kwargs["network_param"] is not None
+            else {}
+        )
+        self.map_net = getattr(ml.network, network)(**network_param)
         if self.transfer:
             self.load_pre_trained(self.weight_path)
 
@@ -0,0 +1,212 @@
+import os
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import torch
+
+from config import Config
+from core.factory import Plugin
+from core.logger import info, ChronosLogger
+from train import CONFIG_RESTRICTION
+from utils.image_ops import load_image, pad_image
+from utils.network_util import adjust_model
+from utils.pt_tensor import make_cuda, to_input_image_tensor
+from utils.sliding_window import get_sliding_windows, WeightedStitcher
+from utils.system_printer import SystemPrinter
+from utils.tta import TestTimeAugmentation, DIHEDRAL
+
+logger = ChronosLogger.get_logger()
+
+
+class Predict:
+    def __init__(self, plugin, config_path):
+        self.config_path = config_path
+        self._plugin_name = plugin
+
+    def load_config(self):
+        config = Config(self.config_path, CONFIG_RESTRICTION, self._plugin_name)
+        ChronosLogger().create_console_logger()
+        return config
+
+    @staticmethod
+    @info
+    def load_model(factory, config, weight_path=None):
+        weight_path = config.chk_pth if weight_path is None else weight_path
+        model = factory.create_network(config.model_name, config.model_param)
+        model.load_state_dict(
+            adjust_model(torch.load(str(weight_path), map_location="cpu"))
+        )
+        SystemPrinter.sys_print("Loaded Weights {}".format(weight_path))
+        model = make_cuda(model)
+        model.eval()
+        return model
+
+    @info
+    def run(
+        self,
+        images,
+        save_dir,
+        weight_path=None,
+        overlap=0.25,
+        batch=None,
+        cutoff=0.40,
+        sigma_scale=0.125,
+        tta=None,
+    ):
+        """Predict large scenes tile by tile and stitch the tiles with gaussian weights
+
+        :param images: a scene or a directory of scenes
+        :param save_dir: directory the binary masks are written to
+        :param weight_path: state dict to load, defaults to the chk_pth of the experiment
+        :param overlap: fraction of a tile shared with its neighbour
+        :param batch: number of tiles per forward pass, defaults to TRAIN.BATCH
+        :param cutoff: threshold applied on the sigmoid of the stitched prediction
+        :param sigma_scale: standard deviation of the gaussian weight, relative to the tile size
+        :param tta: dihedral transforms to average every tile over, out of utils.tta.DIHEDRAL
+        :return:
+        """
+        config = self.load_config()
+        batch = config.batch_size if batch is None else batch
+        window_dimension = tuple(config.model_input_dimension)
+
+        factory = Plugin(config).factory
+        model = self.load_model(factory, config, weight_path)
+        if tta is not None:
+            model = TestTimeAugmentation(model, tta)
+        data_set = factory.create_test_data_set()
+
+        images = Path(images)
+        scenes = sorted(images.glob("*")) if images.is_dir() else [images]
+        self.predict_scenes(
+            model,
+            data_set,
+            scenes,
+            save_dir,
+            window_dimension,
+            overlap,
+            batch,
+            cutoff,
+            sigma_scale,
+        )
+
+    @staticmethod
+    def predict_scenes(
+        model,
+        data_set,
+        scenes,
+        save_dir,
+        window_dimension,
+        overlap,
+        batch,
+        cutoff,
+        sigma_scale,
+    ):
+        os.makedirs(save_dir, exist_ok=True)
+        for iterator, scene in enumerate(scenes):
+            start = time.time()
+            image = load_image(str(scene))
+            prediction = Predict.predict_scene(
+                model, data_set, image, window_dimension, overlap, batch, sigma_scale
+            )
+            # sigmoid(x) >= cutoff, evaluated on the logits
+            mask = prediction[0] >= np.log(cutoff / (1 - cutoff))
+            mask = mask.astype(np.uint8) * 255
+            cv2.imwrite(os.path.join(save_dir, "{}.png".format(scene.stem)), mask)
+
+            elapsed = time.time() - start
+            SystemPrinter.sys_print(
+                "{}/{} - {} - {:.2f} MPixel/s".format(
+                    iterator + 1,
+                    len(scenes),
+                    scene.name,
+                    image.shape[0] * image.shape[1] / (elapsed * 1e6),
+                )
+            )
+
+    @info
+    def test(
+        self,
+        save_dir,
+        weight_path=None,
+        tta=tuple(DIHEDRAL.keys()),
+        overlap=0.25,
+        batch=None,
+        cutoff=0.40,
+        sigma_scale=0.125,
+    ):
+        """Predict every image of the test split at full size, tile by tile with test
+        time augmentation, the masks are named after the images
+
+        :param save_dir: directory the binary masks are written to
+        :param weight_path: state dict to load, defaults to the chk_pth of the experiment
+        :param tta: dihedral transforms to average every tile over, out of utils.tta.DIHEDRAL
+        :param overlap: fraction of a tile shared with its neighbour
+        :param batch: number of tiles per forward pass, defaults to TRAIN.BATCH
+        :param cutoff: threshold applied on the sigmoid of the stitched prediction
+        :param sigma_scale: standard deviation of the gaussian weight, relative to the tile size
+        :return:
+        """
+        config = self.load_config()
+        batch = config.batch_size if batch is None else batch
+        factory = Plugin(config).factory
+        model = TestTimeAugmentation(self.load_model(factory, config, weight_path), tta)
+        # Only the file list and normalization of the test split are used, its
+        # __getitem__ crops or pads every image to IMAGE_DIM
+        data_set = factory.create_test_data_set()
+        self.predict_scenes(
+            model,
+            data_set,
+            data_set.images,
+            save_dir,
+            tuple(config.model_input_dimension),
+            overlap,
+            batch,
+            cutoff,
+            sigma_scale,
+        )
+
+    @staticmethod
+    @torch.no_grad()
+    def predict_scene(
+        model, data_set, image, window_dimension, overlap, batch, sigma_scale
+    ):
+        image_height, image_width = image.shape[:2]
+        window_height, window_width = window_dimension
+
+        # Scenes smaller than a tile are reflected up to the tile size
+        limit = max(window_height - image_height, window_width - image_width, 0)
+        limit = (limit + 1) // 2
+        if limit > 0:
+            image = pad_image(image, limit)
+
+        windows = get_sliding_windows(image.shape[:2], window_dimension, overlap)
+        stitcher = None
+        for index in range(0, len(windows), batch):
+            batch_windows = windows[index : index + batch]
+            tiles = torch.stack(
+                [
+                    to_input_image_tensor(
+                        data_set.normalize_image(
+                            image[row : row + window_height, col : col + window_width]
+                        )
+                    )
+                    for row, col in batch_windows
+                ]
+            )
+            prediction = model({"image": make_cuda(tiles)})["output"]
+            prediction = prediction.float().cpu().numpy()
+
+            if stitcher is None:
+                stitcher = WeightedStitcher(
+                    image.shape[:2],
+                    window_dimension,
+                    channels=prediction.shape[1],
+                    sigma_scale=sigma_scale,
+                )
+            for tile_prediction, (row, col) in zip(prediction, batch_windows):
+                stitcher.add(tile_prediction, row, col)
+
+        prediction = stitcher.result()
+        return prediction[:, limit : limit + image_height, limit : limit + image_width]
@@ -0,0 +1,141 @@
+import copy
+import os
+import time
+
+import torch
+
+from config import Config
+from core.extensions.metric import MetricList
+from core.factory import Plugin
+from core.logger import info, ChronosLogger
+from export import Export
+from train import CONFIG_RESTRICTION
+from utils.conv_bn_fusion import fuse_conv_bn
+from utils.quantization import prepare_static, convert_static
+from utils.system_printer import SystemPrinter
+
+logger = ChronosLogger.get_logger()
+
+
+def to_cpu(tensors: dict) -> dict:
+    return {key: value.cpu() for key, value in tensors.items()}
+
+
+class Quantize:
+    def __init__(self, plugin, config_path):
+        self.config_path = config_path
+        self._plugin_name = plugin
+
+    def load_config(self):
+        config = Config(self.config_path, CONFIG_RESTRICTION, self._plugin_name)
+        ChronosLogger().create_console_logger()
+        return config
+
+    @info
+    def run(
+        self,
+        weight_path=None,
+        save_dir=None,
+        calibration_batches=32,
+        evaluation_batches=None,
+        backend="fbgemm",
+    ):
+        """Post training static int8 quantization for CPU inference, calibrated on the
+        val split and compared against fp32 with the plugin metrics
+
+        :param weight_path: state dict to quantize, defaults to the chk_pth of the experiment
+        :param save_dir: directory of the int8 TorchScript, defaults to the directory of weight_path
+        :param calibration_batches: val batches the activation ranges are observed on
+        :param evaluation_batches: val batches fp32 and int8 are compared on, defaults to all
+        :param backend: quantized engine, fbgemm for x86, qnnpack for arm
+        :return: metrics and images/s of fp32 and int8
+        """
+        config = self.load_config()
+        weight_path = config.chk_pth if weight_path is None else weight_path
+        save_dir = os.path.dirname(str(weight_path)) if save_dir is None else save_dir
+        os.makedirs(save_dir, exist_ok=True)
+
+        factory = Plugin(config).factory
+        model = Export.load_model(factory, config, weight_path)
+        val_loader = factory.create_data_set().val_data
+        extension = factory.create_extension()
+
+        image_dim = config.model_input_dimension
+        images = torch.randn(1, 3, image_dim[0], image_dim[1])
+        SystemPrinter.sys_print(
+            "Folded {} BatchNorm layers".format(fuse_conv_bn(model, images))
+        )
+
+        quantized = copy.deepcopy(model)
+        blocks = prepare_static(quantized, backend)
+        SystemPrinter.sys_print(
+            "Quantizing {} convolutions in {} blocks, backend {}".format(
+                sum(block.convolutions for block in blocks), len(blocks), backend
+            )
+        )
+        self.calibrate(quantized, val_loader, calibration_batches)
+        convert_static(quantized)
+
+        report = dict()
+        for name, network in (("fp32", model), ("int8", quantized)):
+            metrics = MetricList(extension.metrics(), streaming=True)
+            report[name] = self.evaluate(
+                network, val_loader, metrics, evaluation_batches
+            )
+            SystemPrinter.sys_print(
+                "{} - Images/s: {:.2f}, {}".format(
+                    name,
+                    report[name]["throughput"],
+                    ", ".join(
+                        "{}: {:.4f}".format(key, value)
+                        for key, value in report[name]["metrics"].items()
+                    ),
+                )
+            )
+        for key in report["fp32"]["metrics"].keys():
+            SystemPrinter.sys_print(
+                "{} Delta: {:+.4f}".format(
+                    key, report["int8"]["metrics"][key] - report["fp32"]["metrics"][key]
+                )
+            )
+        SystemPrinter.sys_print(
+            "Throughput Gain: {:.2f}x".format(
+                report["int8"]["throughput"] / report["fp32"]["throughput"]
+            )
+        )
+
+        stem = "{}_int8".format(os.path.splitext(os.path.basename(str(weight_path)))[0])
+        report["path"] = Export.torchscript(quantized, images, save_dir, stem)
+        SystemPrinter.sys_print("Saved {}".format(report["path"]))
+        return report
+
+    @staticmethod
+    @torch.no_grad()
+    def calibrate(model, data_loader, batches):
+        data_set = data_loader.dataset
+        for iteration, (images, _) in enumerate(data_loader):
+            if iteration == batches:
+                break
+            model(data_set.normalize_batch(to_cpu(images))["image"])
+
+    @staticmethod
+    @torch.no_grad()
+    def evaluate(model, data_loader, metrics, batches=None):
+        data_set = data_loader.dataset
+        images_count = 0
+        elapsed = 0.0
+        for iteration, (images, ground_truth) in enumerate(data_loader):
+            if batches is not None and iteration == batches:
+                break
+            # The validation cache can hold its batches on the device
+            images, ground_truth = to_cpu(images), to_cpu(ground_truth)
+            images = data_set.normalize_batch(images)["image"]
+            start = time.time()
+            prediction = model(images)
+            elapsed += time.time() - start
+            images_count += images.shape[0]
+            metrics.get_metrics(ground_truth, {"output": prediction})
+        return {
+            "metrics": metrics.compute_mean(),
+            "throughput": images_count / elapsed if elapsed > 0 else 0.0,
+        }
@@ -0,0 +1,54 @@
+import cv2
+import numpy as np
+
+from config import Config
+
+TRANSFORMATION = {
+    "DualCompose": {
+        "transform_1": {
+            "augment_prob": 0.5,
+            "to_perform": ["HorizontalFlip"],
+            "transform_type": "OneOf",
+        }
+    }
+}
+
+
+class RunConfig(Config):
+    # The merged DATASET/MODEL/TRAIN sections, without a configuration.yaml
+    def __init__(self, **run_config):
+        self._run_config = run_config
+
+
+def run_config(root, **run_config):
+    return RunConfig(
+        **{
+            "ROOT": str(root),
+            "IMAGE_DIM": [32, 32],
+            "BATCH": 2,
+            "NORMALIZATION": "divide_by_255",
+            "TRANSFORMATION": TRANSFORMATION,
+            **run_config,
+        }
+    )
+
+
+def write_split(root, mode, shapes):
+    """
+    Random images and binary labels of the given (height, width) as png
+
+    :param root:
+    :param mode:
+    :param shapes:
+    :return:
+    """
+    for directory in ("images", "labels"):
+        (root / mode / directory).mkdir(parents=True, exist_ok=True)
+    for iterator, (height, width) in enumerate(shapes):
+        image = np.random.randint(0, 256, (height, width, 3), dtype=np.uint8)
+        label = np.where(image[..., :1] > 127, 255, 0).astype(np.uint8)
+        file_name = "{}.png".format(iterator)
+        cv2.imwrite(str(root / mode / "images" / file_name), image)
+        cv2.imwrite(
+            str(root / mode / "labels" / file_name), np.repeat(label, 3, axis=-1)
+        )
@@ -0,0 +1,126 @@
+import socket
+
+import pytest
+import torch
+import torch.multiprocessing as mp
+from torch import nn
+from torch.utils.data.distributed import DistributedSampler
+
+from core.extensions.metric import MetricList
+from plugins.binary.binary_data_set import BinaryDataSet
+from plugins.binary.binary_extension import F1, IOU, Accuracy
+from tests.data import run_config, write_split
+from utils.distributed import (
+    all_reduce_max,
+    all_reduce_mean,
+    all_reduce_sum,
+    cleanup_distributed,
+    init_distributed,
+    is_main_process,
+)
+from utils.multi_crop import MultiCropBatchSampler
+from utils.network_util import load_parallel_model
+
+WORLD_SIZE = 2
+
+pytestmark = pytest.mark.skipif(
+    not torch.distributed.is_available(), reason="torch.distributed is not available"
+)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+def batch(rank):
+    generator = torch.Generator().manual_seed(rank)
+    prediction = torch.rand((2, 1, 8, 8), generator=generator)
+    label = (torch.rand((2, 1, 8, 8), generator=generator) > 0.5).float()
+    return {"label": label}, {"output": prediction}
+
+
+def equal_on_every_rank(value):
+    return all_reduce_max(value) == value == -all_reduce_max(-value)
+
+
+def check_reduce(rank):
+    assert all_reduce_mean(rank) == (WORLD_SIZE - 1) / 2
+    assert all_reduce_sum(torch.tensor(rank + 1)).item() == 3
+    assert all_reduce_max(rank) == WORLD_SIZE - 1
+
+
+def check_parallel_model(rank):
+    torch.manual_seed(0)
+    model = load_parallel_model(nn.Linear(4, 1))
+    assert isinstance(model, nn.parallel.DistributedDataParallel)
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.1)
+    # Each process steps on its own batch, the all reduced gradients keep the
+    # replicas equal
+    model(torch.full((3, 4), float(rank))).sum().backward()
+    optimizer.step()
+    for parameter in model.parameters():
+        torch.testing.assert_close(
+            all_reduce_sum(parameter.detach()) / WORLD_SIZE, parameter.detach()
+        )
+
+
+def check_streaming_metric(rank):
+    metrics = MetricList([Accuracy(), F1(), IOU()], streaming=True)
+    metrics.get_metrics(*batch(rank))
+    reduced = metrics.compute_mean()
+
+    # Counts of every process summed, as one process seeing every batch
+    expected = MetricList([Accuracy(), F1(), IOU()], streaming=True)
+    for other in range(WORLD_SIZE):
+        ground_truth, prediction = batch(other)
+        expected.compute_metric(ground_truth, prediction)
+    expected = {
+        metric.__class__.__name__: metric.compute_from_confusion(
+            *sum(expected.confusion.values()).tolist()
+        )
+        for metric in expected.metrics
+    }
+    assert reduced.keys() == expected.keys()
+    for key, value in expected.items():
+        assert reduced[key] == pytest.approx(value)
+
+
+def check_shards():
+    for length in (7, 8, 37):
+        assert equal_on_every_rank(len(DistributedSampler(range(length))))
+        for workers in (0, 3):
+            sampler = MultiCropBatchSampler(length, 2, 3, num_workers=workers)
+            assert len(list(sampler)) == len(sampler)
+            assert equal_on_every_rank(len(sampler))
+
+
+def check_validation_cache(root):
+    # Rank 0 tiles images 0 and 2, rank 1 image 1 and image 0 again as padding
+    cache = BinaryDataSet.get_validation_cache(
+        run_config(
+            root,
+            DEVICE_NORMALIZATION=True,
+            VALIDATION_CACHE={"ENABLED": True, "DEVICE_BYTES": 0},
+        )
+    )
+    assert len(cache) == 5
+
+
+def run(rank, port, root):
+    init_distributed(rank, WORLD_SIZE, "gloo", "localhost", port)
+    try:
+        assert is_main_process() == (rank == 0)
+        check_reduce(rank)
+        check_parallel_model(rank)
+        check_streaming_metric(rank)
+        check_shards()
+        check_validation_cache(root)
+    finally:
+        cleanup_distributed()
+
+
+def test_gloo_processes(tmp_path):
+    write_split(tmp_path, "val", [(64, 64), (64, 96), (32, 32)])
+    mp.spawn(run, args=(free_port(), tmp_path), nprocs=WORLD_SIZE)
@@ -0,0 +1,54 @@
+import numpy as np
+
+from utils.foreground_index import INDEX_FILE, ForegroundIndex, occupancy_grid
+
+
+def labels():
+    empty = np.zeros((64, 80, 3), np.uint8)
+    building = np.zeros((64, 80, 3), np.uint8)
+    building[40:48, 8:16] = 255
+    return [empty, building]
+
+
+def test_occupancy_grid():
+    grid = occupancy_grid(labels()[1], 32)
+    assert grid.shape == (2, 3)
+    assert grid[1, 0] == 64 / 32 ** 2
+    assert grid.sum() == grid[1, 0]
+
+
+def test_save_load_round_trip(tmp_path):
+    index = ForegroundIndex.build(labels(), ["a.png", "b.png"], cell=16)
+    index.save(str(tmp_path))
+    assert [path.name for path in tmp_path.iterdir()] == [INDEX_FILE]
+
+    loaded = ForegroundIndex.load(str(tmp_path))
+    assert loaded.cell == 16
+    assert loaded.shapes == [(64, 80), (64, 80)]
+    assert loaded.file_names == ["a.png", "b.png"]
+    for grid, loaded_grid in zip(index.grids, loaded.grids):
+        np.testing.assert_array_equal(grid, loaded_grid)
+
+
+def test_load_missing(tmp_path):
+    assert ForegroundIndex.load(str(tmp_path)) is None
+
+
+def test_matches():
+    index = ForegroundIndex.build(labels(), ["a.png", "b.png"], cell=16)
+    assert index.matches(["a.png", "b.png"], 16)
+    assert not index.matches(["a.png", "b.png"], 32)
+    assert not index.matches(["a.png"], 16)
+    assert not index.matches(["b.png", "a.png"], 16)
+
+
+def test_sample_origin_covers_foreground():
+    np.random.seed(0)
+    index = ForegroundIndex.build(labels(), ["a.png", "b.png"], cell=16)
+    for _ in range(100):
+        row, col = index.sample_origin(1, (32, 32), foreground_ratio=1.0)
+        assert 0 <= row <= 64 - 32 and 0 <= col <= 80 - 32
+        assert labels()[1][row : row + 32, col : col + 32].any()
+    # Labels without foreground fall back to uniform crops
+    row, col = index.sample_origin(0, (32, 32), foreground_ratio=1.0)
+    assert 0 <= row < 64 - 32 and 0 <= col < 80 - 32
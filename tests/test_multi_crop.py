@@ -0,0 +1,74 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from plugins.base.base_data_set import BaseDataSetPt
+from utils.multi_crop import MultiCropBatchSampler, POOL_BATCHES
+
+
+class CountingDataSet(BaseDataSetPt):
+    # Only the state read_decoded_data touches, decodes are counted per image
+    def __init__(self, crops_per_image, batch_size):
+        self.crops_per_image = crops_per_image
+        self.decoded = dict()
+        self.decoded_limit = POOL_BATCHES * batch_size
+        self.decodes = Counter()
+
+    def read_pair(self, idx):
+        self.decodes[idx] += 1
+        return np.zeros((4, 4, 3), np.uint8), np.zeros((4, 4, 3), np.uint8)
+
+    def normalize_label(self, **kwargs):
+        raise NotImplementedError
+
+
+def shard_sampler(length, batch_size, crops, workers, rank, world_size):
+    sampler = MultiCropBatchSampler(length, batch_size, crops, num_workers=workers)
+    sampler.rank, sampler.world_size = rank, world_size
+    return sampler
+
+
+@pytest.mark.parametrize("length", [1, 7, 37, 48, 101])
+@pytest.mark.parametrize("workers", [0, 1, 3])
+@pytest.mark.parametrize("world_size", [1, 2, 3])
+def test_len_matches_iter_on_every_rank(length, workers, world_size):
+    lengths = set()
+    for rank in range(world_size):
+        sampler = shard_sampler(length, 4, 3, workers, rank, world_size)
+        batches = list(sampler)
+        assert len(batches) == len(sampler)
+        lengths.add(len(batches))
+    assert len(lengths) == 1
+
+
+def test_every_image_served_crops_per_image_times():
+    sampler = shard_sampler(37, 4, 3, 2, 0, 1)
+    served = Counter(idx for batch in sampler for idx in batch)
+    assert set(served.keys()) == set(range(37))
+    assert set(served.values()) == {3}
+    assert all(len(set(batch)) == len(batch) for batch in sampler)
+
+
+def test_ranks_cover_the_data_set():
+    served = set()
+    for rank in range(3):
+        sampler = shard_sampler(37, 4, 2, 2, rank, 3)
+        served.update(idx for batch in sampler for idx in batch)
+    assert served == set(range(37))
+
+
+@pytest.mark.parametrize("workers", [0, 1, 2, 4])
+def test_one_decode_per_image(workers):
+    batch_size, crops = 4, 3
+    sampler = shard_sampler(48, batch_size, crops, workers, 0, 1)
+    # Batches go to the workers round robin, each worker has its own dataset copy
+    data_sets = [CountingDataSet(crops, batch_size) for _ in range(max(workers, 1))]
+    for iterator, batch in enumerate(sampler):
+        for idx in batch:
+            data_sets[iterator % len(data_sets)].read_decoded_data(idx)
+
+    decodes = sum((data_set.decodes for data_set in data_sets), Counter())
+    assert set(decodes.keys()) == set(range(48))
+    assert set(decodes.values()) == {1}
+    assert all(len(data_set.decoded) == 0 for data_set in data_sets)
@@ -0,0 +1,35 @@
+import cv2
+from torch import nn
+
+from plugins.binary.binary_data_set import BinaryDataSet
+from predict import Predict
+from tests.data import run_config, write_split
+from utils.tta import TestTimeAugmentation
+
+
+class Threshold(nn.Module):
+    # Logit above zero where the first channel of the image is above one half
+    def forward(self, x):
+        return {"output": x["image"][:, :1] - 0.5}
+
+
+def test_masks_cover_the_full_image(tmp_path):
+    write_split(tmp_path, "test", [(70, 50), (20, 20)])
+    data_set = BinaryDataSet(run_config(tmp_path), "test")
+    save_dir = tmp_path / "prediction"
+    Predict.predict_scenes(
+        TestTimeAugmentation(Threshold()),
+        data_set,
+        data_set.images,
+        str(save_dir),
+        (32, 32),
+        overlap=0.25,
+        batch=2,
+        cutoff=0.5,
+        sigma_scale=0.125,
+    )
+    for image_file in data_set.images:
+        mask = cv2.imread(str(save_dir / image_file.name), cv2.IMREAD_GRAYSCALE)
+        image = cv2.cvtColor(cv2.imread(str(image_file)), cv2.COLOR_BGR2RGB)
+        assert mask.shape == image.shape[:2]
+        assert ((mask > 0) == (image[..., 0] >= 128)).all()
@@ -0,0 +1,54 @@
+import torch
+from torch import nn
+
+from ml.network.mapnet import BnActCon, ResBlock
+from utils.quantization import convert_static, prepare_static
+
+
+class Residual(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.convolution = nn.Conv2d(3, 8, 3, padding=1)
+        self.res = ResBlock(8, 8)
+        self.head = BnActCon(8, 1, kernel_size=1, padding=0)
+
+    def forward(self, x):
+        return self.head(self.res(self.convolution(x)))
+
+
+class Untraceable(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.layers = nn.ModuleList([BnActCon(3, 8), BnActCon(8, 8)])
+
+    def forward(self, x):
+        for layer in self.layers:
+            x = nn.MaxPool2d(kernel_size=1)(layer(x))
+        return x
+
+
+def quantize(model, x):
+    blocks = prepare_static(model)
+    with torch.no_grad():
+        model(x)
+    convert_static(model)
+    return blocks
+
+
+def test_chains_share_one_quantize_step():
+    model = nn.Sequential(Residual()).eval()
+    x = torch.randn(2, 3, 8, 8)
+    expected = model(x)
+    blocks = quantize(model, x)
+    # The residual addition splits the stem, the ResBlock body and the head
+    assert [block.convolutions for block in blocks] == [1, 2, 1]
+    assert torch.allclose(model(x), expected, atol=0.5)
+
+
+def test_children_of_untraceable_modules_are_wrapped():
+    model = nn.Sequential(Untraceable()).eval()
+    x = torch.randn(2, 3, 8, 8)
+    expected = model(x)
+    blocks = quantize(model, x)
+    assert [block.convolutions for block in blocks] == [1, 1]
+    assert model(x).shape == expected.shape
@@ -0,0 +1,79 @@
+import numpy as np
+
+from plugins.binary.binary_data_set import BinaryDataSet
+from tests.data import run_config, write_split
+from utils.shared_image_cache import SharedImageCache
+
+
+def pair(value, size=4):
+    image = np.full((size, size, 3), value, dtype=np.uint8)
+    label = np.full((size, size, 3), 255 - value, dtype=np.uint8)
+    return image, label
+
+
+# A pair of 4x4x3 image and label takes 96 bytes
+PAIR_BYTES = 2 * 4 * 4 * 3
+
+
+def test_get_put():
+    cache = SharedImageCache(4, 4 * PAIR_BYTES)
+    assert cache.get(0) is None
+    cache.put(0, *pair(7))
+    image, label = cache.get(0)
+    np.testing.assert_array_equal(image, pair(7)[0])
+    np.testing.assert_array_equal(label, pair(7)[1])
+
+    statistics = cache.statistics()
+    assert statistics["hits"] == 1
+    assert statistics["misses"] == 1
+    assert statistics["hit_rate"] == 0.5
+    assert statistics["cached"] == 1
+    assert statistics["cached_bytes"] == PAIR_BYTES
+    # Counters are reset after every read of the statistics
+    assert cache.statistics()["hits"] == 0
+
+
+def test_copies_are_returned():
+    cache = SharedImageCache(1, PAIR_BYTES)
+    cache.put(0, *pair(1))
+    image, _ = cache.get(0)
+    image[...] = 0
+    np.testing.assert_array_equal(cache.get(0)[0], pair(1)[0])
+
+
+def test_least_recently_used_is_evicted():
+    cache = SharedImageCache(4, 2 * PAIR_BYTES)
+    cache.put(0, *pair(0))
+    cache.put(1, *pair(1))
+    # 0 is used again, so 1 is the least recently used when 2 arrives
+    assert cache.get(0) is not None
+    cache.put(2, *pair(2))
+    assert cache.get(1) is None
+    np.testing.assert_array_equal(cache.get(0)[0], pair(0)[0])
+    np.testing.assert_array_equal(cache.get(2)[0], pair(2)[0])
+    assert cache.statistics()["cached"] == 2
+
+
+def test_larger_pair_than_a_slot_is_not_cached():
+    cache = SharedImageCache(2, 4 * PAIR_BYTES)
+    cache.put(0, *pair(0))
+    cache.put(1, *pair(1, size=8))
+    assert cache.get(1) is None
+    assert cache.get(0) is not None
+
+
+def test_budget_below_a_pair_caches_nothing():
+    cache = SharedImageCache(2, PAIR_BYTES - 1)
+    cache.put(0, *pair(0))
+    assert cache.get(0) is None
+
+
+def test_budget_is_split_between_splits_and_processes(tmp_path, monkeypatch):
+    write_split(tmp_path, "train", [(8, 8)] * 3)
+    write_split(tmp_path, "val", [(8, 8)])
+    config = run_config(tmp_path, DECODED_CACHE_BYTES=8000)
+    assert BinaryDataSet(config, "train").image_cache.budget == 6000
+    assert BinaryDataSet(config, "val").image_cache.budget == 2000
+
+    monkeypatch.setenv("LOCAL_WORLD_SIZE", "2")
+    assert BinaryDataSet(config, "train").image_cache.budget == 3000
@@ -0,0 +1,82 @@
+import torch
+
+from plugins.base import base_data_set
+from plugins.binary.binary_data_set import BinaryDataSet
+from tests.data import run_config, write_split
+from utils.validation_cache import ValidationCache
+
+
+def samples(count):
+    for value in range(count):
+        image = torch.full((3, 4, 4), value, dtype=torch.uint8)
+        label = torch.full((1, 4, 4), value % 2, dtype=torch.float32)
+        yield {"image": image}, {"label": label}
+
+
+def test_batches_replay_in_order():
+    cache = ValidationCache(None, samples(10), batch_size=4)
+    assert len(cache) == 3
+    for _ in range(2):
+        seen = [images["image"][:, 0, 0, 0].tolist() for images, _ in cache]
+        assert seen == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+
+
+def test_labels_are_compacted_and_restored():
+    cache = ValidationCache(None, samples(5), batch_size=2)
+    assert all(
+        ground_truth["label"].dtype == torch.uint8 for _, ground_truth in cache.batches
+    )
+    for images, ground_truth in cache:
+        assert images["image"].dtype == torch.uint8
+        assert ground_truth["label"].dtype == torch.float32
+    assert cache.nbytes == 5 * (3 * 16 + 16)
+
+
+def test_fractional_labels_are_kept():
+    soft = [
+        (
+            {"image": torch.zeros(3, 2, 2, dtype=torch.uint8)},
+            {"label": torch.full((1, 2, 2), 0.5)},
+        )
+    ]
+    cache = ValidationCache(None, soft, batch_size=1)
+    _, ground_truth = next(iter(cache))
+    assert torch.equal(ground_truth["label"], torch.full((1, 1, 2, 2), 0.5))
+
+
+def validation_config(tmp_path, val_shapes):
+    write_split(tmp_path, "train", [(32, 32)])
+    write_split(tmp_path, "val", val_shapes)
+    write_split(tmp_path, "test", [(32, 32)])
+    return run_config(
+        tmp_path,
+        DEVICE_NORMALIZATION=True,
+        VALIDATION_CACHE={"ENABLED": True, "DEVICE_BYTES": 0},
+    )
+
+
+def test_get_data_loader_builds_the_cache(tmp_path):
+    config = validation_config(tmp_path, [(64, 64), (64, 96)])
+    val_data = BinaryDataSet.get_data_loader(config).val_data
+    assert isinstance(val_data, ValidationCache)
+    # 4 + 6 tiles of 32 x 32 in batches of 2
+    assert val_data.length == 10
+    assert len(val_data) == 5
+    for images, ground_truth in val_data:
+        assert images["image"].shape == (2, 3, 32, 32)
+        assert images["image"].dtype == torch.uint8
+        assert ground_truth["label"].shape == (2, 1, 32, 32)
+
+
+def test_every_rank_gets_as_many_batches(tmp_path, monkeypatch):
+    config = validation_config(tmp_path, [(64, 64), (64, 96), (32, 32)])
+    caches = list()
+    for rank in range(2):
+        monkeypatch.setattr(base_data_set, "get_rank", lambda: rank)
+        monkeypatch.setattr(base_data_set, "get_world_size", lambda: 2)
+        # Rank 0 tiles images 0 and 2, rank 1 image 1 and image 0 again as padding
+        monkeypatch.setattr(base_data_set, "all_reduce_max", lambda value: 5)
+        caches.append(BinaryDataSet.get_validation_cache(config))
+    assert [cache.length for cache in caches] == [5, 10]
+    assert [len(cache) for cache in caches] == [5, 5]
+    assert len(list(caches[0])) == 5
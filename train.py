@@ -1,3 +1,4 @@
+import logging
 import os
 
 import torch
@@ -10,11 +11,13 @@ from core.extensions.callbacks import (
     TimeCallback,
 )
 
+from core.checkpoint import CheckpointWriter
 from core.factory import Plugin
 from core.learner import Learner
 from config import Config
 from core.logger import info, ChronosLogger
 from core.extensions.metric import MetricList
+from utils.distributed import init_distributed, cleanup_distributed, is_main_process
 
 CONFIG_RESTRICTION = ["DATASET", "MODEL", "TRAIN"]
 
@@ -49,19 +52,45 @@ class Train:
             save_path = os.path.join(config.training_path, config.version)
             config.write_config(save_path)
 
-        ChronosLogger().create_logger(
-            config.root_folder,
-            config.plugin,
-            config.experiment_name,
-            config.model_name,
-            config.version,
+        if config.distributed:
+            # One process per device, all of them share the experiment set up above
+            torch.multiprocessing.spawn(
+                self.run_distributed, args=(config,), nprocs=config.world_size
+            )
+        else:
+            self.train(config)
+
+    def run_distributed(self, rank, config):
+        init_distributed(
+            rank,
+            config.world_size,
+            config.distributed_backend,
+            config.master_addr,
+            config.master_port,
         )
+        try:
+            self.train(config)
+        finally:
+            cleanup_distributed()
+
+    def train(self, config):
+        if is_main_process():
+            ChronosLogger().create_logger(
+                config.root_folder,
+                config.plugin,
+                config.experiment_name,
+                config.model_name,
+                config.version,
+                config.log_level,
+            )
+        else:
+            ChronosLogger().create_console_logger(logging.WARNING)
         self.plugin = Plugin(config)
         self.plugin.load_plugin()
         self.load_optimizer(config.optimizer_name, config.optimizer_param)
 
         callbacks = self.register_callbacks(config, self.plugin.extension.callbacks())
-        metrics = self.register_metrics(self.plugin.extension.metrics())
+        metrics = self.register_metrics(config, self.plugin.extension.metrics())
         Learner(config).training(self.plugin, self.optimizer, callbacks, metrics)
 
     @info
@@ -74,11 +103,21 @@ class Train:
     @info
     def register_callbacks(self, config, extension_callbacks):
         callbacks = CallbackList()
+        if not is_main_process():
+            # State, checkpoints, events and previews are written by rank 0 alone
+            return callbacks
         callbacks.append(
-            TensorBoardCallback(os.path.join(config.training_path, config.version))
+            TensorBoardCallback(
+                os.path.join(config.training_path, config.version),
+                config.tensorboard_flush_steps,
+                config.tensorboard_flush_secs,
+            )
         )
-        callbacks.append(TrainStateCallback(config.default_state, config.best_state))
-        callbacks.append(TrainChkCallback(config.chk_pth))
+        writer = CheckpointWriter() if config.async_checkpoint else None
+        callbacks.append(
+            TrainStateCallback(config.default_state, config.best_state, writer)
+        )
+        callbacks.append(TrainChkCallback(config.chk_pth, writer))
         callbacks.append(TimeCallback())
 
         for individual_callbacks in extension_callbacks:
@@ -87,6 +126,6 @@ class Train:
         return callbacks
 
     @info
-    def register_metrics(self, metric):
-        metrics = MetricList(metric)
+    def register_metrics(self, config, metric):
+        metrics = MetricList(metric, streaming=config.streaming_metric)
         return metrics
@@ -0,0 +1,141 @@
+from collections import Counter, defaultdict
+
+import torch
+from torch import nn
+
+from ml.modules.activation_checkpoint import CHECKPOINT_FLAGS
+
+
+def fold_bn_into_conv(convolution, bn):
+    """
+    Fold the affine transform of an eval mode BatchNorm2d into the weights and bias of
+    the Conv2d whose output it normalizes
+
+    :param convolution: nn.Conv2d
+    :param bn: nn.BatchNorm2d with running statistics
+    :return:
+    """
+    with torch.no_grad():
+        scale = torch.rsqrt(bn.running_var + bn.eps)
+        shift = -bn.running_mean * scale
+        if bn.affine:
+            scale = scale * bn.weight
+            shift = shift * bn.weight + bn.bias
+
+        convolution.weight.mul_(scale.reshape(-1, 1, 1, 1))
+        if convolution.bias is None:
+            convolution.bias = nn.Parameter(shift.clone())
+        else:
+            convolution.bias.mul_(scale).add_(shift)
+
+
+def find_conv_bn(model, *inputs):
+    """
+    Pairs of Conv2d and BatchNorm2d where the BatchNorm is the only consumer of the
+    convolution output, found by running the model once and walking the autograd graph.
+
+    Module attributes do not tell the order of execution, MapNet for instance runs
+    BN-ReLU-Conv blocks where the foldable pair is the convolution of one block and
+    the BN of the next. A pair is kept only when it holds for every call of both modules
+
+    :param model:
+    :param inputs: example inputs of the model
+    :return: list of (conv, bn)
+    """
+    conv_calls = defaultdict(list)
+    bn_calls = defaultdict(list)
+
+    def conv_hook(module, _, output):
+        conv_calls[module].append(output.grad_fn)
+
+    def bn_hook(module, module_input, _):
+        bn_calls[module].append(module_input[0].grad_fn)
+
+    handles = list()
+    for module in model.modules():
+        if isinstance(module, nn.Conv2d):
+            handles.append(module.register_forward_hook(conv_hook))
+        elif isinstance(module, nn.BatchNorm2d) and module.track_running_stats:
+            handles.append(module.register_forward_hook(bn_hook))
+
+    # inputs require grad so the graph exists even for frozen weights
+    inputs = [tensor.detach().clone().requires_grad_() for tensor in inputs]
+    try:
+        with torch.enable_grad():
+            outputs = model(*inputs)
+    finally:
+        for handle in handles:
+            handle.remove()
+
+    if isinstance(outputs, dict):
+        outputs = list(outputs.values())
+    elif isinstance(outputs, torch.Tensor):
+        outputs = [outputs]
+
+    consumers = Counter()
+    stack = [output.grad_fn for output in outputs if output.grad_fn is not None]
+    visited = set(stack)
+    while stack:
+        node = stack.pop()
+        for next_node, _ in node.next_functions:
+            if next_node is None:
+                continue
+            consumers[next_node] += 1
+            if next_node not in visited:
+                visited.add(next_node)
+                stack.append(next_node)
+
+    producers = {
+        node: convolution
+        for convolution, nodes in conv_calls.items()
+        for node in nodes
+        if node is not None
+    }
+    pairs = list()
+    paired = set()
+    for bn, nodes in bn_calls.items():
+        convolutions = {producers.get(node) for node in nodes}
+        if len(convolutions) != 1 or None in convolutions:
+            continue
+        convolution = convolutions.pop()
+        if convolution in paired:
+            continue
+        if len(conv_calls[convolution]) != len(nodes):
+            continue
+        if any(consumers[node] != 1 for node in nodes):
+            continue
+        pairs.append((convolution, bn))
+        paired.add(convolution)
+    return pairs
+
+
+def fuse_conv_bn(model, *inputs):
+    """
+    Prepare a model for inference by folding every BatchNorm2d that directly follows a
+    Conv2d into that convolution and replacing it with nn.Identity.
+
+    The model is put in eval mode and activation checkpointing is switched off, both
+    are prerequisites of the fold. BatchNorm layers that precede their convolution, the
+    BN-ReLU-Conv blocks of MapNet, stay as they are
+
+    :param model:
+    :param inputs: example inputs of the model, used to trace the execution order
+    :return: number of folded BatchNorm layers
+    """
+    model.eval()
+    for module in model.modules():
+        for flag in CHECKPOINT_FLAGS:
+            if isinstance(getattr(module, flag, None), bool):
+                setattr(module, flag, False)
+
+    pairs = find_conv_bn(model, *inputs)
+    parents = {
+        child: (parent, name)
+        for parent in model.modules()
+        for name, child in parent.named_children()
+    }
+    for convolution, bn in pairs:
+        fold_bn_into_conv(convolution, bn)
+        parent, name = parents[bn]
+        setattr(parent, name, nn.Identity())
+    return len(pairs)
@@ -1,8 +1,13 @@
 import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import rasterio
 import numpy as np
-from PIL import Image
 
+from utils.directory_ops import make_directory
+from utils.sliding_window import get_sliding_windows
 from utils.system_printer import SystemPrinter
 
 
@@ -27,50 +32,61 @@ def get_windows(crop_size, img_size, sliding_len):
     return cropped_windows
 
 
+def is_empty_label(label: np.ndarray):
+    # No foreground pixel in any band, what Image.getbbox() returning None checked
+    return not label.any()
+
+
+def window_meta(source, tiff_window, cropped_image_dimension):
+    kwargs = source.meta.copy()
+    kwargs.update(
+        {
+            "crs": "EPSG:4326",
+            "height": cropped_image_dimension,
+            "width": cropped_image_dimension,
+            "transform": source.window_transform(tiff_window),
+        }
+    )
+    return kwargs
+
+
+def write_window(save_path, data, kwargs):
+    with rasterio.open(save_path, "w", **kwargs) as dst:
+        dst.write(data)
+
+
 def crop_geo_transform(
     temp_image, cropped_windows, cropped_image_dimension, temp_label=None
 ):
-    cropped_data = {}
-
-    for index, tiff_window in zip(range(0, len(cropped_windows)), cropped_windows):
-        cropped_image = temp_image.read(window=tiff_window)
+    """
+    Yield the crops of a scene one window at a time, windows with an empty label are
+    skipped before the image is read
+
+    :param temp_image: rasterio dataset of the image
+    :param cropped_windows: ((row_start, row_stop), (col_start, col_stop)) windows
+    :param cropped_image_dimension:
+    :param temp_label: rasterio dataset of the label
+    :return: generator of (window index, crop)
+    """
+    for index, tiff_window in enumerate(cropped_windows):
         if temp_label is not None:
             cropped_label = temp_label.read(window=tiff_window)
-            kwargs_label = temp_label.meta.copy()
-            kwargs_label.update(
-                {
-                    "crs": "EPSG:4326",
-                    "height": cropped_image_dimension,
-                    "width": cropped_image_dimension,
-                    "transform": temp_label.window_transform(tiff_window),
-                }
-            )
-
-            if not Image.fromarray(cropped_label[0]).getbbox():
+            if is_empty_label(cropped_label):
                 continue
+            kwargs_label = window_meta(temp_label, tiff_window, cropped_image_dimension)
         else:
             cropped_label = None
             kwargs_label = None
 
-        kwargs_image = temp_image.meta.copy()
-        kwargs_image.update(
-            {
-                "crs": "EPSG:4326",
-                "height": cropped_image_dimension,
-                "width": cropped_image_dimension,
-                "transform": temp_image.window_transform(tiff_window),
-            }
-        )
-
-        cropped_data[index] = {
-            "image": cropped_image,
+        yield index, {
+            "image": temp_image.read(window=tiff_window),
             "label": cropped_label,
-            "kwargs_image": kwargs_image,
+            "kwargs_image": window_meta(
+                temp_image, tiff_window, cropped_image_dimension
+            ),
             "kwargs_label": kwargs_label,
         }
 
-    return cropped_data
-
 
 def crop_image(temp_image, cropped_windows):
     cropped_images = []
@@ -84,11 +100,8 @@ def adjust_prediction_overlap(
 ):
     cropped_image = final_image[part_1_x:part_1_y, part_2_x:part_2_y]
     prediction = np.add(cropped_image, prediction)
-    cropped_x, cropped_y = np.nonzero(cropped_image)
-    for iterator in range(len(cropped_x)):
-        prediction[cropped_x[iterator], cropped_y[iterator]] = float(
-            prediction[cropped_x[iterator], cropped_y[iterator]] / 2
-        )
+    overlap = cropped_image != 0
+    prediction[overlap] = prediction[overlap] / 2
     final_image[part_1_x:part_1_y, part_2_x:part_2_y] = prediction
     return final_image
 
@@ -162,19 +175,11 @@ def perform_crop_image_label(
             keep_original=keep_original,
         )
 
-        for key, value in cropped_data.items():
+        for key, value in cropped_data:
             save_image_path = os.path.join(save_image_dir, str(key) + "_" + file_name)
             save_label_path = os.path.join(save_label_dir, str(key) + "_" + file_name)
-
-            save_image = value["image"]
-            save_label = value["label"]
-            kwargs_image = value["kwargs_image"]
-            kwargs_label = value["kwargs_label"]
-            with rasterio.open(save_image_path, "w", **kwargs_image) as dst:
-                dst.write(save_image)
-
-            with rasterio.open(save_label_path, "w", **kwargs_label) as dst:
-                dst.write(save_label)
+            write_window(save_image_path, value["image"], value["kwargs_image"])
+            write_window(save_label_path, value["label"], value["kwargs_label"])
 
 
 def get_sliding_len(crop_dimension, image_dimension):
@@ -211,27 +216,149 @@ def perform_crop_image(
             keep_original=keep_original,
         )
 
-        for key, value in cropped_data.items():
+        for key, value in cropped_data:
             save_image_path = os.path.join(save_image_dir, str(key) + "_" + file_name)
-
-            save_image = value["image"]
-            kwargs_image = value["kwargs_image"]
-            with rasterio.open(save_image_path, "w", **kwargs_image) as dst:
-                dst.write(save_image)
+            write_window(save_image_path, value["image"], value["kwargs_image"])
 
 
-perform_crop_image_label(
-    "/home/palnak/Dataset/scratch_inria/NEW2-AerialImageDataset/AerialImageDataset/train/images",
-    "/home/palnak/Dataset/scratch_inria/NEW2-AerialImageDataset/AerialImageDataset/train/gt",
+def tile_scene(
+    image_file, label_file, save_image_dir, save_label_dir, crop_size, skip_empty=True
+):
+    """
+    Tile a single scene, every window is written as soon as it is read
+
+    :param image_file:
+    :param label_file: None for scenes without label
+    :param save_image_dir:
+    :param save_label_dir:
+    :param crop_size:
+    :param skip_empty: drop windows without foreground in the label
+    :return: number of tiles written and skipped
+    """
+    written, skipped = 0, 0
+    file_name = os.path.basename(image_file)
+    image = rasterio.open(image_file, driver="GTiff")
+    label = (
+        rasterio.open(label_file, driver="GTiff") if label_file is not None else None
+    )
+    try:
+        if image.height < crop_size or image.width < crop_size:
+            return written, skipped
+        cropped_windows = [
+            ((row, row + crop_size), (col, col + crop_size))
+            for row, col in get_sliding_windows(
+                (image.height, image.width), (crop_size, crop_size), overlap=0
+            )
+        ]
+        for index, tiff_window in enumerate(cropped_windows):
+            save_name = "{}_{}".format(index, file_name)
+            if label is not None:
+                cropped_label = label.read(window=tiff_window)
+                if skip_empty and is_empty_label(cropped_label):
+                    skipped += 1
+                    continue
+                write_window(
+                    os.path.join(save_label_dir, save_name),
+                    cropped_label,
+                    window_meta(label, tiff_window, crop_size),
+                )
+            write_window(
+                os.path.join(save_image_dir, save_name),
+                image.read(window=tiff_window),
+                window_meta(image, tiff_window, crop_size),
+            )
+            written += 1
+    finally:
+        image.close()
+        if label is not None:
+            label.close()
+    return written, skipped
+
+
+def split_scenes(files, val_fraction=0.1, test_fraction=0.1, seed=0):
+    """
+    Assign whole scenes to train, val and test so no scene leaks across splits
+
+    :param files:
+    :param val_fraction:
+    :param test_fraction:
+    :return: dict of split name to files
+    """
+    files = sorted(files)
+    random.Random(seed).shuffle(files)
+    test_count = int(round(len(files) * test_fraction))
+    val_count = int(round(len(files) * val_fraction))
+    return {
+        "test": files[:test_count],
+        "val": files[test_count : test_count + val_count],
+        "train": files[test_count + val_count :],
+    }
+
+
+def tile_dataset(
+    image_dir,
+    save_dir,
+    label_dir=None,
     crop_size=512,
-    image_dimension=5000,
-    save_dir="/home/palnak/Dataset/scratch_inria/512x512",
-    keep_original=False,
-)
-# perform_crop_image(
-#     image_dir="/home/palnak/Temp/prediction/test/images",
-#     save_dir="/home/palnak/Temp/prediction/test/",
-#     crop_size=256,
-#     image_dimension=512,
-#     keep_original=False,
-# )
+    val_fraction=0.1,
+    test_fraction=0.1,
+    workers=None,
+    skip_empty=True,
+    seed=0,
+):
+    """
+    Tile every scene of image_dir into the train/val/test images and labels layout
+    BaseDataSetPt reads, scenes are processed in parallel by a process pool. Empty
+    label windows are skipped in train and val, the test split keeps them
+
+    :param image_dir:
+    :param save_dir:
+    :param label_dir: labels with the same file names as the images
+    :param crop_size:
+    :param val_fraction: fraction of scenes in val
+    :param test_fraction: fraction of scenes in test
+    :param workers: processes, defaults to the cpu count
+    :param skip_empty:
+    :param seed: seed of the scene split
+    :return: dict of split name to (tiles written, tiles skipped), tiles/s
+    """
+    splits = split_scenes(os.listdir(image_dir), val_fraction, test_fraction, seed)
+    jobs = list()
+    for mode, files in splits.items():
+        save_image_dir = make_directory(make_directory(save_dir, mode), "images")
+        save_label_dir = (
+            make_directory(make_directory(save_dir, mode), "labels")
+            if label_dir is not None
+            else None
+        )
+        for file_name in files:
+            jobs.append(
+                (
+                    mode,
+                    (
+                        os.path.join(image_dir, file_name),
+                        os.path.join(label_dir, file_name)
+                        if label_dir is not None
+                        else None,
+                        save_image_dir,
+                        save_label_dir,
+                        crop_size,
+                        skip_empty and mode != "test",
+                    ),
+                )
+            )
+
+    report = {mode: [0, 0] for mode in splits.keys()}
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(tile_scene, *args): mode for mode, args in jobs}
+        for iterator, future in enumerate(as_completed(futures)):
+            written, skipped = future.result()
+            report[futures[future]][0] += written
+            report[futures[future]][1] += skipped
+            SystemPrinter.dynamic_print(
+                "Tile", "{}/{} scenes".format(iterator + 1, len(jobs))
+            )
+    elapsed = time.time() - start
+    tiles = sum(written for written, _ in report.values())
+    return report, tiles / elapsed if elapsed > 0 else 0.0
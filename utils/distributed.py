@@ -0,0 +1,105 @@
+import os
+
+import torch
+import torch.distributed as dist
+
+
+def is_distributed():
+    return dist.is_available() and dist.is_initialized()
+
+
+def get_rank():
+    return dist.get_rank() if is_distributed() else 0
+
+
+def get_world_size():
+    return dist.get_world_size() if is_distributed() else 1
+
+
+def get_local_world_size():
+    # Processes sharing this host, every rank of a Train.run spawn, torchrun sets it
+    return int(os.environ.get("LOCAL_WORLD_SIZE", get_world_size()))
+
+
+def is_main_process():
+    return get_rank() == 0
+
+
+def init_distributed(rank, world_size, backend, master_addr, master_port):
+    """
+    Join the process group of a DistributedDataParallel run, on GPU every process
+    owns the device of its rank
+
+    :param rank:
+    :param world_size:
+    :param backend: nccl or gloo
+    :param master_addr:
+    :param master_port:
+    :return:
+    """
+    os.environ["MASTER_ADDR"] = str(master_addr)
+    os.environ["MASTER_PORT"] = str(master_port)
+    if torch.cuda.is_available():
+        torch.cuda.set_device(rank % torch.cuda.device_count())
+    dist.init_process_group(backend, rank=rank, world_size=world_size)
+
+
+def cleanup_distributed():
+    if is_distributed():
+        dist.destroy_process_group()
+
+
+def barrier():
+    if is_distributed():
+        dist.barrier()
+
+
+def reduce_device():
+    # nccl only reduces device tensors, gloo is used with host tensors
+    if dist.get_backend() == "nccl":
+        return torch.device("cuda", torch.cuda.current_device())
+    return torch.device("cpu")
+
+
+def all_reduce_sum(tensor: torch.Tensor) -> torch.Tensor:
+    if not is_distributed():
+        return tensor
+    reduced = tensor.detach().clone().to(reduce_device())
+    dist.all_reduce(reduced, op=dist.ReduceOp.SUM)
+    return reduced.to(tensor.device)
+
+
+def all_reduce_mean(value):
+    """
+    Mean of a python number over all processes
+
+    :param value:
+    :return:
+    """
+    if not is_distributed():
+        return value
+    reduced = all_reduce_sum(torch.tensor(float(value), dtype=torch.float64))
+    return reduced.item() / get_world_size()
+
+
+def all_reduce_max(value):
+    """
+    Largest python number over all processes
+
+    :param value:
+    :return:
+    """
+    if not is_distributed():
+        return value
+    reduced = torch.tensor(value).to(reduce_device())
+    dist.all_reduce(reduced, op=dist.ReduceOp.MAX)
+    return reduced.item()
+
+
+def unwrap_model(model):
+    if isinstance(
+        model,
+        (torch.nn.DataParallel, torch.nn.parallel.DistributedDataParallel),
+    ):
+        return model.module
+    return model
@@ -0,0 +1,124 @@
+import os
+import tempfile
+
+import numpy as np
+
+from utils.image_ops import get_random_crop_x_and_y
+
+INDEX_FILE = "foreground_index.npz"
+
+
+def occupancy_grid(mask: np.ndarray, cell: int) -> np.ndarray:
+    """
+    Fraction of foreground pixels in every cell x cell block of the label
+
+    :param mask: (H, W) or (H, W, C) label, any non zero channel is foreground
+    :param cell: side of a block in pixels
+    :return: (ceil(H / cell), ceil(W / cell)) float32 grid
+    """
+    foreground = mask.any(axis=-1) if mask.ndim == 3 else mask != 0
+    height, width = foreground.shape
+    pad_height, pad_width = -height % cell, -width % cell
+    foreground = np.pad(foreground, ((0, pad_height), (0, pad_width)))
+    blocks = foreground.reshape(
+        foreground.shape[0] // cell, cell, foreground.shape[1] // cell, cell
+    )
+    return blocks.mean(axis=(1, 3), dtype=np.float32)
+
+
+class ForegroundIndex:
+    """
+    Coarse occupancy grid of every label of a split, built once and cached as a
+    single npz next to the split, used to place crops over foreground
+    """
+
+    def __init__(self, grids, shapes, file_names, cell):
+        self.grids = grids
+        self.shapes = shapes
+        self.file_names = file_names
+        self.cell = cell
+        # Foreground cells of every label, drawn from uniformly
+        self.foreground_cells = [np.argwhere(grid > 0) for grid in grids]
+
+    @classmethod
+    def build(cls, masks, file_names, cell=32):
+        """
+
+        :param masks: iterable of (H, W, C) labels, consumed one at a time
+        :param file_names: label file of every mask
+        :param cell: side of a grid block in pixels
+        :return:
+        """
+        grids, shapes = list(), list()
+        for mask in masks:
+            grids.append(occupancy_grid(mask, cell))
+            shapes.append(mask.shape[:2])
+        return cls(grids, shapes, [str(file_name) for file_name in file_names], cell)
+
+    @classmethod
+    def load(cls, index_dir):
+        path = os.path.join(index_dir, INDEX_FILE)
+        if not os.path.exists(path):
+            return None
+        index = np.load(path)
+        grid_shape = index["grid_shape"]
+        grid_offset = np.cumsum([0] + [int(np.prod(shape)) for shape in grid_shape])
+        grids = [
+            index["grid"][grid_offset[i] : grid_offset[i + 1]].reshape(shape)
+            for i, shape in enumerate(grid_shape)
+        ]
+        return cls(
+            grids,
+            [tuple(shape) for shape in index["shape"]],
+            list(index["file_name"]),
+            int(index["cell"]),
+        )
+
+    def save(self, index_dir):
+        # Written to a unique file aside and renamed, a reader never sees a partial
+        # index and concurrent writers never share a temporary file
+        path = os.path.join(index_dir, INDEX_FILE)
+        handle, temp_path = tempfile.mkstemp(suffix=".npz", dir=index_dir)
+        os.close(handle)
+        np.savez(
+            temp_path,
+            grid=np.concatenate([grid.ravel() for grid in self.grids]),
+            grid_shape=np.array([grid.shape for grid in self.grids], dtype=np.int64),
+            shape=np.array(self.shapes, dtype=np.int64),
+            file_name=np.array(self.file_names),
+            cell=np.array(self.cell),
+        )
+        os.replace(temp_path, path)
+
+    def matches(self, file_names, cell):
+        return self.cell == cell and self.file_names == [
+            str(file_name) for file_name in file_names
+        ]
+
+    def sample_origin(self, idx, dimension, foreground_ratio):
+        """
+        Top left corner of a crop, with probability foreground_ratio the crop covers
+        a foreground cell, otherwise it is uniform like handle_image_size
+
+        :param idx: position of the label in the split
+        :param dimension: (height, width) of the crop
+        :param foreground_ratio:
+        :return: (row, col)
+        """
+        height, width = self.shapes[idx]
+        cells = self.foreground_cells[idx]
+        if len(cells) == 0 or np.random.random_sample() >= foreground_ratio:
+            return get_random_crop_x_and_y(dimension, (height, width, None))
+
+        cell_row, cell_col = cells[np.random.randint(len(cells))] * self.cell
+        return (
+            self.cover(cell_row, self.cell, dimension[0], height),
+            self.cover(cell_col, self.cell, dimension[1], width),
+        )
+
+    @staticmethod
+    def cover(start, cell, crop, length):
+        # Any crop start keeping the cell inside the crop and the crop inside the image
+        low = max(0, min(start + cell - crop, length - crop))
+        high = max(low, min(start, length - crop))
+        return np.random.randint(low, high + 1)
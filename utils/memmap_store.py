@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+
+STORE_FILE = "{}.bin"
+INDEX_FILE = "{}_index.npz"
+
+
+class MemMapStore:
+    """
+    Read only view over uint8 arrays packed back to back in a single file, every
+    item is a zero copy slice of the memory map reshaped with the stored shape
+    """
+
+    def __init__(self, store_dir, name):
+        self.store_file = os.path.join(store_dir, STORE_FILE.format(name))
+        index = np.load(os.path.join(store_dir, INDEX_FILE.format(name)))
+        self.offset = index["offset"]
+        self.shape = index["shape"]
+        self.file_name = list(index["file_name"])
+        self._data = None
+
+    @property
+    def data(self):
+        # Opened lazily so every DataLoader worker maps the file itself
+        if self._data is None:
+            self._data = np.memmap(self.store_file, dtype=np.uint8, mode="r")
+        return self._data
+
+    def __len__(self):
+        return len(self.offset)
+
+    def __getitem__(self, idx):
+        offset = self.offset[idx]
+        shape = tuple(self.shape[idx])
+        return self.data[offset : offset + int(np.prod(shape))].reshape(shape)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_data"] = None
+        return state
+
+    @staticmethod
+    def exists(store_dir, name):
+        return os.path.exists(
+            os.path.join(store_dir, STORE_FILE.format(name))
+        ) and os.path.exists(os.path.join(store_dir, INDEX_FILE.format(name)))
+
+    @staticmethod
+    def write(store_dir, name, arrays, file_names):
+        """
+
+        :param store_dir: directory holding the store
+        :param name: name of the store
+        :param arrays: iterable of (H, W, C) arrays, consumed one at a time
+        :param file_names: source file of every array
+        :return:
+        """
+        os.makedirs(store_dir, exist_ok=True)
+        offset = list()
+        shape = list()
+        with open(os.path.join(store_dir, STORE_FILE.format(name)), "wb") as writer:
+            for array in arrays:
+                offset.append(writer.tell())
+                shape.append(array.shape)
+                writer.write(np.ascontiguousarray(array, dtype=np.uint8).tobytes())
+        np.savez(
+            os.path.join(store_dir, INDEX_FILE.format(name)),
+            offset=np.array(offset, dtype=np.int64),
+            shape=np.array(shape, dtype=np.int64),
+            file_name=np.array([str(file_name) for file_name in file_names]),
+        )
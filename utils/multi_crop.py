@@ -0,0 +1,89 @@
+from itertools import zip_longest
+
+import numpy as np
+from torch.utils.data import Sampler
+
+from utils.distributed import get_rank, get_world_size
+
+POOL_BATCHES = 2
+
+
+class MultiCropBatchSampler(Sampler):
+    """
+    Yield every image index crops_per_image times so one decode serves several
+    random crops. Images are drawn in pools of pool_batches * batch_size per
+    DataLoader worker, a pool is emitted as crops_per_image shuffled passes, so the
+    crops of an image land in different batches, never twice in the same one.
+
+    Batches go to the workers round robin, the batches of a pool are interleaved
+    with stride num_workers so every crop of an image is read by the worker which
+    holds its decode
+    """
+
+    def __init__(
+        self,
+        data_set_length,
+        batch_size,
+        crops_per_image,
+        num_workers=0,
+        pool_batches=POOL_BATCHES,
+        seed=0,
+    ):
+        self.data_set_length = data_set_length
+        self.batch_size = batch_size
+        self.crops_per_image = crops_per_image
+        self.num_workers = max(num_workers, 1)
+        self.pool_size = pool_batches * batch_size
+        self.seed = seed
+        self.epoch = 0
+        self.rank = get_rank()
+        self.world_size = get_world_size()
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def shard(self):
+        # Same permutation on every process, padded by wrapping around like
+        # DistributedSampler so every process gets a shard of the same length and
+        # steps the same number of batches
+        indices = np.random.RandomState(self.seed + self.epoch).permutation(
+            self.data_set_length
+        )
+        total = int(np.ceil(self.data_set_length / self.world_size)) * self.world_size
+        indices = np.resize(indices, total)
+        return indices[self.rank :: self.world_size]
+
+    def pool_batches(self, pool, random_state):
+        batches = list()
+        for _ in range(self.crops_per_image):
+            order = random_state.permutation(pool)
+            batches.extend(
+                order[start : start + self.batch_size].tolist()
+                for start in range(0, len(order), self.batch_size)
+            )
+        return batches
+
+    def __iter__(self):
+        random_state = np.random.RandomState(self.seed + self.epoch + 1)
+        indices = self.shard()
+        block = self.pool_size * self.num_workers
+        for start in range(0, len(indices), block):
+            pools = np.array_split(indices[start : start + block], self.num_workers)
+            worker_batches = [
+                self.pool_batches(pool, random_state) for pool in pools if len(pool)
+            ]
+            # Only the uneven tail of an epoch can fall out of step with the workers,
+            # costing a second decode there
+            for batches in zip_longest(*worker_batches):
+                yield from (batch for batch in batches if batch is not None)
+
+    def __len__(self):
+        length = 0
+        indices = len(self.shard())
+        block = self.pool_size * self.num_workers
+        for start in range(0, indices, block):
+            for pool in np.array_split(
+                np.arange(min(block, indices - start)), self.num_workers
+            ):
+                length += int(np.ceil(len(pool) / self.batch_size))
+        return length * self.crops_per_image
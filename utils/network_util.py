@@ -1,6 +1,7 @@
 import torch
 
 from core.logger import debug, ChronosLogger
+from utils.distributed import is_distributed
 
 logger = ChronosLogger.get_logger()
 
@@ -17,6 +18,14 @@ def get_gpu_device_ids():
 
 
 def load_parallel_model(model):
+    if is_distributed():
+        # One process per device, gradients are all reduced in backward
+        if torch.cuda.is_available():
+            device = torch.cuda.current_device()
+            return torch.nn.parallel.DistributedDataParallel(
+                model.cuda(device), device_ids=[device], output_device=device
+            )
+        return torch.nn.parallel.DistributedDataParallel(model)
     if torch.cuda.is_available():
         device_ids = get_gpu_device_ids()
         if device_ids:
@@ -48,3 +57,19 @@ def get_prediction_as_per_instance(outputs):
         return outputs
     else:
         raise NotImplementedError
+
+
+class InferenceNetwork(torch.nn.Module):
+    """
+    Tensor in, tensor out view of a network with the dict interface of BaseNetwork,
+    {"image": ...} -> {"output": ...}, so tracers and exporters see plain tensors
+    """
+
+    def __init__(self, network, input_key="image", output_key="output"):
+        super().__init__()
+        self.network = network.module if hasattr(network, "module") else network
+        self.input_key = input_key
+        self.output_key = output_key
+
+    def forward(self, image):
+        return self.network({self.input_key: image})[self.output_key]
@@ -26,6 +26,12 @@ def to_input_image_tensor(img):
     return to_tensor(np.moveaxis(img, -1, 0))
 
 
+def to_input_image_byte_tensor(img):
+    if isinstance(img, list):
+        return [to_input_image_byte_tensor(image) for image in img]
+    return torch.from_numpy(np.ascontiguousarray(np.moveaxis(img, -1, 0), np.uint8))
+
+
 def to_label_image_tensor(mask):
     return to_tensor(np.expand_dims(mask, 0))
 
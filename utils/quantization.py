@@ -0,0 +1,196 @@
+import copy
+
+import torch
+from torch import fx, nn
+from torch.quantization import QuantStub, DeQuantStub
+
+# Modules with an int8 kernel in eager mode quantization
+QUANTIZABLE = (nn.Conv2d, nn.BatchNorm2d, nn.ReLU, nn.Identity, nn.MaxPool2d)
+CONTAINERS = (nn.Sequential, nn.ModuleList, nn.ModuleDict)
+
+
+class QuantizedBlock(nn.Module):
+    """
+    Chain of quantizable modules between a single quantize and dequantize step, the
+    chain runs in int8 while the rest of the network, whatever its forward does with
+    lists, dicts and additions, keeps seeing float tensors
+    """
+
+    def __init__(self, layers):
+        super().__init__()
+        self.quant = QuantStub()
+        self.layers = nn.Sequential(*layers)
+        self.de_quant = DeQuantStub()
+        self.convolutions = sum(isinstance(layer, nn.Conv2d) for layer in layers)
+
+    def forward(self, x):
+        return self.de_quant(self.layers(self.quant(x)))
+
+
+class BlockTracer(fx.Tracer):
+    """Tracer which keeps the opaque modules, the ones fx can not trace, as leaves"""
+
+    def __init__(self, opaque):
+        super().__init__()
+        self.opaque = opaque
+
+    def is_leaf_module(self, module, module_qualified_name):
+        return module in self.opaque or super().is_leaf_module(
+            module, module_qualified_name
+        )
+
+
+def trace(module, opaque):
+    return fx.GraphModule(module, BlockTracer(opaque).trace(module))
+
+
+def find_opaque(model):
+    """
+    Modules fx can not trace, with their own untraceable children taken as leaves.
+    Containers without a forward and forwards building modules on the fly, Stage of
+    MapNet creates its MaxPool2d in forward, end up here
+
+    :param model:
+    :return: set of modules
+    """
+    opaque = set()
+
+    def visit(module):
+        for child in module.children():
+            visit(child)
+        try:
+            trace(module, opaque)
+        except Exception:
+            opaque.add(module)
+
+    visit(model)
+    return opaque
+
+
+def quantizable(module):
+    if isinstance(module, nn.Conv2d):
+        return type(module) is nn.Conv2d and module.padding_mode == "zeros"
+    return type(module) in QUANTIZABLE
+
+
+def find_chains(graph_module):
+    """
+    Longest runs of quantizable modules where every module consumes only the output
+    of the previous one and that output has no other consumer, runs without a
+    convolution are left in float
+
+    :param graph_module:
+    :return: list of lists of call_module nodes
+    """
+    chains = list()
+    chain = list()
+    for node in graph_module.graph.nodes:
+        if (
+            node.op == "call_module"
+            and quantizable(graph_module.get_submodule(node.target))
+            and len(node.args) == 1
+            and not node.kwargs
+        ):
+            linked = (
+                len(chain) and node.args[0] is chain[-1] and len(chain[-1].users) == 1
+            )
+            if not linked:
+                chains.append(chain)
+                chain = list()
+            chain.append(node)
+        elif chain:
+            chains.append(chain)
+            chain = list()
+    chains.append(chain)
+    return [
+        chain
+        for chain in chains
+        if any(
+            isinstance(graph_module.get_submodule(node.target), nn.Conv2d)
+            for node in chain
+        )
+    ]
+
+
+def replace_chains(graph_module, qconfig):
+    blocks = list()
+    for chain in find_chains(graph_module):
+        layers = list()
+        for node in chain:
+            layer = graph_module.get_submodule(node.target)
+            # Parameter free modules called from several places, the shared ReLU of
+            # MapNet, get a copy per call so each keeps its own observer
+            if not isinstance(layer, (nn.Conv2d, nn.BatchNorm2d)):
+                layer = copy.deepcopy(layer)
+            layers.append(layer)
+        block = QuantizedBlock(layers)
+        block.qconfig = qconfig
+        name = "quantized_block_{}".format(len(blocks))
+        graph_module.add_submodule(name, block)
+        with graph_module.graph.inserting_before(chain[0]):
+            block_node = graph_module.graph.call_module(name, chain[0].args)
+        chain[-1].replace_all_uses_with(block_node)
+        for node in reversed(chain):
+            graph_module.graph.erase_node(node)
+        blocks.append(block)
+    graph_module.graph.lint()
+    graph_module.recompile()
+    graph_module.delete_all_unused_submodules()
+    return blocks
+
+
+def wrap_blocks(model, qconfig, opaque=None):
+    """
+    Replace every child of the model that fx can trace with its GraphModule, where
+    each chain of quantizable modules runs as one QuantizedBlock carrying qconfig.
+    The children of opaque modules are handled the same way, the rest of the model
+    keeps no qconfig and stays in float
+
+    :param model:
+    :param qconfig:
+    :param opaque: modules fx can not trace, found on the model when None
+    :return: list of QuantizedBlock
+    """
+    opaque = find_opaque(model) if opaque is None else opaque
+    blocks = list()
+    for name, child in list(model.named_children()):
+        # Containers are indexed by the forward of their parent, only their children
+        # can be replaced
+        if child in opaque or isinstance(child, CONTAINERS):
+            blocks.extend(wrap_blocks(child, qconfig, opaque))
+            continue
+        graph_module = trace(child, opaque)
+        leaves = [
+            graph_module.get_submodule(node.target)
+            for node in graph_module.graph.nodes
+            if node.op == "call_module"
+            and graph_module.get_submodule(node.target) in opaque
+        ]
+        child_blocks = replace_chains(graph_module, qconfig)
+        if child_blocks:
+            setattr(model, name, graph_module)
+            blocks.extend(child_blocks)
+        for leaf in set(leaves):
+            blocks.extend(wrap_blocks(leaf, qconfig, opaque))
+    return blocks
+
+
+def prepare_static(model, backend="fbgemm"):
+    """
+    Prepare a float eval mode model for post training static quantization, the
+    observers collect activation ranges on every forward pass until convert_static
+
+    :param model:
+    :param backend: quantized engine, fbgemm for x86, qnnpack for arm
+    :return: list of QuantizedBlock that will be quantized
+    """
+    torch.backends.quantized.engine = backend
+    model.eval()
+    blocks = wrap_blocks(model, torch.quantization.get_default_qconfig(backend))
+    torch.quantization.prepare(model, inplace=True)
+    return blocks
+
+
+def convert_static(model):
+    torch.quantization.convert(model, inplace=True)
+    return model
@@ -0,0 +1,65 @@
+import os
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+
+def to_image_array(data: np.ndarray) -> np.ndarray:
+    # (bands, H, W) -> (H, W, 3) uint8, the layout load_image returns, single band
+    # rasters are repeated and extra bands dropped like cv2.imread does
+    data = np.transpose(data, (1, 2, 0))
+    if data.shape[-1] == 1:
+        data = np.repeat(data, 3, axis=-1)
+    return np.ascontiguousarray(data[..., :3]).astype(np.uint8, copy=False)
+
+
+class RasterReader:
+    """
+    Windowed GeoTIFF reads through rasterio, only the blocks overlapping the window
+    are decoded. Datasets stay open per process so the header is parsed once
+    """
+
+    def __init__(self):
+        self._datasets = dict()
+        self._pid = None
+
+    def open(self, path):
+        # Handles opened before the DataLoader forked are not shared with workers
+        if self._pid != os.getpid():
+            self.close()
+            self._pid = os.getpid()
+        path = str(path)
+        if path not in self._datasets:
+            self._datasets[path] = rasterio.open(path)
+        return self._datasets[path]
+
+    def shape(self, path):
+        dataset = self.open(path)
+        return dataset.height, dataset.width
+
+    def read(self, path, origin=None, dimension=None):
+        """
+
+        :param path:
+        :param origin: (row, col) top left corner of the window, None reads the scene
+        :param dimension: (height, width) of the window
+        :return: (H, W, 3) uint8 array
+        """
+        dataset = self.open(path)
+        if origin is None:
+            return to_image_array(dataset.read())
+        row, col = origin
+        height, width = dimension
+        return to_image_array(dataset.read(window=Window(col, row, width, height)))
+
+    def close(self):
+        for dataset in self._datasets.values():
+            dataset.close()
+        self._datasets = dict()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_datasets"] = dict()
+        state["_pid"] = None
+        return state
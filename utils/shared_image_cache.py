@@ -0,0 +1,109 @@
+import multiprocessing
+
+import numpy as np
+import torch
+
+# Positions in the shared header
+SLOT_BYTES, SLOT_COUNT, TICK, HITS, MISSES = range(5)
+
+
+class SharedImageCache:
+    """
+    Decoded uint8 image/label pairs of a split kept in shared memory, bounded by a
+    byte budget with least recently used eviction. Allocated by the main process
+    before the DataLoader starts its workers, every worker reads and fills the same
+    arena.
+
+    The arena is cut in equally sized slots, sized on the first pair put, pairs
+    which do not fit a slot are never cached
+    """
+
+    def __init__(self, data_set_length, budget):
+        self.budget = int(budget)
+        self.arena = torch.empty(self.budget, dtype=torch.uint8).share_memory_()
+        self.header = torch.zeros(5, dtype=torch.int64).share_memory_()
+        self.slot_of = torch.full((data_set_length,), -1, dtype=torch.int64)
+        self.slot_of.share_memory_()
+        self.slot_owner = torch.full((data_set_length,), -1, dtype=torch.int64)
+        self.slot_owner.share_memory_()
+        self.slot_tick = torch.zeros(data_set_length, dtype=torch.int64)
+        self.slot_tick.share_memory_()
+        # (H, W, C) of the image and of the label in every slot
+        self.slot_shape = torch.zeros((data_set_length, 2, 3), dtype=torch.int64)
+        self.slot_shape.share_memory_()
+        self.lock = multiprocessing.Lock()
+
+    def get(self, idx):
+        """
+
+        :param idx:
+        :return: (image, label) copies, None on a miss
+        """
+        with self.lock:
+            slot = int(self.slot_of[idx])
+            if slot < 0:
+                self.header[MISSES] += 1
+                return None
+            self.header[TICK] += 1
+            self.slot_tick[slot] = self.header[TICK]
+            self.header[HITS] += 1
+            # Copied under the lock, the slot can be evicted right after
+            image_shape, label_shape = self.slot_shape[slot].tolist()
+            start = slot * int(self.header[SLOT_BYTES])
+            end = start + int(np.prod(image_shape))
+            image = self.arena[start:end].numpy().copy()
+            label = self.arena[end : end + int(np.prod(label_shape))].numpy().copy()
+        return image.reshape(image_shape), label.reshape(label_shape)
+
+    def put(self, idx, image: np.ndarray, label: np.ndarray):
+        size = image.nbytes + label.nbytes
+        with self.lock:
+            if int(self.header[SLOT_BYTES]) == 0:
+                self.header[SLOT_BYTES] = size
+                self.header[SLOT_COUNT] = min(len(self.slot_of), self.budget // size)
+            slot_bytes = int(self.header[SLOT_BYTES])
+            slot_count = int(self.header[SLOT_COUNT])
+            if size > slot_bytes or slot_count == 0 or int(self.slot_of[idx]) >= 0:
+                return
+
+            free = (self.slot_owner[:slot_count] < 0).nonzero()
+            if len(free):
+                slot = int(free[0])
+            else:
+                slot = int(torch.argmin(self.slot_tick[:slot_count]))
+                self.slot_of[self.slot_owner[slot]] = -1
+
+            start = slot * slot_bytes
+            self.arena[start : start + image.nbytes] = torch.from_numpy(
+                np.ascontiguousarray(image, dtype=np.uint8).reshape(-1)
+            )
+            self.arena[start + image.nbytes : start + size] = torch.from_numpy(
+                np.ascontiguousarray(label, dtype=np.uint8).reshape(-1)
+            )
+            self.slot_shape[slot, 0] = torch.tensor(image.shape)
+            self.slot_shape[slot, 1] = torch.tensor(label.shape)
+            self.header[TICK] += 1
+            self.slot_tick[slot] = self.header[TICK]
+            self.slot_owner[slot] = idx
+            self.slot_of[idx] = slot
+
+    def statistics(self, reset=True):
+        """
+        Hits and misses since the last reset, summed over every worker
+
+        :param reset:
+        :return:
+        """
+        with self.lock:
+            hits, misses = int(self.header[HITS]), int(self.header[MISSES])
+            cached = int((self.slot_of >= 0).sum())
+            if reset:
+                self.header[HITS] = 0
+                self.header[MISSES] = 0
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "cached": cached,
+            "cached_bytes": cached * int(self.header[SLOT_BYTES]),
+        }
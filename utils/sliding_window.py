@@ -0,0 +1,73 @@
+import numpy as np
+
+
+def get_window_start(image_length, window_length, stride):
+    if image_length <= window_length:
+        return [0]
+    start = list(range(0, image_length - window_length, stride))
+    # The last window is pulled back to end on the image border
+    start.append(image_length - window_length)
+    return start
+
+
+def get_sliding_windows(image_dimension: tuple, window_dimension: tuple, overlap=0.25):
+    """
+
+    :param image_dimension: (height, width) of the scene
+    :param window_dimension: (height, width) of a tile
+    :param overlap: fraction of a tile shared with its neighbour
+    :return: list of (row, col) top left corner of every tile
+    """
+    assert 0 <= overlap < 1, "Overlap should be in [0, 1)"
+    image_height, image_width = image_dimension
+    window_height, window_width = window_dimension
+
+    stride_height = max(int(window_height * (1 - overlap)), 1)
+    stride_width = max(int(window_width * (1 - overlap)), 1)
+    return [
+        (row, col)
+        for row in get_window_start(image_height, window_height, stride_height)
+        for col in get_window_start(image_width, window_width, stride_width)
+    ]
+
+
+def gaussian_weight_map(window_dimension: tuple, sigma_scale=0.125):
+    window_height, window_width = window_dimension
+
+    def gaussian(length):
+        position = np.arange(length, dtype=np.float32) - (length - 1) / 2
+        sigma = max(length * sigma_scale, 1e-3)
+        return np.exp(-(position ** 2) / (2 * sigma ** 2))
+
+    weight = np.outer(gaussian(window_height), gaussian(window_width))
+    weight /= weight.max()
+    # Border pixels of the scene may be covered by a single tile, keep their weight
+    # non zero
+    return np.maximum(weight, weight[weight > 0].min()).astype(np.float32)
+
+
+class WeightedStitcher:
+    """
+    Blends overlapping tile predictions into a scene, every tile is multiplied by a
+    gaussian weight map and the accumulated sum is divided by the accumulated weight
+    """
+
+    def __init__(
+        self, image_dimension, window_dimension, channels=1, sigma_scale=0.125
+    ):
+        image_height, image_width = image_dimension
+        self.weight = gaussian_weight_map(window_dimension, sigma_scale)
+        self.prediction = np.zeros((channels, image_height, image_width), np.float32)
+        self.weight_sum = np.zeros((image_height, image_width), np.float32)
+
+    def add(self, prediction: np.ndarray, row, col):
+        _, window_height, window_width = prediction.shape
+        self.prediction[:, row : row + window_height, col : col + window_width] += (
+            prediction * self.weight
+        )
+        self.weight_sum[
+            row : row + window_height, col : col + window_width
+        ] += self.weight
+
+    def result(self):
+        return self.prediction / self.weight_sum
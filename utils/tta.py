@@ -0,0 +1,77 @@
+import torch
+from torch import nn
+
+# name: (rot90 factor, flip) on the spatial dims of NCHW, applied as flip then rotate
+DIHEDRAL = {
+    "identity": (0, False),
+    "rotate_90": (1, False),
+    "rotate_180": (2, False),
+    "rotate_270": (3, False),
+    "horizontal_flip": (0, True),
+    "transpose": (1, True),
+    "vertical_flip": (2, True),
+    "transverse": (3, True),
+}
+
+
+def dihedral_transform(images: torch.Tensor, name) -> torch.Tensor:
+    factor, flip = DIHEDRAL[name]
+    if flip:
+        images = images.flip(-1)
+    return images.rot90(factor, (-2, -1))
+
+
+def inverse_dihedral_transform(images: torch.Tensor, name) -> torch.Tensor:
+    factor, flip = DIHEDRAL[name]
+    images = images.rot90(-factor, (-2, -1))
+    if flip:
+        images = images.flip(-1)
+    return images
+
+
+class TestTimeAugmentation(nn.Module):
+    """
+    Averages the logits of the model over dihedral transforms of the input. All the
+    transforms of a batch go through the model as one stacked forward, transforms
+    that swap height and width of non square inputs in a second one
+    """
+
+    def __init__(self, model, transforms=tuple(DIHEDRAL.keys()), max_batch=None):
+        super().__init__()
+        transforms = [transforms] if isinstance(transforms, str) else list(transforms)
+        for name in transforms:
+            assert name in DIHEDRAL, "Expected transform out of {}, got {}".format(
+                list(DIHEDRAL.keys()), name
+            )
+        self.model = model
+        self.transforms = transforms
+        self.max_batch = max_batch
+
+    def forward(self, x: dict) -> dict:
+        images = x["image"]
+        batch = images.shape[0]
+
+        groups = dict()
+        for name in self.transforms:
+            transformed = dihedral_transform(images, name)
+            groups.setdefault(transformed.shape, []).append((name, transformed))
+
+        output = None
+        for group in groups.values():
+            stacked = torch.cat([transformed for _, transformed in group])
+            predictions = self.stacked_forward(stacked)
+            for index, (name, _) in enumerate(group):
+                prediction = inverse_dihedral_transform(
+                    predictions[index * batch : (index + 1) * batch], name
+                ).float()
+                output = prediction if output is None else output + prediction
+        return {"output": output / len(self.transforms)}
+
+    def stacked_forward(self, images):
+        max_batch = images.shape[0] if self.max_batch is None else self.max_batch
+        return torch.cat(
+            [
+                self.model({"image": images[index : index + max_batch]})["output"]
+                for index in range(0, images.shape[0], max_batch)
+            ]
+        )
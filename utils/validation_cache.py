@@ -0,0 +1,125 @@
+import torch
+
+from utils.system_printer import SystemPrinter
+
+
+def compact(tensor: torch.Tensor) -> torch.Tensor:
+    # Labels holding only integral values in [0, 255] are kept as uint8
+    if (
+        tensor.dtype != torch.uint8
+        and torch.equal(tensor, tensor.round())
+        and tensor.min() >= 0
+        and tensor.max() <= 255
+    ):
+        return tensor.to(torch.uint8)
+    return tensor
+
+
+def nbytes(tensors: dict) -> int:
+    return sum(value.element_size() * value.nelement() for value in tensors.values())
+
+
+class ValidationCache:
+    """
+    Fixed validation batches built once and replayed every epoch in the same order,
+    so validation costs only the forward pass and losses compare exactly across
+    epochs. Images are cached as uint8 and normalized on the device by the dataset.
+
+    Batches are stacked as the samples arrive and go to the device while the
+    running size fits the device budget, once it outgrows the budget every batch
+    moves to pinned host memory. Iterated like the val DataLoader
+    """
+
+    def __init__(self, data_set, samples, batch_size, device_bytes=0):
+        """
+
+        :param data_set: dataset the samples come from, kept for normalize_batch
+        :param samples: iterable of (images, ground_truth) dicts of single samples
+        :param batch_size:
+        :param device_bytes: largest cache kept on the device
+        """
+        self.dataset = data_set
+        self.batch_size = batch_size
+        self.device_bytes = device_bytes
+        self.on_device = torch.cuda.is_available()
+        self.batches = list()
+        self.dtype = dict()
+        self.nbytes = 0
+        self.length = 0
+
+        pending = list()
+        for sample in samples:
+            pending.append(sample)
+            if len(pending) == batch_size:
+                self.add(pending)
+                pending = list()
+        if pending:
+            self.add(pending)
+
+        SystemPrinter.sys_print(
+            "Validation cache of {} samples, {} MB in {}".format(
+                self.length, self.nbytes // 2 ** 20, self.placement
+            )
+        )
+
+    @property
+    def placement(self):
+        if self.on_device:
+            return "device"
+        return "pinned host memory" if torch.cuda.is_available() else "host memory"
+
+    def move(self, tensors: dict) -> dict:
+        if self.on_device:
+            return {key: value.cuda() for key, value in tensors.items()}
+        if torch.cuda.is_available():
+            return {key: value.cpu().pin_memory() for key, value in tensors.items()}
+        return tensors
+
+    def add(self, samples):
+        images = {
+            key: torch.stack([image[key] for image, _ in samples])
+            for key in samples[0][0].keys()
+        }
+        ground_truth = dict()
+        for key in samples[0][1].keys():
+            label = torch.stack([label[key] for _, label in samples])
+            self.dtype.setdefault(key, label.dtype)
+            ground_truth[key] = compact(label)
+
+        self.nbytes += nbytes(images) + nbytes(ground_truth)
+        self.length += len(samples)
+        if self.on_device and self.nbytes > self.device_bytes:
+            # Outgrew the device budget, what is already there moves to the host
+            self.on_device = False
+            self.batches = [
+                (self.move(images), self.move(ground_truth))
+                for images, ground_truth in self.batches
+            ]
+        self.batches.append((self.move(images), self.move(ground_truth)))
+
+    def pad(self, length):
+        """
+        Replay batches from the start until there are length of them, the repeated
+        batches share the tensors of the first ones
+
+        :param length:
+        :return:
+        """
+        if not self.batches:
+            return
+        self.batches.extend(
+            [
+                self.batches[iterator % len(self.batches)]
+                for iterator in range(length - len(self.batches))
+            ]
+        )
+
+    def __len__(self):
+        return len(self.batches)
+
+    def __iter__(self):
+        for images, ground_truth in self.batches:
+            # Labels compacted to uint8 are restored to the dtype the dataset gave
+            yield dict(images), {
+                key: value.to(self.dtype[key]) for key, value in ground_truth.items()
+            }